@@ -0,0 +1 @@
+'''The benchmarks of jsonfmt, see bench.py for the usage'''
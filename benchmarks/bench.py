@@ -0,0 +1,357 @@
+#!/usr/bin/env python
+'''
+Benchmarks of the hot paths of jsonfmt, which run offline on the generated corpora.
+
+    $ python benchmarks/bench.py --quick                  # run and print the results
+    $ python benchmarks/bench.py --save baseline.json     # store the results as the baseline
+    $ python benchmarks/bench.py --compare baseline.json  # exit with 1 if any case regresses
+
+The stages are timed in process by the best of several runs, and their
+peak memory is traced by tracemalloc in a separate run. The CLI modes are
+timed in subprocesses, and their peak memory is the max RSS of the process.
+The results depend on the machine, so only compare those from the same one.
+'''
+
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from functools import partial
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # benchmark the working tree rather than the installed one
+
+from benchmarks import corpus  # noqa: E402
+from jsonfmt import canonical, diff, stream  # noqa: E402
+from jsonfmt.jsonfmt import (compile_querypath, extract_elements, format_to_text,  # noqa: E402
+                             get_overview, merge_objs, modify_pyobj, parse_to_pyobj)
+
+CORPUS_DIR = os.path.join(ROOT, 'benchmarks', '.corpus')
+QUERY = 'records[*].name'
+MIN_TIME_DIFF = 0.005  # the smaller slowdowns are regarded as noise, in seconds
+MIN_PEAK_DIFF = 1024 * 1024  # the smaller increases of memory are regarded as noise, in bytes
+CONFIRM_RUNS = 2  # the max times to run a regressed case again
+
+
+class Case(NamedTuple):
+    name: str
+    # the stages: called before each run to prepare the state, and returns the function to time
+    setup: Optional[Callable[[], Callable[[], Any]]] = None
+    command: Optional[List[str]] = None  # the CLI modes: the arguments of `jf`
+
+
+class Result(NamedTuple):
+    time: float  # in seconds
+    peak: Optional[int]  # in bytes, None if it is unavailable
+
+
+def make_edits(n_records: int):
+    '''the edits of at most 500 records, including the sets and the pops'''
+    indexes = range(0, n_records, max(n_records // 500, 1))
+    sets = [f'records[{idx}].label=edited' for idx in indexes] + ['records[0].extra={"a": [1, 2]}']
+    pops = [f'records.{idx}.name' for idx in indexes]
+    return sets, pops
+
+
+def read_lines(path: str) -> list:
+    with open(path, encoding='utf-8') as fp:
+        return list(stream.iter_json_lines(fp))
+
+
+def stage_cases(paths: Dict[str, str], shape: str, size: str) -> List[Case]:
+    '''the in-process cases of the parsing, querying, modifying and formatting'''
+    cases = []
+    texts = {}
+    for fmt in corpus.FORMATS:
+        with open(paths[f'{shape}-{size}.{fmt}'], encoding='utf-8') as fp:
+            texts[fmt] = fp.read()
+    py_obj = json.loads(texts['json'])
+    n_records = len(py_obj['records'])
+    sets, pops = make_edits(n_records)
+    edited = json.loads(texts['json'])
+    modify_pyobj(edited, sets, pops)
+    array_text = json.dumps(py_obj['records'])
+
+    def fresh_obj():
+        return json.loads(texts['json'])  # for the stages that modify the data
+
+    for fmt in corpus.FORMATS:
+        cases.append(Case(f'parse/{fmt}/{shape}-{size}',
+                          lambda fmt=fmt: partial(parse_to_pyobj, texts[fmt], None, fmt)))
+        cases.append(Case(f'format/{fmt}/{shape}-{size}',
+                          lambda fmt=fmt: partial(format_to_text, py_obj, fmt, compact=False, escape=False,
+                                                  indent='2', sort_keys=False)))
+
+    format_json = partial(format_to_text, py_obj, 'json', escape=False, indent='2')
+    cases += [
+        Case(f'format/json-compact/{shape}-{size}',
+             lambda: partial(format_json, compact=True, sort_keys=False)),
+        Case(f'format/json-sorted/{shape}-{size}',
+             lambda: partial(format_json, compact=False, sort_keys=True)),
+        Case(f'format/json-colored/{shape}-{size}',
+             lambda: partial(format_json, compact=False, sort_keys=False, colored=True)),
+        Case(f'query/jmespath/{shape}-{size}',
+             lambda: partial(extract_elements, compile_querypath(QUERY, 'jmespath'), py_obj)),
+        Case(f'query/jsonpath/{shape}-{size}',
+             lambda: partial(extract_elements, compile_querypath(QUERY, 'jsonpath'), py_obj)),
+        Case(f'modify/{shape}-{size}',
+             lambda: partial(modify_pyobj, fresh_obj(), sets, pops)),
+        Case(f'overview/{shape}-{size}', lambda: partial(get_overview, py_obj)),
+        Case(f'hash/{shape}-{size}', lambda: partial(canonical.fingerprint, py_obj, True)),
+        Case(f'diff/{shape}-{size}', lambda: partial(diff.diff_objs, py_obj, edited)),
+        Case(f'merge/{shape}-{size}',
+             lambda: partial(merge_objs, fresh_obj(), fresh_obj(), deep=True)),
+        Case(f'stream/lines/{shape}-{size}',
+             lambda: partial(read_lines, paths[f'{shape}-{size}.jsonl'])),
+        Case(f'stream/array/{shape}-{size}',
+             lambda: partial(list, stream.iter_json_array(io.StringIO(array_text)))),
+    ]
+    return cases
+
+
+def cli_cases(paths: Dict[str, str], shape: str, size: str) -> List[Case]:
+    '''the cases of the CLI modes, each of them runs `jf` in a subprocess'''
+    files = {fmt: paths[f'{shape}-{size}.{fmt}'] for fmt in corpus.FORMATS + ['jsonl']}
+    cases = [Case(f'cli/format/{fmt}/{shape}-{size}', command=[files[fmt]])
+             for fmt in corpus.FORMATS]
+    cases += [Case(f'cli/convert/{fmt}/{shape}-{size}', command=['-f', fmt, files['json']])
+              for fmt in ['toml', 'xml', 'yaml']]
+    modes = {
+        'compact': ['-c', files['json']],
+        'sort': ['-s', files['json']],
+        'query': ['-p', QUERY, files['json']],
+        'modify': ['--set', 'records[0].name=edited', '--pop', 'records[1]', files['json']],
+        'overview': ['-o', files['json']],
+        'check': ['--check', files['json']],
+        'diff': ['-d', files['json'], files['yaml']],
+        'hash': ['--hash', files['json'], files['toml']],
+        'merge': ['-m', '--deep-merge', files['json'], files['json']],
+        'lines': ['-L', '-c', files['jsonl']],
+        'lines-overview': ['-L', '-o', files['jsonl']],
+    }
+    cases += [Case(f'cli/{mode}/{shape}-{size}', command=args) for mode, args in modes.items()]
+    return cases
+
+
+def collect_cases(paths: Dict[str, str], sizes: Dict[str, int]) -> List[Case]:
+    cases = []
+    for shape in corpus.SHAPES:
+        for size in sizes:
+            cases += stage_cases(paths, shape, size)
+            cases += cli_cases(paths, shape, size)
+    return cases
+
+
+def run_stage(case: Case, repeat: int, budget: float) -> Result:
+    '''time the stage by the best of runs, the slow ones run fewer times within the budget'''
+    best, spent = float('inf'), 0.0
+    for _ in range(repeat):
+        func = case.setup()  # type: ignore
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        if spent >= budget:
+            break
+
+    # trace the memory in a separate run, since tracemalloc slows it down
+    func = case.setup()  # type: ignore
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return Result(best, peak)
+
+
+# run `jf` and report its peak memory at exit. The max RSS from wait4() is not used,
+# since the child inherits the high-water mark of this process on Linux before exec().
+RUNNER = '''
+import atexit, os, runpy, sys
+
+def report_peak():
+    try:
+        with open('/proc/self/status') as fp:
+            peak = next(int(line.split()[1]) * 1024 for line in fp if line.startswith('VmHWM:'))
+    except OSError:
+        try:
+            import resource
+        except ImportError:
+            return  # unavailable on Windows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        peak = peak if sys.platform == 'darwin' else peak * 1024
+    with open(os.environ['JSONFMT_BENCH_PEAK'], 'w') as fp:
+        fp.write(str(peak))
+
+atexit.register(report_peak)
+runpy.run_module('jsonfmt.jsonfmt', run_name='__main__', alter_sys=True)
+'''
+
+
+def run_command(args: List[str]) -> Result:
+    '''run `jf` with the args in a subprocess, and measure its time and peak memory'''
+    fd, peak_path = tempfile.mkstemp(prefix='jf-bench-')
+    os.close(fd)
+    env = dict(os.environ, JSONFMT_CACHE_DIR='', JSONFMT_BENCH_PEAK=peak_path)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [ROOT, os.environ.get('PYTHONPATH')]))
+    try:
+        start = time.perf_counter()
+        returncode = subprocess.call([sys.executable, '-c', RUNNER, *args], env=env,
+                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        with open(peak_path) as fp:
+            peak = int(fp.read() or 0) or None
+    finally:
+        os.remove(peak_path)
+
+    if returncode != 0:
+        raise RuntimeError(f'`jf {" ".join(args)}` exited with {returncode}')
+    return Result(elapsed, peak)
+
+
+def run_cli(case: Case, repeat: int, budget: float) -> Result:
+    results = []
+    for _ in range(repeat):
+        results.append(run_command(case.command))  # type: ignore
+        if sum(r.time for r in results) >= budget:
+            break
+    peaks = [r.peak for r in results if r.peak is not None]
+    return Result(min(r.time for r in results), min(peaks) if peaks else None)
+
+
+def check_regression(result: Result, base: Optional[Result], threshold: float) -> List[str]:
+    '''compare the result with the baseline, return the descriptions of the regressions'''
+    regressions = []
+    if base is None:
+        return regressions  # the new cases
+    if result.time > base.time * (1 + threshold) and result.time - base.time > MIN_TIME_DIFF:
+        regressions.append(f'time {format_time(base.time)} -> {format_time(result.time)}')
+    if (result.peak is not None and base.peak is not None
+            and result.peak > base.peak * (1 + threshold) and result.peak - base.peak > MIN_PEAK_DIFF):
+        regressions.append(f'peak {format_size(base.peak)} -> {format_size(result.peak)}')
+    return regressions
+
+
+def best_of(result1: Result, result2: Result) -> Result:
+    peaks = [peak for peak in (result1.peak, result2.peak) if peak is not None]
+    return Result(min(result1.time, result2.time), min(peaks) if peaks else None)
+
+
+def format_time(seconds: float) -> str:
+    return f'{seconds * 1000:.1f}ms' if seconds < 1 else f'{seconds:.2f}s'
+
+
+def format_size(size: Optional[int]) -> str:
+    return '-' if size is None else f'{size / 1024 / 1024:.1f}MB'
+
+
+def format_change(value: Optional[float], base: Optional[float]) -> str:
+    if value is None or not base:
+        return ''
+    return f'{(value - base) / base:+.0%}'
+
+
+def load_results(path: str) -> Dict[str, Result]:
+    with open(path, encoding='utf-8') as fp:
+        data = json.load(fp)
+    return {name: Result(r['time'], r['peak']) for name, r in data['results'].items()}
+
+
+def save_results(path: str, results: Dict[str, Result], quick: bool):
+    data = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'quick': quick},
+        'results': {name: result._asdict() for name, result in results.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as fp:
+        json.dump(data, fp, indent=2)
+        fp.write('\n')
+
+
+def parse_cmdline_args():
+    parser = ArgumentParser('bench', description='the benchmarks of jsonfmt')
+    parser.add_argument('-q', '--quick', action='store_true',
+                        help='use the smaller corpora and fewer runs')
+    parser.add_argument('-k', dest='patterns', action='append', default=[],
+                        help='only run the cases whose names contain the pattern, can be repeated')
+    parser.add_argument('-l', '--list', action='store_true', help='list the cases and exit')
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='the max number of runs of each case (default: %(default)s)')
+    parser.add_argument('--budget', type=float, default=2.0,
+                        help='stop repeating a case after the seconds (default: %(default)s)')
+    parser.add_argument('--save', metavar='FILE', help='save the results as the baseline')
+    parser.add_argument('--compare', metavar='FILE', help='compare the results with the baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='the ratio of slowdown or memory increase to fail (default: %(default)s)')
+    parser.add_argument('--corpus-dir', default=CORPUS_DIR,
+                        help='the directory to cache the generated corpora (default: %(default)s)')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_cmdline_args()
+    sizes = corpus.QUICK_SIZES if args.quick else corpus.SIZES
+    repeat = min(args.repeat, 3) if args.quick else args.repeat
+    baseline = load_results(args.compare) if args.compare else {}
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    paths = corpus.build(args.corpus_dir, sizes)
+    cases = [case for case in collect_cases(paths, sizes)
+             if not args.patterns or any(pattern in case.name for pattern in args.patterns)]
+    if args.list:
+        for case in cases:
+            print(case.name)
+        return
+
+    def run_case(case: Case) -> Result:
+        if case.command is None:
+            return run_stage(case, repeat, args.budget)
+        else:
+            return run_cli(case, repeat, args.budget)
+
+    results = {}
+    print(f'{"case":<40} {"time":>10} {"peak":>10} {"Δtime":>7} {"Δpeak":>7}')
+    for case in cases:
+        result = results[case.name] = run_case(case)
+        base = baseline.get(case.name)
+        print(f'{case.name:<40} {format_time(result.time):>10} {format_size(result.peak):>10} '
+              f'{format_change(result.time, base and base.time):>7} '
+              f'{format_change(result.peak, base and base.peak):>7}', flush=True)
+
+    regressions = []
+    if args.compare:
+        # the regressions may be the noises of the machine, so they are run again to confirm
+        for case in cases:
+            for _ in range(CONFIRM_RUNS):
+                if not check_regression(results[case.name], baseline.get(case.name), args.threshold):
+                    break
+                results[case.name] = best_of(results[case.name], run_case(case))
+            for regression in check_regression(results[case.name], baseline.get(case.name), args.threshold):
+                regressions.append(f'{case.name}: {regression}')
+
+    if args.save:
+        save_results(args.save, results, args.quick)
+        print(f'\nthe results are saved to {args.save}')
+
+    if args.compare:
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) beyond {args.threshold:.0%}:', file=sys.stderr)
+            for regression in regressions:
+                print(f'  {regression}', file=sys.stderr)
+            sys.exit(1)
+        print(f'\nno regression beyond {args.threshold:.0%}')
+
+
+if __name__ == '__main__':
+    main()
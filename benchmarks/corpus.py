@@ -0,0 +1,89 @@
+'''Generate the corpora for benchmarks, the same arguments always generate the same data'''
+
+import json
+import os
+import random
+from typing import Any, Dict
+
+from jsonfmt.jsonfmt import format_to_text
+
+FORMATS = ['json', 'toml', 'xml', 'yaml']
+SHAPES = ['flat', 'deep']
+SIZES = {'small': 100, 'huge': 20000}  # the number of records
+QUICK_SIZES = {'small': 100, 'huge': 2000}
+DEPTH = 24  # the depth of each record in the deep corpora
+VERSION = 1  # increase it when the generated data are changed, so that the cached ones are not used
+WORDS = ['alpha', 'beta', 'gamma', 'delta', 'epsilon', 'zeta', 'eta', 'theta', '中文', 'ü']
+
+
+def make_record(rnd: random.Random, idx: int) -> Dict[str, Any]:
+    '''a wide and shallow record like the item of API responses'''
+    return {
+        'id': idx,
+        'name': f'{rnd.choice(WORDS)} {idx}',
+        'active': rnd.random() < 0.5,
+        'score': round(rnd.uniform(-1000, 1000), 3),
+        'ratio': rnd.random(),
+        'tags': rnd.sample(WORDS, 3),
+        'created': f'2024-{rnd.randint(1, 12):02}-{rnd.randint(1, 28):02}',
+        'owner': {'uid': rnd.randint(1, 10 ** 6), 'email': f'user{idx}@example.com'},
+        'note': ' '.join(rnd.choices(WORDS, k=8)),
+    }
+
+
+def make_chain(rnd: random.Random, idx: int, depth: int) -> Dict[str, Any]:
+    '''a narrow and deep record, each level has a few fields and a child'''
+    node: Dict[str, Any] = {'leaf': f'{rnd.choice(WORDS)} {idx}', 'values': [rnd.randint(0, 99)] * 3}
+    for level in range(depth):
+        node = {'level': level, 'name': rnd.choice(WORDS), 'weight': rnd.random(), 'child': node}
+    return node
+
+
+def make_data(shape: str, n_records: int, seed: int = 0) -> Dict[str, Any]:
+    '''
+    generate the data, which has a single root key and no null values,
+    so that it can be represented by all of the formats
+    '''
+    rnd = random.Random(seed)
+    if shape == 'flat':
+        records = [make_record(rnd, idx) for idx in range(n_records)]
+    else:
+        # there are fewer records in the deep corpora, so that the sizes are similar
+        records = [make_chain(rnd, idx, DEPTH) for idx in range(max(n_records // 16, 1))]
+    return {'records': records}
+
+
+def to_text(py_obj: Any, fmt: str) -> str:
+    '''format the data as the files written by people'''
+    return format_to_text(py_obj, fmt, compact=False, escape=False, indent='2', sort_keys=False)
+
+
+def build(dirpath: str, sizes: Dict[str, int]) -> Dict[str, str]:
+    '''
+    write the corpora into dirpath, return the paths keyed by the names like
+    `flat-small.json`, the JSON Lines corpora are named like `flat-small.jsonl`.
+    The existing corpora are reused, since they are always generated the same.
+    '''
+    paths = {}
+    for shape in SHAPES:
+        for size, n_records in sizes.items():
+            subdir = os.path.join(dirpath, f'v{VERSION}-{shape}-{n_records}')
+            os.makedirs(subdir, exist_ok=True)
+            py_obj = None
+            for fmt in FORMATS + ['jsonl']:
+                name = f'{shape}-{size}.{fmt}'
+                paths[name] = os.path.join(subdir, f'corpus.{fmt}')
+                if os.path.exists(paths[name]):
+                    continue
+
+                if py_obj is None:
+                    py_obj = make_data(shape, n_records)
+                tmp_path = f'{paths[name]}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as fp:
+                    if fmt == 'jsonl':
+                        for record in py_obj['records']:
+                            fp.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    else:
+                        fp.write(to_text(py_obj, fmt))
+                os.replace(tmp_path, paths[name])  # the interrupted ones are not reused
+    return paths
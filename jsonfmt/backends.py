@@ -0,0 +1,307 @@
+'''
+The backends to parse and serialize JSON, TOML and YAML, the faster installed one is used by default.
+
+The results of JSON are always the same as the ones of the stdlib `json`, since the
+cases that a backend can't handle in the same way are left to the stdlib.
+'''
+
+import json
+import mmap
+import os
+import re
+from functools import lru_cache
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from .utils import Expansion, InputData, decode_text, rebuild
+
+# the digits are translated to "0", so that the runs of digits can be found by `bytes.find`
+DIGITS_TO_ZERO = bytes.maketrans(b'123456789', b'000000000')
+DIGITS = re.compile(rb'[0-9]*')
+MAX_DIGITS = 19  # the integers of 64 bits have at most 20 digits, and the ones of 19 digits may overflow
+CHUNK_SIZE = 1024 * 1024
+
+
+class Backend:
+    '''the stdlib `json`, which is also the base of the others'''
+
+    name = 'json'
+
+    def loads(self, data: InputData) -> Any:
+        '''parse the str, bytes or mapped file'''
+        return json.loads(decode_text(data))
+
+    def dumps(self, py_obj: Any, *, compact: bool, escape: bool,
+              indent: str, sort_keys: bool) -> Optional[str]:
+        '''serialize the py_obj, return None to leave it to the stdlib'''
+        return None
+
+
+class OrjsonBackend(Backend):
+    '''orjson, which parses and serializes several times faster than the stdlib'''
+
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        # the types which are not supported by the stdlib are not serialized either
+        self.option = (orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME
+                       | orjson.OPT_PASSTHROUGH_SUBCLASS)
+
+    def loads(self, data: InputData) -> Any:
+        raw = data.encode('utf-8', 'surrogatepass') if isinstance(data, str) else data
+        # the integers out of 64 bits are parsed as floats by orjson
+        if not has_long_integer(raw):
+            try:
+                with memoryview(raw) as view:  # parse the mapped file without copying it
+                    return self.orjson.loads(view)
+            except self.orjson.JSONDecodeError:
+                pass  # the invalid data, BOM, NaN, the lone surrogates, etc.
+        return super().loads(data)
+
+    def dumps(self, py_obj: Any, *, compact: bool, escape: bool,
+              indent: str, sort_keys: bool) -> Optional[str]:
+        # orjson never escapes non-ASCII characters, and only indents by 2 spaces
+        if escape or not (compact or indent == '2'):
+            return None
+        option = self.option
+        if not compact:
+            option |= self.orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= self.orjson.OPT_SORT_KEYS
+        try:
+            output = self.orjson.dumps(py_obj, option=option)
+        except self.orjson.JSONEncodeError:
+            return None  # the big integers, the keys which are not str, the deep data, etc.
+
+        # the floats with an exponent or less than 1e-4 are written differently from
+        # `float.__repr__`, e.g. `1e16` and `0.00001`, the strings may be mistaken for them
+        if b'0e' in output.translate(DIGITS_TO_ZERO) or b'0.0000' in output:
+            return None
+        if b'null' in output and has_non_finite(py_obj):
+            return None  # NaN and Infinity are written as null by orjson
+        return output.decode('utf-8')
+
+
+def has_long_integer(data: Union[bytes, mmap.mmap]) -> bool:
+    '''check if there are integers of 19 digits or more, the digits in strings may be mistaken for them'''
+    long_run = b'0' * MAX_DIGITS
+    for offset in range(0, len(data), CHUNK_SIZE):
+        # the chunks overlap, so that the runs across the boundary are found
+        marked = data[offset:offset + CHUNK_SIZE + MAX_DIGITS - 1].translate(DIGITS_TO_ZERO)
+        idx = marked.find(long_run)
+        while idx >= 0:
+            start = offset + idx
+            end = DIGITS.match(data, start).end()  # type: ignore
+            before = data[max(start - 2, 0):start]
+            after = data[end:end + 1]
+            # skip the fractions, the exponents, the mantissas of floats, and the rest of a run
+            if not (before[-1:].isdigit() or before[-1:] in (b'.', b'e', b'E', b'+')
+                    or before in (b'e-', b'E-') or (after and after in b'.eE')):
+                return True
+            idx = marked.find(long_run, end - offset)
+    return False
+
+
+def has_non_finite(py_obj: Any) -> bool:
+    '''check if there is NaN or Infinity in py_obj'''
+    pending = [py_obj]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            pending.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            pending.extend(value)
+        elif isinstance(value, float) and value - value:  # it's NaN for NaN and Infinity
+            return True
+    return False
+
+
+class Documents(list):
+    '''the documents of a YAML stream, which are queried, modified and formatted one by one'''
+
+
+class YamlBackend:
+    '''PyYAML with the safe loader and dumper written in Python'''
+
+    name = 'pyyaml'
+    buffered = False  # whether the dumper joins the small pieces of output by itself
+
+    def __init__(self):
+        import yaml
+        self.yaml = yaml
+        self.loader: type = yaml.SafeLoader
+        self.dumper: type = yaml.SafeDumper
+
+    def load_all(self, stream: Union[InputData, IO]) -> Iterator[Any]:
+        '''parse the documents one by one, the bytes and the file-like stream are read by chunks'''
+        return self.yaml.load_all(stream, Loader=self.loader)
+
+    def loads(self, data: Union[InputData, IO]) -> Any:
+        '''parse the data, the stream of several documents is parsed to Documents'''
+        docs = list(self.load_all(data))
+        if len(docs) == 1:
+            return docs[0]
+        return Documents(docs) if docs else None
+
+    def dump_all(self, docs: Iterable[Any], stream: IO, *,
+                 escape: bool, indent: str, sort_keys: bool):
+        '''write the documents one by one, the ones after the first one start with "---"'''
+        self.yaml.dump_all(docs, stream, Dumper=self.dumper, allow_unicode=not escape,
+                           indent=None if indent == 't' else int(indent), sort_keys=sort_keys)
+
+
+class LibyamlBackend(YamlBackend):
+    '''
+    the bindings of LibYAML in PyYAML, which parse and emit several times faster,
+    the emitted text differs in a few cases, e.g. no "..." after a root scalar
+    '''
+
+    name = 'libyaml'
+    buffered = True
+
+    def __init__(self):
+        super().__init__()
+        if not self.yaml.__with_libyaml__:
+            raise ImportError('PyYAML is built without LibYAML')
+        self.loader = self.yaml.CSafeLoader
+        self.dumper = self.yaml.CSafeDumper
+
+
+class TomlBackend:
+    '''the `toml` package, which parses TOML 0.5 in pure Python'''
+
+    name = 'toml'
+
+    def __init__(self):
+        import toml
+        self.loads: Callable[[str], Any] = toml.loads
+
+
+class TomllibBackend(TomlBackend):
+    '''the stdlib `tomllib` of Python 3.11+ or its backport `tomli`, which parse TOML 1.0 several times faster'''
+
+    name = 'tomllib'
+
+    def __init__(self):
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        self.loads = tomllib.loads
+
+
+class TomlWriter:
+    '''the writer of the `toml` package, the None values are dropped since TOML has no null'''
+
+    name = 'toml'
+
+    def __init__(self):
+        import toml
+        self.toml = toml
+
+    def dumps(self, py_obj: Any) -> str:
+        return self.toml.dumps(py_obj)
+
+
+class TomliWriter(TomlWriter):
+    '''the writer of `tomli_w`, which follows TOML 1.0 strictly'''
+
+    name = 'tomli_w'
+
+    def __init__(self):
+        import tomli_w
+        self.tomli_w = tomli_w
+
+    def dumps(self, py_obj: Any) -> str:
+        return self.tomli_w.dumps(drop_none(py_obj))
+
+
+def _expand_dropping(py_obj: Any) -> Expansion:
+    if isinstance(py_obj, dict):
+        keys = [k for k, v in py_obj.items() if v is not None]
+        return map(py_obj.__getitem__, keys), lambda values: dict(zip(keys, values))
+    elif isinstance(py_obj, list):
+        return (v for v in py_obj if v is not None), list
+    else:
+        return None
+
+
+def drop_none(py_obj: Any) -> Any:
+    '''drop the None values in the dicts and the lists, which can't be written to TOML'''
+    return rebuild(py_obj, _expand_dropping)
+
+
+# the factories of backends of each format in the order of preference,
+# the ones not installed raise ImportError. The writer of TOML is selected
+# separately, since tomllib can only parse.
+BACKENDS: Dict[str, Dict[str, Callable[[], Any]]] = {
+    'json': {
+        'orjson': OrjsonBackend,
+        'json': Backend,
+    },
+    'toml': {
+        'tomllib': TomllibBackend,
+        'toml': TomlBackend,
+    },
+    'toml-writer': {
+        'toml': TomlWriter,
+        'tomli_w': TomliWriter,
+    },
+    'yaml': {
+        'libyaml': LibyamlBackend,
+        'pyyaml': YamlBackend,
+    },
+}
+_selected: Dict[str, Optional[str]] = {}
+
+
+def env_name(fmt: str = 'json') -> str:
+    '''the environment variable to select the backend of fmt, e.g. `JSONFMT_TOML_WRITER_BACKEND`'''
+    return f'JSONFMT_{fmt.upper().replace("-", "_")}_BACKEND'
+
+
+def register(name: str, factory: Callable[[], Any], preferred: bool = False, fmt: str = 'json'):
+    '''add a backend of fmt, the preferred one is tried before the others'''
+    if preferred:
+        BACKENDS[fmt] = {name: factory, **BACKENDS[fmt]}
+    else:
+        BACKENDS[fmt] = {**BACKENDS[fmt], name: factory}
+    get_backend.cache_clear()
+
+
+def names(fmt: str = 'json') -> List[str]:
+    return ['auto', *BACKENDS[fmt]]
+
+
+def select(name: Optional[str], fmt: str = 'json'):
+    '''select the backend of fmt by name, which overrides the environment variable'''
+    _selected[fmt] = name
+    get_backend.cache_clear()
+    get_backend(fmt)  # fail early if the backend is unavailable
+
+
+@lru_cache(maxsize=None)
+def get_backend(fmt: str = 'json') -> Any:
+    '''
+    get the selected backend of fmt, or the one in the environment variable like `JSONFMT_JSON_BACKEND`,
+    the first installed one is used if it's "auto" or not specified
+    '''
+    factories = BACKENDS[fmt]
+    name = _selected.get(fmt) or os.environ.get(env_name(fmt)) or 'auto'
+    if name == 'auto':
+        errors = []
+        for factory in factories.values():
+            try:
+                return factory()
+            except ImportError as err:  # noqa: PERF203
+                errors.append(err)
+        raise errors[0]  # e.g. the parser itself is not installed
+
+    label = fmt.upper().replace('-', ' ')
+    if name not in factories:
+        raise ValueError(f'unknown {label} backend: {name}, options: {", ".join(names(fmt))}')
+    try:
+        return factories[name]()
+    except ImportError as err:
+        raise ValueError(f'the {label} backend {name} is unavailable: {err}') from err
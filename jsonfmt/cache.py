@@ -0,0 +1,107 @@
+'''
+A persistent cache for the objects which are costly to build.
+
+A cache file starts with a line of JSON holding the key and the stamps of depends,
+and the pickled value follows it, which is unpickled only if the header matches.
+Like any pickle, the files must not be writable by the others, so the cache
+directories and files are created private to the user, and the files which the
+others can write are skipped.
+'''
+
+# NOTE: json, pickle and hashlib are imported lazily to keep the startup fast
+
+import os
+import sys
+from importlib.machinery import PathFinder
+from typing import Any, Dict, Optional, Sequence
+
+from jsonfmt import __version__
+
+
+def get_cache_dir() -> Optional[str]:
+    '''the directory of cache, set the env JSONFMT_CACHE_DIR to empty to disable it'''
+    if 'JSONFMT_CACHE_DIR' in os.environ:
+        return os.environ['JSONFMT_CACHE_DIR'] or None
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'jsonfmt')
+
+
+def get_stamp(module: str) -> str:
+    '''
+    get the stamp of the installed module without importing it,
+    the stamp changes once the module has been upgraded or reinstalled
+    '''
+    spec = PathFinder.find_spec(module)
+    if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+        return 'missing'
+    stat = os.stat(spec.origin)
+    return f'{spec.origin}:{stat.st_mtime_ns}:{stat.st_size}'
+
+
+def get_stamps(depends: Sequence[str]) -> Dict[str, str]:
+    stamps = {module: get_stamp(module) for module in depends}
+    stamps.update(python=sys.version, jsonfmt=__version__)
+    return stamps
+
+
+def get_path(namespace: str, key: str) -> Optional[str]:
+    cache_dir = get_cache_dir()
+    if cache_dir is None:
+        return None
+    from hashlib import sha256
+    filename = sha256(key.encode('utf-8', 'surrogatepass')).hexdigest()
+    return os.path.join(cache_dir, namespace, f'{filename}.pickle')
+
+
+def is_private(fd: int) -> bool:
+    '''check if the file is owned by the user and can't be written by the others'''
+    stat = os.fstat(fd)
+    if stat.st_mode & 0o022:
+        return False
+    return not hasattr(os, 'getuid') or stat.st_uid == os.getuid()
+
+
+def get(namespace: str, key: str, depends: Sequence[str]) -> Any:
+    '''get the cached value, return None if it's missing or any of the depends has changed'''
+    path = get_path(namespace, key)
+    if path is None:
+        return None
+
+    import json
+    import pickle
+    try:
+        with open(path, 'rb') as fp:
+            if not is_private(fp.fileno()):
+                return None
+            header = json.loads(fp.readline())
+            if header != {'key': key, 'stamps': get_stamps(depends)}:
+                return None
+            # the value is unpickled only after the header was checked
+            return pickle.load(fp)
+    except Exception:
+        return None
+
+
+def put(namespace: str, key: str, depends: Sequence[str], value: Any):
+    '''put the value into the cache, the errors are ignored'''
+    path = get_path(namespace, key)
+    if path is None:
+        return
+
+    import json
+    import pickle
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        # the mode only applies to the last directory of makedirs
+        namespace_dir = os.path.dirname(path)
+        os.makedirs(os.path.dirname(namespace_dir), mode=0o700, exist_ok=True)
+        os.makedirs(namespace_dir, mode=0o700, exist_ok=True)
+        header = json.dumps({'key': key, 'stamps': get_stamps(depends)})
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, 'wb') as fp:
+            fp.write(header.encode('utf-8') + b'\n')
+            pickle.dump(value, fp)
+        os.replace(tmp_path, path)  # replace atomically for the concurrent processes
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
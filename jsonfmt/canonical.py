@@ -0,0 +1,164 @@
+'''
+The canonical serialization of data in the style of RFC 8785 (JCS), the
+semantically equal documents have the same serialization and fingerprint.
+
+- the keys of objects are sorted by their UTF-16 code units
+- the whitespaces are removed, and the strings are escaped minimally
+- the numbers are normalized as ECMAScript does, e.g. `1.0` -> `1`, `1e-07` -> `1e-7`
+
+Unlike JCS, the integers are kept exactly instead of being rounded to doubles.
+'''
+
+import json
+import re
+from datetime import date, time
+from decimal import Decimal
+from hashlib import sha256
+from itertools import islice
+from json.encoder import encode_basestring
+from typing import Any, Iterator, List
+
+# the numbers with a fraction or an exponent are floats in the output of json.dumps
+NUMBERS = re.compile(r'((?:"[^"\\]*(?:\\.[^"\\]*)*"|-?\d+(?![\d.eE])|[^"\d-]+)+)'
+                     r'|(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)')
+BATCH_SIZE = 4096  # the number of chunks hashed at a time
+# the chars out of BMP are sorted differently in UTF-16 and in Python
+ASTRAL_CHARS = re.compile('[\U00010000-\U0010FFFF]')
+
+
+class _Token(str):
+    '''the serialized piece of output on the stack'''
+
+
+def format_float(value: float) -> str:
+    '''format the float in the same way as Number.prototype.toString of ECMAScript'''
+    if value != value or value in (float('inf'), float('-inf')):
+        return json.dumps(value)  # NaN and Infinity are not in the JSON standard
+    elif value == 0:
+        return '0'
+    elif value.is_integer() and abs(value) < 1e16:
+        return str(int(value))  # the digits of repr are exact below 1e16
+
+    # the shortest digits that round trip, which are the same as ECMAScript's
+    sign, digits, exponent = Decimal(repr(value)).as_tuple()
+    str_digits = ''.join(map(str, digits))
+    significand = str_digits.rstrip('0')
+    k = len(significand)
+    n = exponent + len(str_digits)  # type: ignore  # the position of the decimal point
+    sign_char = '-' if sign else ''
+    if k <= n <= 21:
+        return sign_char + significand + '0' * (n - k)
+    elif 0 < n <= 21:
+        return sign_char + significand[:n] + '.' + significand[n:]
+    elif -6 < n <= 0:
+        return sign_char + '0.' + '0' * -n + significand
+    else:
+        fraction = '.' + significand[1:] if k > 1 else ''
+        return f'{sign_char}{significand[0]}{fraction}e{n - 1:+d}'
+
+
+def _format_number(match: re.Match) -> str:
+    if match.group(1):
+        return match.group(1)  # the strings and the others are unchanged
+    token = match.group(2)
+    if 'e' in token or 'E' in token:
+        return format_float(float(token))
+    elif token.endswith('.0'):
+        return '0' if token == '-0.0' else token[:-2]
+    else:
+        return token
+
+
+def _key_to_str(key: Any) -> str:
+    '''convert the key in the same way as json.dumps'''
+    if isinstance(key, str):
+        return key
+    elif key is True or key is False or key is None:
+        return json.dumps(key)
+    elif isinstance(key, float):
+        return format_float(key)
+    elif isinstance(key, int):
+        return int.__repr__(key)
+    else:
+        raise TypeError(f'keys must be str, int, float, bool or None, not {type(key).__name__}')
+
+
+def _sort_key(item: tuple) -> bytes:
+    return item[0].encode('utf-16-be', 'surrogatepass')
+
+
+def iter_canonical(py_obj: Any) -> Iterator[str]:
+    '''serialize the py_obj canonically piece by piece, the deep data is also supported'''
+    pending: List[Any] = [py_obj]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, _Token):
+            yield value
+        elif isinstance(value, str):
+            yield encode_basestring(value)
+        elif value is None:
+            yield 'null'
+        elif value is True:
+            yield 'true'
+        elif value is False:
+            yield 'false'
+        elif isinstance(value, int):
+            yield int.__repr__(value)
+        elif isinstance(value, float):
+            yield format_float(value)
+        elif isinstance(value, dict):
+            items = sorted(((_key_to_str(k), v) for k, v in value.items()), key=_sort_key)
+            pieces: List[Any] = [_Token('{')]
+            for idx, (key, sub_value) in enumerate(items):
+                pieces.append(_Token(f'{"," if idx else ""}{encode_basestring(key)}:'))
+                pieces.append(sub_value)
+            pieces.append(_Token('}'))
+            pending.extend(reversed(pieces))  # so that they are popped in order
+        elif isinstance(value, (list, tuple)):
+            pieces = [_Token('[')]
+            for idx, item in enumerate(value):
+                if idx:
+                    pieces.append(_Token(','))
+                pieces.append(item)
+            pieces.append(_Token(']'))
+            pending.extend(reversed(pieces))
+        elif isinstance(value, (date, time)):
+            yield encode_basestring(value.isoformat())  # the datetimes of TOML and YAML
+        else:
+            raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def _iter_chunks(py_obj: Any, str_keys: bool) -> Iterator[str]:
+    '''
+    serialize the py_obj canonically in chunks.
+
+    If all keys of the dicts are str (e.g. the data loaded from JSON), the
+    C encoder is used and then the floats in its output are normalized, which
+    is several times faster than the serializer in pure Python.
+    '''
+    if str_keys:
+        try:
+            text = json.dumps(py_obj, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        except (TypeError, RecursionError):
+            pass  # the other types of values and the deep data
+        else:
+            if text.isascii() or not ASTRAL_CHARS.search(text):
+                yield from map(_format_number, NUMBERS.finditer(text))
+                return
+    yield from iter_canonical(py_obj)
+
+
+def canonicalize(py_obj: Any, str_keys: bool = False) -> str:
+    '''serialize the py_obj canonically, see `_iter_chunks` for str_keys'''
+    return ''.join(_iter_chunks(py_obj, str_keys))
+
+
+def fingerprint(py_obj: Any, str_keys: bool = False) -> str:
+    '''the SHA-256 hex digest of the canonical serialization, which is hashed in chunks'''
+    digest = sha256()
+    chunks = iter(_iter_chunks(py_obj, str_keys))
+    while True:
+        batch = ''.join(islice(chunks, BATCH_SIZE))  # the small chunks are hashed together
+        if not batch:
+            return digest.hexdigest()
+        digest.update(batch.encode('utf-8', 'surrogatepass'))
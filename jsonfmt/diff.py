@@ -1,12 +1,265 @@
+import json
+import marshal
 import os
+import re
+from functools import partial
+from hashlib import blake2b
 from subprocess import call, getstatusoutput
-from typing import Optional
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple, Union
 
-from pygments import highlight
-from pygments.formatters import TerminalFormatter
-from pygments.lexers import DiffLexer
+from .utils import Expansion, print_inf, rebuild
 
-from .utils import print_inf
+Path = Tuple[Union[str, int], ...]
+Change = Tuple[str, Path, Any, Any]  # (op, path, old value, new value)
+PLAIN_KEY = re.compile(r'[^.\[\]\s]+')
+
+
+MARSHAL_VERSION = 2  # the later versions write the references to the repeated objects, so equal values may differ
+HASH_DEPTH = 8  # the deeper subtrees are hashed once, instead of being marshaled at every level
+LEAF_TYPES = frozenset([str, int, float, bool, type(None)])
+
+
+def hash_subtrees(root: Any, hashes: Dict[int, bytes]) -> None:
+    '''
+    hash each subtree of root once bottom-up, keyed by the ids of the dicts, lists and tuples.
+    A subtree is hashed from its marshaled keys and items, in which the children are replaced
+    by their hashes, so true, 1 and 1.0 are told apart, and the dicts in different orders are
+    different. The flat containers are cheap to marshal, so they are not hashed.
+    '''
+    def expand(node: Any) -> Expansion:
+        if type(node) in LEAF_TYPES or id(node) in hashes:
+            return None
+        elif isinstance(node, dict):
+            if not LEAF_TYPES.issuperset(map(type, node.values())):
+                return node.values(), partial(build, node, list(node))
+        elif isinstance(node, (list, tuple)):
+            if not LEAF_TYPES.issuperset(map(type, node)):
+                return node, partial(build, node, None)
+        return None
+
+    def build(node: Any, keys: Optional[list], items: list) -> Any:
+        # the hashes of children are wrapped in tuples, which can't be confused with the leaves
+        items = [(hashes[id(item)],) if id(item) in hashes else item for item in items]
+        content = (type(node).__name__, keys, items)
+        try:
+            data = marshal.dumps(content, MARSHAL_VERSION)
+        except ValueError:
+            # e.g. the datetimes of YAML and TOML
+            content = (content[0], keys and list(map(unmarshalable, keys)), list(map(unmarshalable, items)))
+            data = marshal.dumps(content, MARSHAL_VERSION)
+        hashes[id(node)] = blake2b(data, digest_size=16).digest()
+        return node
+
+    rebuild(root, expand)
+
+
+def unmarshalable(item: Any) -> Any:
+    '''represent the value which marshal doesn't support'''
+    try:
+        marshal.dumps(item, MARSHAL_VERSION)
+        return item
+    except ValueError:
+        return ('?', type(item).__name__, repr(item))
+
+
+def get_keys(values: List[Any], hashes: Optional[Dict[int, bytes]] = None) -> List[Hashable]:
+    '''
+    get the hashable keys to compare the values, the containers are marshaled, unless they
+    are too deep or some of them have been hashed, then all of them are hashed.
+    '''
+    if hashes is None:
+        hashes = {}
+    containers = [value for value in values if isinstance(value, (dict, list, tuple))]
+    if not any(id(value) in hashes for value in containers):
+        try:
+            return [marshal.dumps(value, MARSHAL_VERSION) if isinstance(value, (dict, list, tuple)) else get_key(value)
+                    for value in values]
+        except ValueError:
+            pass  # too deep, or unmarshalable
+    for value in containers:
+        if id(value) not in hashes:
+            hash_subtrees(value, hashes)
+    return [(hashes.get(id(value)) or marshal.dumps(value, MARSHAL_VERSION)) if isinstance(value, (dict, list, tuple))
+            else get_key(value) for value in values]
+
+
+def is_same(old: Any, new: Any, hashes: Optional[Dict[int, bytes]] = None) -> bool:
+    '''check if two values are the same, including the types of numbers'''
+    if old is new:
+        return True
+    elif type(old) is not type(new):
+        return False
+    elif isinstance(old, (dict, list, tuple)):
+        old_key, new_key = get_keys([old, new], hashes)
+        return old_key == new_key
+    elif old != new:
+        return isinstance(old, float) and old != old and new != new  # both are NaN
+    else:
+        return True
+
+
+def get_key(value: Any) -> Hashable:
+    '''get the hashable key to match the items of arrays'''
+    if isinstance(value, (dict, list, tuple)):
+        return get_keys([value])[0]
+    try:
+        return type(value), value
+    except TypeError:
+        return repr(value)
+
+
+def match_items(old_keys: list, new_keys: list) -> Iterator[Tuple[str, int, int, int, int]]:
+    '''
+    match the items of arrays like the patience diff, yield the opcodes of difflib
+    except "equal". The keys unique in both arrays are aligned by the longest
+    increasing subsequence in O(n log n), and the gaps between them are matched by difflib.
+    '''
+    from bisect import bisect_left
+    from collections import Counter
+    from difflib import SequenceMatcher
+
+    old_counts, new_counts = Counter(old_keys), Counter(new_keys)
+    new_indexes = {key: j for j, key in enumerate(new_keys) if new_counts[key] == 1}
+    pairs = [(i, new_indexes[key]) for i, key in enumerate(old_keys)
+             if old_counts[key] == 1 and key in new_indexes]
+
+    # find the longest increasing subsequence of the new indexes
+    tails: List[int] = []  # the smallest tail of the subsequences of each length
+    tail_pairs: List[int] = []
+    prev_pairs = [-1] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tail_pairs.append(n)
+        else:
+            tails[k] = j
+            tail_pairs[k] = n
+        prev_pairs[n] = tail_pairs[k - 1] if k else -1
+    anchors = []
+    n = tail_pairs[-1] if tail_pairs else -1
+    while n >= 0:
+        anchors.append(pairs[n])
+        n = prev_pairs[n]
+    anchors.reverse()
+
+    old_start = new_start = 0
+    for old_end, new_end in anchors + [(len(old_keys), len(new_keys))]:
+        if old_start < old_end or new_start < new_end:
+            matcher = SequenceMatcher(None, old_keys[old_start:old_end], new_keys[new_start:new_end])
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag != 'equal':
+                    yield tag, i1 + old_start, i2 + old_start, j1 + new_start, j2 + new_start
+        old_start, new_start = old_end + 1, new_end + 1
+
+
+def diff_objs(old: Any, new: Any) -> List[Change]:
+    '''
+    compare two values structurally, the unchanged subtrees are skipped by the comparison
+    in C, and the items of arrays are matched by `match_items`. The subtrees deeper than
+    HASH_DEPTH are hashed once, so they are not marshaled again at every level. The indexes
+    of the changes are valid when they are applied in order, like JSON Patch.
+    '''
+    hashes: Dict[int, bytes] = {}
+    changes: List[Change] = []
+    tasks: List[Change] = [('compare', (), old, new)]
+    while tasks:
+        task = tasks.pop()
+        op, path, old, new = task
+        if op != 'compare':
+            changes.append(task)
+            continue
+        elif len(path) == HASH_DEPTH:
+            hash_subtrees(old, hashes)
+            hash_subtrees(new, hashes)
+
+        if is_same(old, new, hashes):
+            continue
+
+        subtasks: List[Change] = []
+        if isinstance(old, dict) and isinstance(new, dict):
+            for key, value in old.items():
+                if key in new:
+                    subtasks.append(('compare', path + (key,), value, new[key]))
+                else:
+                    subtasks.append(('remove', path + (key,), value, None))
+            subtasks.extend(('add', path + (key,), None, value)
+                            for key, value in new.items() if key not in old)
+
+        elif isinstance(old, (list, tuple)) and isinstance(new, (list, tuple)):
+            # skip the common head and tail, only the middle part is matched
+            start, old_end, new_end = 0, len(old), len(new)
+            while start < min(old_end, new_end) and is_same(old[start], new[start], hashes):
+                start += 1
+            while old_end > start and new_end > start and is_same(old[old_end - 1], new[new_end - 1], hashes):
+                old_end -= 1
+                new_end -= 1
+
+            keys = get_keys([*old[start:old_end], *new[start:new_end]], hashes)
+            opcodes = match_items(keys[:old_end - start], keys[old_end - start:])
+            for _, i1, i2, j1, j2 in opcodes:
+                # the items before j1 are the same as the new array after applying the
+                # previous changes, so the changed items are located by the new indexes
+                i1, i2, j1, j2 = i1 + start, i2 + start, j1 + start, j2 + start
+                n_pairs = min(i2 - i1, j2 - j1)
+                subtasks.extend(('compare', path + (j1 + k,), old[i1 + k], new[j1 + k])
+                                for k in range(n_pairs))
+                subtasks.extend(('remove', path + (j1 + n_pairs,), old[i], None)
+                                for i in range(i1 + n_pairs, i2))
+                subtasks.extend(('add', path + (j,), None, new[j])
+                                for j in range(j1 + n_pairs, j2))
+        else:
+            subtasks.append(('replace', path, old, new))
+
+        tasks.extend(reversed(subtasks))
+
+    return changes
+
+
+def to_json_pointer(path: Path) -> str:
+    '''convert the path to JSON Pointer (RFC 6901)'''
+    return ''.join('/' + str(key).replace('~', '~0').replace('/', '~1') for key in path)
+
+
+def to_json_patch(changes: List[Change]) -> List[dict]:
+    '''convert the changes to JSON Patch (RFC 6902)'''
+    patch = []
+    for op, path, _, new in changes:
+        if op == 'remove':
+            patch.append({'op': op, 'path': to_json_pointer(path)})
+        else:
+            patch.append({'op': op, 'path': to_json_pointer(path), 'value': new})
+    return patch
+
+
+def format_path(path: Path) -> str:
+    '''format the path like the key path of "--set" and "--pop"'''
+    if not path:
+        return '(root)'
+
+    parts = []
+    for key in path:
+        if isinstance(key, str) and PLAIN_KEY.fullmatch(key):
+            parts.append(f'.{key}' if parts else key)
+        else:
+            parts.append(f'[{json.dumps(key, ensure_ascii=False, default=str)}]')
+    return ''.join(parts)
+
+
+def format_value(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def format_changes(changes: List[Change], colored: bool = False) -> Iterator[str]:
+    '''format the changes line by line, "+" for added, "-" for removed and "~" for replaced'''
+    for op, path, old, new in changes:
+        if op == 'add':
+            line, color = f'+ {format_path(path)}: {format_value(new)}', '\033[32m'
+        elif op == 'remove':
+            line, color = f'- {format_path(path)}: {format_value(old)}', '\033[31m'
+        else:
+            line, color = f'~ {format_path(path)}: {format_value(old)} -> {format_value(new)}', '\033[33m'
+        yield f'{color}{line}\033[0m\n' if colored else f'{line}\n'
 
 
 def cmp_by_diff(path1: str, path2: str):
@@ -15,6 +268,9 @@ def cmp_by_diff(path1: str, path2: str):
     if stat == 0:
         print_inf('no difference')
     else:
+        from pygments import highlight
+        from pygments.formatters import TerminalFormatter
+        from pygments.lexers import DiffLexer
         output = highlight(result, DiffLexer(), TerminalFormatter())
         print(output)
 
@@ -0,0 +1,201 @@
+'''Compile the edits of `--set` and `--pop` once, and apply them to the documents in one traversal'''
+
+import marshal
+from functools import lru_cache
+from typing import IO, Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from .utils import print_err, safe_eval
+
+ERRORS = (AttributeError, IndexError, KeyError, ValueError, TypeError)
+
+# the (path, action, value, edit) of an edit
+Op = Tuple[str, str, Any, str]
+
+
+def split_keys(path: str) -> List[str]:
+    '''split the key path like `foo.k1[0].k2` into keys'''
+    return path.replace(']', '').replace('[', '.').split('.')
+
+
+def parse_set(edit: str) -> Optional[Op]:
+    '''parse the edit like `foo.k1=v1`, the value is parsed only once'''
+    path, sep, value = edit.partition('=')
+    if not sep:
+        print_err(f'invalid key path: {edit}')
+        return None
+    py_value = safe_eval(value)
+    if isinstance(py_value, (list, dict, set)) or type(py_value) is tuple:
+        # the containers are copied from their marshaled bytes for each document,
+        # so that the edited documents never share them
+        return path, 'load', marshal.dumps(py_value), edit
+    return path, 'set', py_value, edit
+
+
+def parse_pop(edit: str) -> Op:
+    '''parse the edit like `foo.k2`'''
+    return edit, 'pop', None, edit
+
+
+def apply_action(py_obj: Any, idx: Union[str, int], action: str, value: Any):
+    '''set, append or pop the item of py_obj'''
+    if action == 'pop':
+        py_obj.pop(idx)
+        return
+    elif action == 'load':
+        value = marshal.loads(value)
+
+    if isinstance(py_obj, list) and len(py_obj) <= idx:  # type: ignore
+        py_obj.append(value)
+    else:
+        py_obj[idx] = value
+
+
+def apply_op(py_obj: Any, path: str, action: str, value: Any, edit: str):
+    '''apply an edit by walking down its key path'''
+    keys = split_keys(path)
+    try:
+        for key in keys[:-1]:
+            py_obj = py_obj[int(key) if isinstance(py_obj, list) else key]
+        apply_action(py_obj, int(keys[-1]) if isinstance(py_obj, list) else keys[-1], action, value)
+    except ERRORS:
+        print_err(f'invalid key path: {edit}')
+
+
+class EditTree:
+    '''
+    The edits are grouped by the key paths, so that the shared parents are
+    visited only once, and the values are parsed only once while compiling.
+
+    The edits take effect in the same order as they are added. The children
+    of a node are kept in order, and only the edits inside a dict may be
+    moved ahead to join their parents, because the edits of the other keys
+    never affect them, while the edits of a list may shift the indexes.
+    '''
+
+    __slots__ = ('ops', 'children', 'named')
+
+    def __init__(self):
+        self.ops: List[Tuple[str, Any, str]] = []  # the (action, value, edit) of this node
+        self.children: List[Tuple[str, EditTree]] = []
+        self.named: Dict[str, EditTree] = {}  # the children whose keys are not indexes
+
+    def add(self, path: str, action: str, value: Any, edit: str):
+        '''add the parsed edit'''
+        *parent_keys, last_key = split_keys(path)
+        node = self
+        for key in parent_keys:
+            if key in node.named:
+                node = node.named[key]
+            elif node.children and node.children[-1][0] == key:
+                node = node.children[-1][1]
+            else:
+                node = node._add_child(key)
+
+        # the ops of a node are applied before its children, so the op joins
+        # the node only if nothing has been applied after the node
+        last_child = node.children[-1] if node.children else None
+        if last_child and last_child[0] == last_key and not last_child[1].children:
+            node = last_child[1]
+        else:
+            node = node._add_child(last_key)
+        node.ops.append((action, value, edit))
+
+    def _add_child(self, key: str) -> 'EditTree':
+        child = EditTree()
+        self.children.append((key, child))
+        if not key.lstrip('-').isdigit():
+            self.named[key] = child  # the latest one
+        return child
+
+    def add_set(self, edit: str):
+        '''add the edit like `foo.k1=v1`'''
+        op = parse_set(edit)
+        if op is not None:
+            self.add(*op)
+
+    def add_pop(self, edit: str):
+        '''add the edit like `foo.k2`'''
+        self.add(*parse_pop(edit))
+
+    def iter_edits(self) -> Iterable[str]:
+        '''iterate over the edits of the subtree'''
+        pending = [self]
+        while pending:
+            node = pending.pop()
+            for _, _, edit in node.ops:
+                yield edit
+            pending.extend(child for _, child in reversed(node.children))
+
+    def _report_invalid(self):
+        for edit in self.iter_edits():
+            print_err(f'invalid key path: {edit}')
+
+    def _apply_ops(self, py_obj: Any, idx: Union[str, int]):
+        for action, value, edit in self.ops:
+            try:
+                apply_action(py_obj, idx, action, value)
+            except ERRORS:  # noqa: PERF203
+                print_err(f'invalid key path: {edit}')
+
+    def apply(self, py_obj: Any):
+        '''apply the edits to py_obj in place, the invalid edits are skipped'''
+        for key, node in self.children:
+            try:
+                idx = int(key) if isinstance(py_obj, list) else key
+            except ValueError:
+                node._report_invalid()
+                continue
+
+            node._apply_ops(py_obj, idx)
+            if node.children:
+                try:
+                    child_obj = py_obj[idx]
+                except ERRORS:
+                    for _, child in node.children:
+                        child._report_invalid()
+                else:
+                    node.apply(child_obj)
+
+
+@lru_cache(maxsize=8)
+def compile_edits(sets: Tuple[str, ...], pops: Tuple[str, ...]) -> Tuple[Op, ...]:
+    '''parse the edits only once, the sets are applied before the pops'''
+    ops = [op for op in map(parse_set, sets) if op is not None]
+    ops.extend(map(parse_pop, pops))
+    return tuple(ops)
+
+
+@lru_cache(maxsize=8)
+def compile_tree(sets: Tuple[str, ...], pops: Tuple[str, ...]) -> EditTree:
+    '''
+    build the trie of the edits, which pays off when the edits are applied to
+    many documents, e.g. the records in the streaming modes. Building the trie
+    of thousands of edits costs more than it saves for a single document.
+    '''
+    tree = EditTree()
+    for op in compile_edits(sets, pops):
+        tree.add(*op)
+    return tree
+
+
+def apply_ops(py_obj: Any, ops: Iterable[Op]):
+    '''apply the edits to py_obj in place one by one, the invalid edits are skipped'''
+    for op in ops:
+        apply_op(py_obj, *op)
+
+
+def read_edits(fp: IO) -> Tuple[List[str], List[str]]:
+    '''
+    read the edits from a file, one edit per line. The lines like `foo.k1=v1`
+    are sets, the others are pops. The blank lines and comments are ignored.
+    '''
+    sets, pops = [], []
+    for line in fp:
+        edit = line.strip()
+        if not edit or edit.startswith('#'):
+            continue
+        elif '=' in edit:
+            sets.append(edit)
+        else:
+            pops.append(edit)
+    return sets, pops
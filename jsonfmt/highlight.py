@@ -0,0 +1,139 @@
+'''Serialize the Python objects to JSON text colored with ANSI escape codes'''
+
+import re
+from io import StringIO
+from json.encoder import encode_basestring, encode_basestring_ascii
+from operator import itemgetter
+from typing import IO, Any, Callable, Iterator, List, Tuple
+
+# the same colors as the TerminalFormatter of Pygments
+KEY = '\033[94m'
+STRING = '\033[33m'
+NUMBER = '\033[34m'
+LITERAL = '\033[34m'
+RESET = '\033[39;49;00m'
+BATCH_SIZE = 4096  # the chunks are written to fp in batches
+ANSI_CODE = re.compile(r'\033\[[0-9;]*m')
+_END = object()  # the end of the items in a container
+
+
+def visible_len(text: str) -> int:
+    '''the length of text without the ANSI escape codes'''
+    return len(text) - sum(len(code) for code in ANSI_CODE.findall(text))
+
+
+def float_to_str(value: float) -> str:
+    '''convert the float to str in the same way as the json module'''
+    if value != value:
+        return 'NaN'
+    elif value == float('inf'):
+        return 'Infinity'
+    elif value == -float('inf'):
+        return '-Infinity'
+    else:
+        return float.__repr__(value)
+
+
+def key_to_str(key: Any) -> str:
+    '''convert the key of dict to str in the same way as the json module'''
+    if isinstance(key, str):
+        return key
+    elif key is True:
+        return 'true'
+    elif key is False:
+        return 'false'
+    elif key is None:
+        return 'null'
+    elif isinstance(key, float):
+        return float_to_str(key)
+    elif isinstance(key, int):
+        return int.__repr__(key)
+    else:
+        raise TypeError(f'keys must be str, int, float, bool or None, not {key.__class__.__name__}')
+
+
+def dumps(py_obj: Any, *, compact: bool, escape: bool, indent: str, sort_keys: bool) -> str:
+    '''serialize the py_obj to colored JSON text'''
+    buffer = StringIO()
+    dump(py_obj, buffer, compact=compact, escape=escape, indent=indent, sort_keys=sort_keys)
+    return buffer.getvalue()
+
+
+def dump(py_obj: Any, fp: IO, *, compact: bool, escape: bool, indent: str, sort_keys: bool):
+    '''
+    serialize the py_obj to colored JSON text in a single pass and write it to fp
+    chunk by chunk, the text without colors is the same as the output of `json.dumps`.
+    The containers are walked with an explicit stack, so the deep data is also supported.
+    '''
+    encode_str: Callable[[str], str] = encode_basestring_ascii if escape else encode_basestring
+    if compact:
+        indent_unit = None
+        item_sep, key_sep = ',', ':'
+    else:
+        indent_unit = '\t' if indent == 't' else ' ' * int(indent)
+        item_sep, key_sep = ',', ': '
+    literals = {True: f'{LITERAL}true{RESET}',
+                False: f'{LITERAL}false{RESET}',
+                None: f'{LITERAL}null{RESET}'}
+    chunks: List[str] = []
+    append = chunks.append
+
+    # the frames of the open containers: (the iterator of items, separator, closing, is dict)
+    stack: List[Tuple[Iterator, str, str, bool]] = []
+    obj, first = py_obj, True
+    while True:
+        if isinstance(obj, str):
+            append(f'{STRING}{encode_str(obj)}{RESET}')
+        elif obj is None or obj is True or obj is False:
+            append(literals[obj])
+        elif isinstance(obj, int):
+            append(f'{NUMBER}{int.__repr__(obj)}{RESET}')
+        elif isinstance(obj, float):
+            append(f'{NUMBER}{float_to_str(obj)}{RESET}')
+        elif isinstance(obj, (list, tuple, dict)):
+            is_dict = isinstance(obj, dict)
+            if not obj:
+                append('{}' if is_dict else '[]')
+            else:
+                if indent_unit is None:
+                    newline, separator, closing = '', item_sep, ''
+                else:
+                    closing = '\n' + indent_unit * len(stack)
+                    newline = closing + indent_unit
+                    separator = item_sep + newline
+                if is_dict:
+                    # sorted by the original keys like json, e.g. 9 is before 10
+                    items: Any = sorted(obj.items(), key=itemgetter(0)) if sort_keys else obj.items()
+                else:
+                    items = obj
+                append(('{' if is_dict else '[') + newline)
+                stack.append((iter(items), separator, closing + ('}' if is_dict else ']'), is_dict))
+                first = True
+        else:
+            raise TypeError(f'Object of type {obj.__class__.__name__} is not JSON serializable')
+
+        # find the next value, and close the finished containers
+        while stack:
+            iterator, separator, closing, is_dict = stack[-1]
+            item = next(iterator, _END)
+            if item is _END:
+                stack.pop()
+                append(closing)
+                first = False
+                continue
+            if not first:
+                append(separator)
+            first = False
+            if is_dict:
+                key, obj = item
+                append(f'{KEY}{encode_str(key_to_str(key))}{RESET}{key_sep}')
+            else:
+                obj = item
+            if len(chunks) >= BATCH_SIZE:
+                fp.write(''.join(chunks))
+                chunks.clear()
+            break
+        else:
+            break
+
+    fp.write(''.join(chunks))
@@ -1,75 +1,120 @@
 #!/usr/bin/env python
 '''JSON Formatter'''
 
+# NOTE: `jf` is frequently called by scripts, so the heavy dependencies
+#       (pygments, yaml, toml, jmespath, jsonpath_ng, pyperclip, etc.) are
+#       imported only on the code paths that need them.
 import io
 import json
+import mmap
 import os
+import re
 import sys
-from argparse import ArgumentParser
-from functools import partial
-from pydoc import pager
-from shutil import get_terminal_size
-from tempfile import NamedTemporaryFile, _TemporaryFileWrapper
-from typing import IO, Any, Callable, List, Optional, Tuple, Union
-from unittest.mock import patch
-
-import pyperclip
-import toml
-import yaml
-from jmespath import compile as parse_jmespath
-from jmespath.exceptions import JMESPathError
-from jmespath.parser import ParsedResult as JMESPath
-from jsonpath_ng import JSONPath
-from jsonpath_ng import parse as parse_jsonpath
-from jsonpath_ng.exceptions import JSONPathError
-from pygments import highlight
-from pygments.formatters import TerminalFormatter
-from pygments.lexers import JsonLexer, TOMLLexer, XmlLexer, YamlLexer
-
-from jsonfmt import __version__, utils, xml2py
-from jsonfmt.diff import compare
-
-QueryPath = Union[JMESPath, JSONPath]
+from argparse import ArgumentParser, Namespace
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache, partial
+from typing import (IO, TYPE_CHECKING, Any, Callable, Iterable, Iterator,
+                    List, Optional, Tuple, Union)
+
+from jsonfmt import __version__, backends, cache, highlight, schema, stream, utils
+
+if TYPE_CHECKING:
+    from jmespath.parser import ParsedResult as JMESPath
+    from jsonpath_ng import JSONPath
+
+QueryPath = Union['JMESPath', 'JSONPath']
+QUERY_LIBS = ['jmespath', 'jsonpath_ng']
 TEMP_CLIPBOARD = io.StringIO()
 
+FORMATS = ['json', 'toml', 'xml', 'yaml']
+LIST_STRATEGIES = ['extend', 'replace', 'unique']
+FILE_EXTENSIONS = {'.json': 'json', '.toml': 'toml', '.xml': 'xml',
+                   '.yaml': 'yaml', '.yml': 'yaml'}
+SNIFF_SIZE = 4096  # only the leading chars are inspected to detect the format
+OUTPUT_CHUNK_SIZE = 64 * 1024
+TOML_KEY_LINE = re.compile(r'[\w"\'.\- ]+=')
+YAML_KEY_LINE = re.compile(r'[^\s#:][^\n]*?:(\s|$)')
+
 
 class FormatError(Exception):
     pass
 
 
+class QueryError(Exception):
+    pass
+
+
 def is_clipboard_available() -> bool:
     '''check if the clipboard available'''
+    import pyperclip
     copy_fn, paste_fn = pyperclip.determine_clipboard()
     return copy_fn.__class__.__name__ != 'ClipboardUnavailable' \
         and paste_fn.__class__.__name__ != 'ClipboardUnavailable'
 
 
+def compile_querypath(querypath: str, querylang: str) -> QueryPath:
+    '''compile the querypath by the query language'''
+    if querylang == 'jmespath':
+        from jmespath import compile as parse_jmespath
+        from jmespath.exceptions import JMESPathError
+        try:
+            return parse_jmespath(querypath)
+        except JMESPathError as err:
+            raise QueryError(err) from err
+    else:
+        from jsonpath_ng import parse as parse_jsonpath
+        from jsonpath_ng.exceptions import JSONPathError
+        try:
+            return parse_jsonpath(querypath)
+        except (JSONPathError, AttributeError) as err:
+            raise QueryError(err) from err
+
+
+@lru_cache(maxsize=None)
 def parse_querypath(querypath: Optional[str], querylang: Optional[str]):
     '''parse the querypath'''
     if querypath is None:
         return None
     elif querylang is None:
-        parsers = [parse_jmespath, parse_jsonpath]
+        querylangs = ['jmespath', 'jsonpath']
     elif querylang in ['jmespath', 'jsonpath']:
-        parsers = [{'jmespath': parse_jmespath, 'jsonpath': parse_jsonpath}[querylang]]
+        querylangs = [querylang]
     else:
         utils.exit_with_error(f'invalid querylang: "{querylang}"')
 
-    for parse in parsers:
+    # the parsed querypath is cached on disk, then the next run can skip
+    # the costly parsing of JSONPath and the failed attempt of JMESPath
+    cache_key = f'{querylang or "auto"}:{querypath}'
+    qpath = cache.get('querypath', cache_key, QUERY_LIBS)
+    if qpath is not None:
+        return qpath
+
+    for lang in querylangs:
         try:
-            return parse(querypath)
-        except (JMESPathError, JSONPathError, AttributeError):  # noqa: PERF203
-            pass
+            qpath = compile_querypath(querypath, lang)
+        except QueryError:  # noqa: PERF203
+            continue
+        cache.put('querypath', cache_key, QUERY_LIBS, qpath)
+        return qpath
 
     utils.exit_with_error(f'invalid querypath expression: "{querypath}"')
 
 
 def extract_elements(qpath: QueryPath, py_obj: Any) -> Any:
     '''find and extract elements via JMESPath or JSONPath'''
-    if isinstance(qpath, JMESPath):
-        return qpath.search(py_obj)
+    if hasattr(qpath, 'search'):
+        # JMESPath
+        from jmespath.exceptions import JMESPathError
+        try:
+            return qpath.search(py_obj)
+        except JMESPathError as err:
+            raise QueryError(err) from err
     else:
-        items = [matched.value for matched in qpath.find(py_obj)]
+        from jsonpath_ng.exceptions import JSONPathError
+        try:
+            items = [matched.value for matched in qpath.find(py_obj)]
+        except JSONPathError as err:
+            raise QueryError(err) from err
         n_items = len(items)
         if n_items == 0:
             return None
@@ -79,187 +124,441 @@ def extract_elements(qpath: QueryPath, py_obj: Any) -> Any:
             return items
 
 
-def parse_to_pyobj(text: str, qpath: Optional[QueryPath]) -> Tuple[Any, str]:
-    '''read json, toml or yaml from IO and then match sub-element by jmespath'''
-    # parse json, toml or yaml to python object
-    loads_methods: list[tuple[str, Callable]] = [
-        ('json', json.loads),
-        ('toml', toml.loads),
-        ('xml', xml2py.loads),
-        ('yaml', partial(yaml.load, Loader=yaml.Loader)),
-    ]
-
-    # try to load the text to be parsed
-    for fmt, fn_loads in loads_methods:  # noqa: B007
-        try:
-            py_obj = fn_loads(text)
-            break
-        except Exception:  # noqa: S112
-            continue
+def sniff_formats(data: utils.InputData, filename: Optional[str] = None) -> List[str]:
+    '''guess the possible formats of the data, the most likely one comes first'''
+    head = utils.decode_text(data[:SNIFF_SIZE], 'ignore').lstrip(' \t\r\n')
+    # only TOML and YAML support the comment lines
+    has_comment = head.startswith('#')
+    while head.startswith('#'):
+        head = head.partition('\n')[2].lstrip()
+
+    first_char = head[:1]
+    first_line = head.partition('\n')[0]
+    if not first_char:
+        candidates = ['toml', 'yaml'] if has_comment else FORMATS
+    elif first_char == '<':
+        candidates = ['xml']
+    elif first_char == '{':
+        candidates = ['json', 'yaml']
+    elif first_char in '["':
+        candidates = ['json', 'toml', 'yaml']
+    elif head.startswith('---') or (first_char == '-' and head[1:2].isspace()):
+        candidates = ['yaml']
+    elif TOML_KEY_LINE.match(first_line):
+        candidates = ['toml', 'yaml']
+    elif YAML_KEY_LINE.match(first_line):
+        candidates = ['yaml']
     else:
-        raise FormatError("no supported format found")
-
-    if qpath is None:
-        return py_obj, fmt
-    else:
-        # match sub-elements via jmespath or jsonpath
-        return extract_elements(qpath, py_obj), fmt
+        candidates = FORMATS
 
+    if has_comment:
+        candidates = [fmt for fmt in candidates if fmt in ('toml', 'yaml')]
 
-def traverse_to_bottom(py_obj: Any, keys: str) -> Tuple[Any, Union[str, int]]:
-    '''traverse the nested py_obj to bottom by keys'''
-    def key_or_idx(obj: Any, key: str):
-        '''return str for dict and int for list'''
-        return int(key) if isinstance(obj, list) else key
+    # the extension of file decides the priority of the ambiguous candidates
+    ext_fmt = FILE_EXTENSIONS.get(os.path.splitext(filename or '')[1].lower())
+    if ext_fmt in candidates:
+        candidates = [ext_fmt] + [fmt for fmt in candidates if fmt != ext_fmt]
+    return candidates
 
-    # make sure the keys joined by `.`, and then split
-    separated_keys = keys.replace(']', '').replace('[', '.').split('.')
 
-    for k in separated_keys[:-1]:
-        py_obj = py_obj[key_or_idx(py_obj, k)]
+def get_loads_method(fmt: str) -> Callable:
+    '''get the method to parse the data of fmt, and import the parser on demand'''
+    if fmt == 'json':
+        return backends.get_backend().loads
+    elif fmt == 'toml':
+        return backends.get_backend('toml').loads
+    elif fmt == 'xml':
+        from jsonfmt import xml2py
+        return xml2py.loads
+    elif fmt == 'yaml':
+        return backends.get_backend('yaml').loads
+    else:
+        raise FormatError('Unknow format')
 
-    return py_obj, key_or_idx(py_obj, separated_keys[-1])
 
+def parse_to_pyobj(data: utils.InputData, qpath: Optional[QueryPath],
+                   fmt: Optional[str] = None,
+                   filename: Optional[str] = None) -> Tuple[Any, str]:
+    '''read json, toml or yaml from IO and then match sub-element by jmespath'''
+    text = None  # the data is decoded only when the parser needs it
 
-def modify_pyobj(py_obj: Any, sets: List[str], pops: List[str]):
-    '''add, modify or pop items for PyObj'''
-    for kv in sets:
+    # only try the candidate formats, unless the format is specified
+    candidates = [fmt] if fmt else sniff_formats(data, filename)
+    for fmt in candidates:  # noqa: B020
         try:
-            keys, value = kv.split('=')
-            bottom, last_k = traverse_to_bottom(py_obj, keys)
-            if isinstance(bottom, list) and len(bottom) <= last_k:  # type: ignore
-                bottom.append(utils.safe_eval(value))
+            if fmt == 'yaml' and not isinstance(data, str):
+                # YAML reads the bytes or the mapped file by chunks
+                if isinstance(data, mmap.mmap):
+                    data.seek(0)
+                py_obj = get_loads_method(fmt)(data)
+            elif fmt == 'json' and text is None:
+                py_obj = get_loads_method(fmt)(data)  # the JSON backend decodes the data by itself
             else:
-                bottom[last_k] = utils.safe_eval(value)  # type: ignore
-        except (IndexError, KeyError, ValueError, TypeError):  # noqa: PERF203
-            utils.print_err(f'invalid key path: {kv}')
+                if text is None:
+                    text = utils.decode_text(data)
+                py_obj = get_loads_method(fmt)(text)
+            break
+        except Exception as err:  # noqa: PERF203
+            error = err
             continue
+    else:
+        if len(candidates) == 1:
+            raise FormatError(f'invalid {candidates[0]} data: {error}')
+        else:
+            raise FormatError("no supported format found")
 
-    for keys in pops:
-        try:
-            bottom, last_k = traverse_to_bottom(py_obj, keys)
-            bottom.pop(last_k)
-        except (IndexError, KeyError):  # noqa: PERF203
-            utils.print_err(f'invalid key path: {keys}')
-            continue
+    if qpath is None:
+        return py_obj, fmt  # type: ignore
+    elif isinstance(py_obj, backends.Documents):
+        # query the documents one by one, and drop the unmatched ones
+        matched = [elem for elem in (extract_elements(qpath, doc) for doc in py_obj) if elem is not None]
+        return backends.Documents(matched) if matched else None, fmt  # type: ignore
+    else:
+        # match sub-elements via jmespath or jsonpath
+        return extract_elements(qpath, py_obj), fmt  # type: ignore
 
 
-def get_overview(py_obj: Any) -> Any:
-    '''extract the structure of the data'''
-    def clip(value: Any) -> Any:
-        if isinstance(value, str):
-            return '...'
-        elif isinstance(value, (list, tuple)):
-            return []
-        elif isinstance(value, dict):
-            return {k: clip(v) for k, v in value.items()}
+def modify_pyobj(py_obj: Any, sets: List[str], pops: List[str], use_tree: bool = False):
+    '''
+    add, modify or pop items for PyObj. The edits are compiled only once, and their
+    trie is used if use_tree, or for the documents of a stream after the first one.
+    '''
+    from jsonfmt.edits import apply_ops, compile_edits, compile_tree
+
+    for doc in py_obj if isinstance(py_obj, backends.Documents) else [py_obj]:
+        if use_tree:
+            compile_tree(tuple(sets), tuple(pops)).apply(doc)
         else:
-            return value
+            apply_ops(doc, compile_edits(tuple(sets), tuple(pops)))
+        use_tree = True
 
-    if isinstance(py_obj, list) and len(py_obj) > 1:
-        return [clip(py_obj[0])]
+
+def get_overview(py_obj: Any) -> Any:
+    '''extract the structure of the data, the elements of lists are merged into one'''
+    merged = schema.Schema()
+    merged.add(py_obj)
+    return merged.to_py()
+
+
+def merge_lists(base: list, data: list, strategy: str) -> list:
+    '''merge the data list to the base list by the strategy'''
+    if strategy == 'replace':
+        return data
+    elif strategy == 'unique':
+        from jsonfmt.diff import get_key
+        seen = set(map(get_key, base))
+        for item in data:
+            key = get_key(item)
+            if key not in seen:
+                seen.add(key)
+                base.append(item)
     else:
-        return clip(py_obj)
+        base.extend(data)
+    return base
+
+
+def deep_update(base: dict, data: dict, list_strategy: str):
+    '''update the base dict recursively, the nested dicts are merged instead of replaced'''
+    pending = [(base, data)]
+    while pending:
+        dst, src = pending.pop()
+        for key, value in src.items():
+            old = dst.get(key)
+            if isinstance(old, dict) and isinstance(value, dict):
+                pending.append((old, value))
+            elif isinstance(old, list) and isinstance(value, list):
+                dst[key] = merge_lists(old, value, list_strategy)
+            else:
+                dst[key] = value
+
 
+def merge_objs(base: list | dict, *datas, deep: bool = False,
+               list_strategy: str = 'extend') -> list | dict:
+    '''merge the datas to base, the nested data are merged only if deep is True'''
+    if not isinstance(base, (list, dict)):
+        raise FormatError('the base must be a list or dict')
 
-def merge_objs(base: list | dict, *datas) -> list | dict:
-    '''merge the datas to base'''
-    if isinstance(base, list):
-        for data in datas:
+    for data in datas:
+        if isinstance(base, list):
             if isinstance(data, list):
-                base.extend(data)
+                base = merge_lists(base, data, list_strategy)
             else:
                 base.append(data)
-        return base
-    elif isinstance(base, dict):
-        for data in datas:
-            if isinstance(data, dict):
-                base.update(data)
+        elif isinstance(data, dict):
+            if deep:
+                deep_update(base, data, list_strategy)
             else:
-                print(f'invalid data: {data}')
-        return base
-    else:
-        raise FormatError('the base must be a list or dict')
-
+                base.update(data)
+        else:
+            utils.print_err(f'invalid data: {data}')
+    return base
+
+
+def dump(py_obj: Any, fmt: str, fp: IO, *,
+         compact: bool, escape: bool,
+         indent: str, sort_keys: bool, colored: bool = False):
+    '''format the py_obj and write the text to fp chunk by chunk'''
+    if colored and fmt != 'json':
+        # only JSON is colored while serializing, the others fall back to Pygments
+        text = format_to_text(py_obj, fmt, compact=compact, escape=escape,
+                              indent=indent, sort_keys=sort_keys)
+        fp.write(get_highlighter(fmt)(text))
+        return
 
-def format_to_text(py_obj: Any, fmt: str, *,
-                   compact: bool, escape: bool,
-                   indent: str, sort_keys: bool) -> str:
-    '''format the py_obj to text'''
+    # the text is stripped and ends with a newline
+    writer = utils.StrippedWriter(fp)
+    if isinstance(py_obj, backends.Documents) and fmt != 'yaml':
+        py_obj = list(py_obj)  # the documents are formatted as an array in the other formats
     if fmt == 'json':
-        if compact:
-            result = json.dumps(py_obj, ensure_ascii=escape, sort_keys=sort_keys,
-                                separators=(',', ':'))
-        else:
-            result = json.dumps(py_obj, ensure_ascii=escape, sort_keys=sort_keys,
-                                indent='\t' if indent == 't' else int(indent))
+        try:
+            text = None if colored else backends.get_backend().dumps(
+                py_obj, compact=compact, escape=escape, indent=indent, sort_keys=sort_keys)
+            if colored:
+                highlight.dump(py_obj, writer, compact=compact, escape=escape,
+                               indent=indent, sort_keys=sort_keys)
+            elif text is not None:
+                # write the text by chunks, so that the output starts before the whole is copied
+                for start in range(0, len(text), OUTPUT_CHUNK_SIZE):
+                    writer.write(text[start:start + OUTPUT_CHUNK_SIZE])
+                    writer.write_batch()
+            elif compact:
+                # the C encoder of one-shot is much faster than the chunked one
+                writer.write(json.dumps(py_obj, ensure_ascii=escape, sort_keys=sort_keys,
+                                        separators=(',', ':')))
+            else:
+                encoder = json.JSONEncoder(ensure_ascii=escape, sort_keys=sort_keys,
+                                           indent='\t' if indent == 't' else int(indent))
+                writer.writelines(encoder.iterencode(py_obj))
+        except TypeError as err:
+            raise FormatError(err) from err
     elif fmt == 'toml':
         if not isinstance(py_obj, dict):
             msg = 'the pyobj must be a Mapping when format to toml'
             raise FormatError(msg)
-        result = toml.dumps(utils.sort_dict(py_obj) if sort_keys else py_obj)
+        toml_writer = backends.get_backend('toml-writer')
+        writer.write(toml_writer.dumps(utils.sort_dict(py_obj) if sort_keys else py_obj))
     elif fmt == 'xml':
-        result = xml2py.dumps(py_obj, indent, compact, sort_keys)
+        from jsonfmt import xml2py
+        xml2py.dump(py_obj, writer, indent, compact, sort_keys)
     elif fmt == 'yaml':
-        y_indent = None if indent == 't' else int(indent)
-        result = yaml.safe_dump(py_obj, allow_unicode=not escape, indent=y_indent,
-                                sort_keys=sort_keys)
+        backend = backends.get_backend('yaml')
+        if backend.buffered:
+            writer.batch_size = 1  # the chunks are large enough to be written through
+        docs = py_obj if isinstance(py_obj, backends.Documents) else [py_obj]
+        backend.dump_all(docs, writer, escape=escape, indent=indent, sort_keys=sort_keys)
     else:
         raise FormatError('Unknow format')
+    writer.close()
 
-    return result.strip() + '\n'
 
+def format_to_text(py_obj: Any, fmt: str, *,
+                   compact: bool, escape: bool,
+                   indent: str, sort_keys: bool, colored: bool = False) -> str:
+    '''format the py_obj to text, and highlight it for the TTY if colored is True'''
+    buffer = io.StringIO()
+    dump(py_obj, fmt, buffer, compact=compact, escape=escape,
+         indent=indent, sort_keys=sort_keys, colored=colored)
+    return buffer.getvalue()
+
+
+def process_records(records: Iterable[Any], qpath: Optional[QueryPath], *,
+                    overview: bool, sets: Optional[list], pops: Optional[list]
+                    ) -> Iterator[Any]:
+    '''query and modify the records one by one'''
+    merged = schema.Schema() if overview else None
+    edited = False  # the first record is edited without the trie of edits
+    for idx, py_obj in enumerate(records, start=1):
+        try:
+            if qpath is not None:
+                py_obj = extract_elements(qpath, py_obj)
+                if py_obj is None:
+                    continue  # skip the unmatched records
+
+            if sets or pops:
+                modify_pyobj(py_obj, sets, pops, use_tree=edited)  # type: ignore
+                edited = True
+        except QueryError as err:  # noqa: PERF203
+            utils.print_err(f'record {idx}: {err}')
+            continue
+
+        if merged is not None:
+            # only the structure of records is kept, so the memory is bounded
+            merged.add(py_obj)
+        else:
+            yield py_obj
+
+    if merged is not None and merged.count:
+        yield merged.to_py()
 
-def get_output_fp(input_file: IO, cp2clip: bool, diff: bool,
-                  overview: bool, overwrite: bool) -> IO:
+
+def format_records(py_objs: Iterable[Any], fmt: str, *,
+                   compact: bool, escape: bool,
+                   indent: str, sort_keys: bool, colored: bool = False) -> Iterator[str]:
+    '''format the records one by one as separate documents'''
+    n_output = 0
+    for py_obj in py_objs:
+        try:
+            formated_text = format_to_text(py_obj, fmt,
+                                           compact=compact, escape=escape,
+                                           indent=indent, sort_keys=sort_keys,
+                                           colored=colored)
+        except FormatError as err:  # noqa: PERF203
+            utils.print_err(err)
+            continue
+
+        # the YAML documents in a stream are separated by "---"
+        yield formated_text if n_output == 0 or fmt != 'yaml' else f'---\n{formated_text}'
+        n_output += 1
+
+
+def format_array(py_objs: Iterable[Any], fmt: str, *,
+                 compact: bool, escape: bool,
+                 indent: str, sort_keys: bool, colored: bool = False) -> Iterator[str]:
+    '''format the elements one by one as the items of an array'''
+    if fmt == 'toml':
+        raise FormatError('the pyobj must be a Mapping when format to toml')
+    elif colored and fmt != 'json':
+        # highlight the pieces with Pygments, since the colored head and tail can't be cut off
+        highlighter = get_highlighter(fmt)
+        pieces = format_array(py_objs, fmt, compact=compact, escape=escape,
+                              indent=indent, sort_keys=sort_keys)
+        yield from (highlighter(piece) for piece in pieces if piece)
+        return
+
+    # format each element as a single-element array, and then cut off
+    # the beginning and the end of array to get the item
+    head, sep, tail = {
+        'json': ('[', ',', ']\n') if compact else ('[\n', ',\n', '\n]\n'),
+        'xml': ('<root>', '', '</root>\n') if compact else ('<?xml version="1.0" ?>\n<root>\n', '', '</root>\n'),
+        'yaml': ('', '', ''),
+    }[fmt]
+
+    n_items = 0
+    for py_obj in py_objs:
+        text = format_to_text([py_obj], fmt,
+                              compact=compact, escape=escape,
+                              indent=indent, sort_keys=sort_keys, colored=colored)
+        item = text[len(head):len(text) - len(tail)]
+        yield f'{sep}{item}' if n_items else f'{head}{item}'
+        n_items += 1
+
+    if n_items:
+        yield tail
+    else:
+        yield format_to_text([], fmt, compact=compact, escape=escape,
+                             indent=indent, sort_keys=sort_keys, colored=colored)
+
+
+def get_output_fp(input_file: Union[str, IO], cp2clip: bool, diff: bool,
+                  overview: bool) -> IO:
     if cp2clip:
         return TEMP_CLIPBOARD
     elif diff:
-        name = f"_{os.path.basename(input_file.name)}"
+        filename = input_file if isinstance(input_file, str) else input_file.name
+        name = f"_{os.path.basename(filename)}"
+        from tempfile import NamedTemporaryFile
         return NamedTemporaryFile(mode='w+', prefix='jf-', suffix=name, delete=False)
-    elif input_file is sys.stdin or overview:
-        return sys.stdout
-    elif overwrite:
-        return input_file
     else:
         return sys.stdout
 
 
-def output(output_fp: IO, text: str, fmt: str):
-    if hasattr(output_fp, 'name') and output_fp.name == '<stdout>':
-        if output_fp.isatty():
-            # highlight the text when output to TTY divice
-            lexer_cls = {'json': JsonLexer, 'toml': TOMLLexer,
-                         'xml': XmlLexer, 'yaml': YamlLexer}[fmt]
-            colored_text = highlight(text, lexer_cls(), TerminalFormatter())
-            win_w, win_h = get_terminal_size()
-            # use pager when line-hight > screen hight or
-            if text.count('\n') >= win_h or len(text) > win_w * (win_h - 1):
-                with patch("sys.stdin.isatty", lambda *_: True):
-                    pager(colored_text)
-            else:
-                output_fp.write(colored_text)
-        else:
-            output_fp.write(text)
-    elif isinstance(output_fp, (io.TextIOWrapper, _TemporaryFileWrapper)):
+def is_stdout(output_fp: IO) -> bool:
+    return hasattr(output_fp, 'name') and output_fp.name == '<stdout>'
+
+
+def get_highlighter(fmt: str) -> Callable[[str], str]:
+    '''get the function to highlight the text of fmt'''
+    from pygments import highlight
+    from pygments.formatters import TerminalFormatter
+    from pygments.lexers import JsonLexer, TOMLLexer, XmlLexer, YamlLexer
+
+    lexer_cls = {'json': JsonLexer, 'toml': TOMLLexer,
+                 'xml': XmlLexer, 'yaml': YamlLexer}[fmt]
+    return partial(highlight, lexer=lexer_cls(), formatter=TerminalFormatter())
+
+
+def prepare_output_fp(output_fp: IO):
+    '''get the output_fp ready to be written'''
+    # the temporary file wraps a regular file as the attribute "file"
+    if isinstance(getattr(output_fp, 'file', output_fp), io.TextIOWrapper):
         # For regular files, changes the position to the beginning
         # and truncates the file to zero length before overwriting
         output_fp.seek(0)
         output_fp.truncate()
-        output_fp.write(text)
     elif output_fp is TEMP_CLIPBOARD and TEMP_CLIPBOARD.tell() != 0:
         output_fp.write('\n\n')
-        output_fp.write(text)
+
+
+@contextmanager
+def open_output(output_fp: IO, fmt: str, colored: bool = False) -> Iterator[IO]:
+    '''get the writer of output_fp, the colored text was already highlighted while serializing'''
+    if is_stdout(output_fp):
+        if output_fp.isatty():
+            from jsonfmt.pager import Pager
+
+            # highlight the text when output to TTY divice, and page it if it's too long
+            with Pager(output_fp) as pager:
+                if colored:
+                    yield pager
+                else:
+                    buffer = io.StringIO()
+                    yield buffer
+                    pager.write(get_highlighter(fmt)(buffer.getvalue()))
+        else:
+            yield output_fp
     else:
-        output_fp.write(text)
+        prepare_output_fp(output_fp)
+        yield output_fp
     output_fp.flush()
 
 
-def process(input_text: str, qpath: Optional[QueryPath], to_fmt: Optional[str], *,
+def output(output_fp: IO, text: str, fmt: str, colored: bool = False):
+    with open_output(output_fp, fmt, colored) as writer:
+        writer.write(text)
+
+
+def output_stream(output_fp: IO, texts: Iterable[str], fmt: str, colored: bool = False):
+    '''write the texts one by one as soon as each of them is ready'''
+    if is_stdout(output_fp):
+        colorful = output_fp.isatty()
+    else:
+        colorful = False
+        prepare_output_fp(output_fp)
+
+    if colorful:
+        from jsonfmt.pager import Pager
+
+        # the pager starts as soon as the texts exceed the first screen
+        highlighter = None if colored else get_highlighter(fmt)
+        with Pager(output_fp) as pager:
+            for text in filter(None, texts):
+                pager.write(text if highlighter is None else highlighter(text))
+                pager.flush()
+    else:
+        for text in texts:
+            output_fp.write(text)
+    output_fp.flush()
+
+
+def process(input_data: utils.InputData, qpath: Optional[QueryPath], to_fmt: Optional[str], *,
             compact: bool, escape: bool, indent: str, overview: bool,
-            sort_keys: bool, sets: Optional[list], pops: Optional[list]):
+            sort_keys: bool, sets: Optional[list], pops: Optional[list],
+            from_fmt: Optional[str] = None, filename: Optional[str] = None,
+            colored: bool = False):
     # parse and format
-    py_obj, fmt = parse_to_pyobj(input_text, qpath)
+    py_obj, to_fmt = transform(input_data, qpath, to_fmt, overview=overview,
+                               sets=sets, pops=pops, from_fmt=from_fmt, filename=filename)
+    formated_text = format_to_text(py_obj, to_fmt,
+                                   compact=compact, escape=escape,
+                                   indent=indent, sort_keys=sort_keys, colored=colored)
+    return formated_text, to_fmt
+
+
+def transform(input_data: utils.InputData, qpath: Optional[QueryPath], to_fmt: Optional[str], *,
+              overview: bool, sets: Optional[list], pops: Optional[list],
+              from_fmt: Optional[str] = None, filename: Optional[str] = None) -> Tuple[Any, str]:
+    '''parse, query and modify the input data, return the py_obj and the format to output'''
+    py_obj, fmt = parse_to_pyobj(input_data, qpath, from_fmt, filename)
 
     if sets or pops:
         modify_pyobj(py_obj, sets, pops)  # type: ignore
@@ -267,27 +566,70 @@ def process(input_text: str, qpath: Optional[QueryPath], to_fmt: Optional[str],
     if overview:
         py_obj = get_overview(py_obj)
 
-    to_fmt = to_fmt or fmt
-    formated_text = format_to_text(py_obj, to_fmt,
-                                   compact=compact, escape=escape,
-                                   indent=indent, sort_keys=sort_keys)
-    return formated_text, to_fmt
+    return py_obj, to_fmt or fmt
+
+
+def process_file(file: Union[str, IO], qpath: Optional[QueryPath], to_fmt: Optional[str],
+                 **options) -> Tuple[str, str]:
+    '''read the input file and process it'''
+    with utils.open_input(file) as input_data:
+        filename = file if isinstance(file, str) else file.name
+        return process(input_data, qpath, to_fmt, filename=filename, **options)
+
+
+def check_file(file: Union[str, IO], qpath: Optional[QueryPath], to_fmt: Optional[str],
+               **options) -> bool:
+    '''check if the content of file is the same as the processing result'''
+    with utils.open_input(file) as input_data:
+        filename = file if isinstance(file, str) else file.name
+        formated, _ = process(input_data, qpath, to_fmt, filename=filename, **options)
+        return utils.is_same_content(input_data, formated)
+
+
+def overwrite_file(path: str, text: str):
+    '''overwrite the file with the text, the unchanged file is left alone'''
+    if utils.write_if_changed(path, text):
+        utils.print_inf(f'result written to {os.path.basename(path)}')
+    else:
+        utils.print_inf(f'{os.path.basename(path)} is unchanged')
+
+
+def load_file(file: Union[str, IO], qpath: Optional[QueryPath], to_fmt: Optional[str],
+              **options) -> Tuple[Any, str]:
+    '''read the input file and transform it, the result is formatted while outputting'''
+    with utils.open_input(file) as input_data:
+        filename = file if isinstance(file, str) else file.name
+        return transform(input_data, qpath, to_fmt, filename=filename, **options)
+
+
+def hash_file(file: Union[str, IO], qpath: Optional[QueryPath], *,
+              sets: Optional[list], pops: Optional[list],
+              from_fmt: Optional[str] = None) -> str:
+    '''get the fingerprint of the canonical data of the file, without formatting it'''
+    from jsonfmt import canonical
+    py_obj, fmt = load_file(file, qpath, None, overview=False,
+                            sets=sets, pops=pops, from_fmt=from_fmt)
+    try:
+        # only the keys of YAML may be the other types than str
+        return canonical.fingerprint(py_obj, str_keys=fmt != 'yaml')
+    except TypeError as err:
+        raise FormatError(err) from err
 
 
 def merge_files(files: list[str], qpath: Optional[QueryPath], to_fmt: Optional[str], *,
                 compact: bool, escape: bool, indent: str, overview: bool,
-                sort_keys: bool, sets: Optional[list], pops: Optional[list]):
+                sort_keys: bool, sets: Optional[list], pops: Optional[list],
+                from_fmt: Optional[str] = None, colored: bool = False,
+                deep: bool = False, list_strategy: str = 'extend', jobs: int = 1):
     '''merge the files to base_file'''
-    objs = []
-    fmt = 'json'
-    for idx, file in enumerate(files):
-        with open(file) as fp:
-            if idx == 0:
-                obj, fmt = parse_to_pyobj(fp.read(), None)
-            else:
-                obj = parse_to_pyobj(fp.read(), None)[0]
-            objs.append(obj)
-    py_obj = merge_objs(objs[0], *objs[1:])
+    # the files are parsed in parallel, and merged into the base one by one in order,
+    # so that only a few of the parsed data are held besides the result
+    fn_load = partial(load_file, qpath=None, to_fmt=None, overview=False,
+                      sets=None, pops=None, from_fmt=from_fmt)
+    results = utils.map_in_order(fn_load, files, jobs)
+    py_obj, fmt = next(results)()
+    for get_result in results:
+        py_obj = merge_objs(py_obj, get_result()[0], deep=deep, list_strategy=list_strategy)
 
     if qpath is not None:
         py_obj = extract_elements(qpath, py_obj)
@@ -301,7 +643,7 @@ def merge_files(files: list[str], qpath: Optional[QueryPath], to_fmt: Optional[s
     to_fmt = to_fmt or fmt
     formated_text = format_to_text(py_obj, to_fmt,
                                    compact=compact, escape=escape,
-                                   indent=indent, sort_keys=sort_keys)
+                                   indent=indent, sort_keys=sort_keys, colored=colored)
     return formated_text, to_fmt
 
 
@@ -312,25 +654,57 @@ def parse_cmdline_args() -> ArgumentParser:
     mode.add_argument('-C', dest='cp2clip', action='store_true',
                       help='CopyMode, which will copy the processing result to the clipboard')
     mode.add_argument('-d', dest='diff', action='store_true',
-                      help='DiffMode, which compares the difference between the two input data')
+                      help='DiffMode, which compares the structures of the two input data, '
+                           'and prints the changes by key paths')
     mode.add_argument('-D', dest='difftool', type=str,
-                      help='DifftoolMode, similar to "DiffMode". You can specify a tool to perform diff comparisons')
+                      help='DifftoolMode, which compares the two formated input data by a diff tool')
     mode.add_argument('-o', dest='overview', action='store_true',
                       help='OverviewMode, which can display an overview of the structure of the data')
     mode.add_argument('-O', dest='overwrite', action='store_true',
-                      help='OverwriteMode, which will overwrite the original file with the formated text')
+                      help='OverwriteMode, which will overwrite the original file with the formated text '
+                           'if it is changed')
+    mode.add_argument('--check', action='store_true',
+                      help='CheckMode, which prints the files that are not the same as the formated text '
+                           'and exits with 1, nothing will be written')
+    mode.add_argument('--hash', action='store_true',
+                      help='HashMode, which prints the fingerprint of the canonical data of each input, '
+                           'and exits with 1 if they are not all the same')
     parser.add_argument('-m', dest='merge', action='store_true',
                       help='MergeMode, merge the input data from the second one into the first one')
+    parser.add_argument('--deep-merge', action='store_true',
+                        help='merge the nested dicts recursively instead of replacing them in MergeMode')
+    parser.add_argument('--list-merge', choices=LIST_STRATEGIES, default='extend',
+                        help='how to merge the lists in MergeMode: append the items, replace the list, '
+                             'or append only the items not in it (default: %(default)s)')
+    parser.add_argument('--patch', action='store_true',
+                        help='print the changes as JSON Patch (RFC 6902) in DiffMode')
+    streaming = parser.add_mutually_exclusive_group()
+    streaming.add_argument('-A', dest='array', action='store_true',
+                           help='ArrayMode, stream the elements of the top-level JSON array one by one '
+                                'with memory bounded by the largest element. Querying, modifying and '
+                                'formatting are applied to each element, and the unmatched ones are skipped')
+    streaming.add_argument('-L', dest='lines', action='store_true',
+                           help='LinesMode, process the JSON Lines (NDJSON) input, or the documents of '
+                                'YAML stream, record by record with constant memory. Querying, modifying and '
+                                'formatting are applied to each record, and the unmatched records are skipped')
 
     parser.add_argument('-c', dest='compact', action='store_true',
                         help='Suppress all whitespace separation (most compact), only valid for JSON')
     parser.add_argument('-e', dest='escape', action='store_true',
                         help='escape non-ASCII characters')
-    parser.add_argument('-f', dest='format', choices=['json', 'toml', 'xml', 'yaml'],
+    parser.add_argument('-f', dest='format', choices=FORMATS,
                         help='the format to output (default: same as input)')
+    parser.add_argument('-F', dest='input_format', choices=FORMATS,
+                        help='the format of the input data (default: auto-detect)')
     parser.add_argument('-i', dest='indent', metavar='{0-8 or t}',
                         choices='012345678t', default='2',
                         help='number of spaces for indentation (default: %(default)s)')
+    parser.add_argument('-j', dest='jobs', metavar='N', type=int, default=1,
+                        help='number of processes to process the files in parallel, '
+                             '0 means the number of CPUs (default: %(default)s)')
+    parser.add_argument('--json-backend', choices=backends.names(),
+                        help='the library to parse and serialize JSON, the output is the same with any of them '
+                             f'(default: ${backends.env_name()} or auto, which uses the fastest installed one)')
     parser.add_argument('-l', dest='querylang', choices=['jmespath', 'jsonpath'],
                         help='query language for extracting data (default: auto-detect)')
     parser.add_argument('-p', dest='querypath', type=str,
@@ -341,6 +715,18 @@ def parse_cmdline_args() -> ArgumentParser:
                         help='key-value pairs to add or modify (seperated by `;`)')
     parser.add_argument('--pop', metavar="'k1;foo.k2;k3[i]'",
                         help='key-value pairs to delete (seperated by `;`)')
+    parser.add_argument('--edits', metavar='FILE',
+                        help='the file of edits to apply, one per line, '
+                             'the lines like `k1=v1` are sets and the others are pops')
+    parser.add_argument('--profile', choices=['table', 'json'],
+                        help='time each stage of processing, and print the report to stderr '
+                             'as a table or JSON')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write the timed calls of each file to FILE as Chrome trace events, '
+                             'which can be opened by Perfetto or chrome://tracing')
+    parser.add_argument('--mem-report', choices=['table', 'json'],
+                        help='trace the memory by tracemalloc, and print the peak and retained memory '
+                             'of each stage and the size of the parsed objects to stderr as a table or JSON')
     parser.add_argument(dest='files', nargs='*',
                         help='the files that will be processed')
     parser.add_argument('-v', '--version', action='version',
@@ -348,13 +734,39 @@ def parse_cmdline_args() -> ArgumentParser:
     return parser
 
 
-def main():  # noqa: C901
+def main():
     parser = parse_cmdline_args()
     args = parser.parse_args()
 
+    if args.mem_report and (args.profile or args.trace):
+        utils.exit_with_error('--mem-report can not be used with --profile or --trace')
+    if args.mem_report:
+        from jsonfmt import profiler
+        with profiler.accounting(sys.modules[__name__], args.mem_report):
+            run(args)
+    elif args.profile or args.trace:
+        from jsonfmt import profiler
+        with profiler.profiling(sys.modules[__name__], args.profile, args.trace):
+            run(args)
+    else:
+        run(args)
+
+
+def run(args: Namespace):  # noqa: C901
+    '''process the files as the command line arguments'''
     # check and parse the querypath
     querypath = parse_querypath(args.querypath, args.querylang)
 
+    # check the backends
+    try:
+        if args.json_backend or os.environ.get(backends.env_name()):
+            backends.select(args.json_backend)
+        for kind in backends.BACKENDS:
+            if kind != 'json' and os.environ.get(backends.env_name(kind)):
+                backends.select(None, kind)
+    except ValueError as err:
+        utils.exit_with_error(err)
+
     # check if the clipboard is available
     if args.cp2clip and not is_clipboard_available():
         utils.exit_with_error('clipboard unavailable')
@@ -364,73 +776,211 @@ def main():  # noqa: C901
     n_files = len(files)
 
     # check the diff mode
-    diff_mode: bool = args.diff or args.difftool  # type: ignore
-    if diff_mode and len(files) != 2:
+    if (args.diff or args.difftool) and len(files) != 2:
         utils.exit_with_error('less than two files')
+    if args.patch and not args.diff:
+        utils.exit_with_error('--patch is only valid in DiffMode')
+    # the built-in DiffMode compares the data, while DifftoolMode compares the formated files
+    diff_mode = bool(args.difftool)
     sort_keys = True if diff_mode else args.sort_keys
 
     # get sets and pops
     sets = [k.strip() for k in args.set.split(';')] if args.set else []
     pops = [k.strip() for k in args.pop.split(';')] if args.pop else []
+    if args.edits:
+        from jsonfmt.edits import read_edits
+        try:
+            with open(args.edits, encoding='utf-8') as edits_fp:
+                file_sets, file_pops = read_edits(edits_fp)
+        except OSError as err:
+            utils.exit_with_error(err)
+        sets.extend(file_sets)
+        pops.extend(file_pops)
+
+    no_output = diff_mode or args.cp2clip or args.overwrite or args.check
+    output_title = n_files > 1 and not no_output
+    # the results are highlighted while formatting when they are printed to the TTY
+    colored = sys.stdout.isatty() and not no_output
 
-    output_title = n_files > 1 and not (diff_mode or args.cp2clip or args.overwrite)
+    # check the streaming modes
+    if args.lines or args.array:
+        if args.overwrite or args.check or args.diff or args.hash:
+            mode_name = ('CheckMode' if args.check else 'DiffMode' if args.diff else
+                         'HashMode' if args.hash else 'OverwriteMode')
+            utils.exit_with_error(f'{mode_name} is not supported in streaming modes')
+        if args.input_format not in (None, 'json', 'yaml') or (args.array and args.input_format == 'yaml'):
+            utils.exit_with_error('only JSON input is supported in ArrayMode, and JSON or YAML in LinesMode')
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
 
     # merge mode
+    if (args.deep_merge or args.list_merge != 'extend') and not args.merge:
+        utils.exit_with_error('--deep-merge and --list-merge are only valid in MergeMode')
     if args.merge:
         files = [f for f in files if isinstance(f, str)]
         if len(files) < 2:
             utils.exit_with_error('less than two files')
+        if args.check or args.hash:
+            mode_name = 'CheckMode' if args.check else 'HashMode'
+            utils.exit_with_error(f'{mode_name} is not supported in MergeMode')
         try:
             formated, fmt = merge_files(files, querypath, args.format,
                                         compact=args.compact, escape=args.escape,
                                         indent=args.indent, overview=args.overview,
-                                        sort_keys=sort_keys, sets=sets, pops=pops)
-        except (FormatError, JMESPathError, JSONPathError, OSError) as err:
+                                        sort_keys=sort_keys, sets=sets, pops=pops,
+                                        from_fmt=args.input_format, colored=colored,
+                                        deep=args.deep_merge, list_strategy=args.list_merge,
+                                        jobs=jobs)
+            if args.overwrite:
+                overwrite_file(files[0], formated)
+            else:
+                output_fp = get_output_fp(files[0], args.cp2clip, diff_mode, args.overview)
+                output(output_fp, formated, fmt, colored)
+        except (FormatError, QueryError, OSError) as err:
             utils.exit_with_error(err)
+        return
 
-        with open(files[0], 'r+') as fp:
-            output_fp = get_output_fp(fp, args.cp2clip, diff_mode,
-                                      args.overview, args.overwrite)
-            output(output_fp, formated, fmt)
+    # diff mode
+    if args.diff:
+        from jsonfmt import diff
+        try:
+            (old, fmt), (new, _) = [load_file(file, querypath, args.format, overview=False,
+                                              sets=sets, pops=pops, from_fmt=args.input_format)
+                                    for file in files]
+            changes = diff.diff_objs(old, new)
+            colored = sys.stdout.isatty()
+            if args.patch:
+                fmt = args.format or 'json'
+                with open_output(sys.stdout, fmt, colored) as writer:
+                    dump(diff.to_json_patch(changes), fmt, writer, compact=args.compact,
+                         escape=args.escape, indent=args.indent, sort_keys=False, colored=colored)
+            elif changes:
+                output_stream(sys.stdout, diff.format_changes(changes, colored), fmt, colored)
+            else:
+                utils.print_inf('no difference')
+        except (FormatError, QueryError, OSError, ValueError) as err:
+            utils.exit_with_error(err)
+        return
+
+    # hash mode
+    if args.hash:
+        fn_hash = partial(hash_file, qpath=querypath, sets=sets, pops=pops,
+                          from_fmt=args.input_format)
+        fingerprints = set()
+        hash_failed = False
+        for file, get_result in zip(files, utils.map_in_order(fn_hash, files, jobs)):
+            try:
+                fingerprint = get_result()
+            except (FormatError, QueryError, OSError, ValueError) as err:
+                hash_failed = True
+                utils.print_err(err)
+                continue
+            except KeyboardInterrupt:
+                utils.exit_with_error('user canceled')
+            fingerprints.add(fingerprint)
+            # the same layout as the output of sha256sum
+            print(f'{fingerprint}  {file if isinstance(file, str) else "-"}')
+        # the inputs are equal only if they all have the same fingerprint
+        if hash_failed or len(fingerprints) > 1:
+            sys.exit(1)
         return
 
+    # process the files in parallel, and then output the results in the original order
+    format_options = dict(compact=args.compact, escape=args.escape,
+                          indent=args.indent, sort_keys=sort_keys, colored=colored)
+    # without the workers, the results are formatted while being written to the output,
+    # except the overwritten files, which are compared with the whole result before writing
+    chunked_output = (jobs <= 1 or n_files <= 1) and not (args.overwrite or args.check)
+    if args.lines or args.array:
+        results: Iterable = [None] * n_files  # the streaming modes process the files one by one
+    elif args.check:
+        fn_check = partial(check_file, qpath=querypath, to_fmt=args.format,
+                           overview=args.overview, sets=sets, pops=pops,
+                           from_fmt=args.input_format, **format_options)
+        results = utils.map_in_order(fn_check, files, jobs)
+    elif chunked_output:
+        fn_load = partial(load_file, qpath=querypath, to_fmt=args.format,
+                          overview=args.overview, sets=sets, pops=pops,
+                          from_fmt=args.input_format)
+        results = utils.map_in_order(fn_load, files)
+    else:
+        fn_process = partial(process_file, qpath=querypath, to_fmt=args.format,
+                             overview=args.overview, sets=sets, pops=pops,
+                             from_fmt=args.input_format, **format_options)
+        results = utils.map_in_order(fn_process, files, jobs)
+
     diff_files = []
-    for idx, file in enumerate(files, start=1):
+    check_failed = False
+    for idx, (file, get_result) in enumerate(zip(files, results), start=1):
         if output_title:
             title = f'{idx}. {file}' if idx == 1 else f'\n{idx}. {file}'
             print(f'\033[37m{title}\033[0m')
 
         try:
-            # process the input data file
-            input_fp = open(file, 'r+') if isinstance(file, str) else file
-            formated, fmt = process(input_fp.read(), querypath, args.format,
-                                    compact=args.compact, escape=args.escape,
-                                    indent=args.indent, overview=args.overview,
-                                    sort_keys=sort_keys, sets=sets, pops=pops)
-            # output the result
-            output_fp = get_output_fp(input_fp, args.cp2clip, diff_mode,
-                                      args.overview, args.overwrite)
-            output(output_fp, formated, fmt)
+            if args.lines or args.array:
+                # process and output the records one by one
+                # the documents of YAML stream are read in LinesMode, and output in YAML by default
+                from_yaml = args.lines and (args.input_format or FILE_EXTENSIONS.get(
+                    os.path.splitext(file)[1].lower() if isinstance(file, str) else '')) == 'yaml'
+                fmt = args.format or ('yaml' if from_yaml else 'json')
+                output_fp = get_output_fp(file, args.cp2clip, diff_mode, args.overview)
+                input_fp = open(file, encoding='utf-8-sig') if isinstance(file, str) else file
+                with input_fp if input_fp is not sys.stdin else nullcontext(input_fp):
+                    if from_yaml:
+                        records = stream.iter_yaml_documents(input_fp)
+                        format_fn: Callable = format_records
+                    elif args.lines:
+                        records = stream.iter_json_lines(input_fp)
+                        format_fn = format_records
+                    else:
+                        records = stream.iter_json_array(input_fp)
+                        format_fn = format_array
+                    py_objs = process_records(records, querypath, overview=args.overview,
+                                              sets=sets, pops=pops)
+                    texts = format_fn(py_objs, fmt, **format_options)
+                    output_stream(output_fp, texts, fmt, colored)
+            elif args.check:
+                # print the files which are not formated
+                if not get_result():
+                    check_failed = True
+                    print(file if isinstance(file, str) else file.name)
+                continue
+            elif args.overwrite and isinstance(file, str):
+                formated, fmt = get_result()
+                overwrite_file(file, formated)
+                continue
+            elif chunked_output:
+                # format the py_obj and write it to the output chunk by chunk
+                py_obj, fmt = get_result()
+                output_fp = get_output_fp(file, args.cp2clip, diff_mode, args.overview)
+                with open_output(output_fp, fmt, colored) as writer:
+                    dump(py_obj, fmt, writer, **format_options)
+            else:
+                # get the result of processing
+                formated, fmt = get_result()
+                # output the result
+                output_fp = get_output_fp(file, args.cp2clip, diff_mode, args.overview)
+                output(output_fp, formated, fmt, colored)
 
             if diff_mode:
                 diff_files.append(output_fp.name)
-            elif args.overwrite:
-                utils.print_inf(f'result written to {os.path.basename(output_fp.name)}')
 
-        except (FormatError, JMESPathError, JSONPathError, OSError) as err:
+        except (FormatError, QueryError, OSError, ValueError) as err:
+            check_failed = True
             utils.print_err(err)
         except KeyboardInterrupt:
             utils.exit_with_error('user canceled')
-        finally:
-            input_fp = locals().get('input_fp')
-            if isinstance(input_fp, io.TextIOBase):
-                input_fp.close()
+
+    if args.check and check_failed:
+        sys.exit(1)
 
     if args.cp2clip:
+        import pyperclip
         TEMP_CLIPBOARD.seek(0)
         pyperclip.copy(TEMP_CLIPBOARD.read())
         utils.print_inf('result copied to clipboard')
     elif diff_mode:
+        from jsonfmt.diff import compare
         try:
             compare(diff_files[0], diff_files[1], args.difftool)
         except (OSError, ValueError, IndexError) as err:
@@ -0,0 +1,126 @@
+'''Page the long output on the TTY'''
+
+import os
+import subprocess
+import sys
+from shutil import get_terminal_size, which
+from typing import IO, List, Optional
+
+from jsonfmt.highlight import visible_len
+
+
+def get_pager_cmd() -> Optional[str]:
+    '''get the command of pager, return None if the pager can't be piped into'''
+    if sys.platform == 'win32' or os.environ.get('TERM') in ('dumb', 'emacs'):
+        return None
+    pager_cmd = os.environ.get('MANPAGER') or os.environ.get('PAGER')
+    if pager_cmd:
+        return pager_cmd
+    return 'less -R' if which('less') else None
+
+
+class Pager:
+    '''
+    A file-like writer of the TTY: the text is printed directly if it fits in
+    the first screen, otherwise it is streamed into the pager chunk by chunk
+    '''
+
+    def __init__(self, output_fp: IO):
+        self.output_fp = output_fp
+        self.width, self.height = get_terminal_size()
+        self.head: Optional[List[str]] = []  # the text buffered before the decision
+        self.n_lines = 0
+        self.n_chars = 0
+        self.process: Optional[subprocess.Popen] = None
+        self.broken = False
+        self.deferred = False
+
+    def __enter__(self) -> 'Pager':
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def write(self, text: str) -> int:
+        # only the first screen is needed to decide whether to page,
+        # so the text is checked piece by piece until the decision is made
+        pos, step = 0, self.width * self.height
+        while self.head is not None and not self.deferred and pos < len(text):
+            self.write_to_head(text[pos:pos + step])
+            pos += step
+
+        if pos < len(text):
+            rest = text[pos:] if pos else text
+            if self.head is None:
+                self.write_to_pager(rest)
+            else:
+                self.head.append(rest)
+        return len(text)
+
+    def write_to_head(self, text: str):
+        self.head.append(text)  # type: ignore
+        self.n_lines += text.count('\n')
+        self.n_chars += visible_len(text)
+        if self.is_too_long():
+            self.start_pager()
+
+    def is_too_long(self) -> bool:
+        # use pager when line-hight > screen hight or the lines will be wrapped out of screen
+        return self.n_lines >= self.height or self.n_chars > self.width * (self.height - 1)
+
+    def start_pager(self):
+        '''start the pager and feed it the buffered head'''
+        pager_cmd = get_pager_cmd()
+        if pager_cmd is None:
+            # keep buffering, and then page the whole text with pydoc on closing
+            self.deferred = True
+            return
+
+        try:
+            self.process = subprocess.Popen(pager_cmd, shell=True, stdin=subprocess.PIPE,
+                                            text=True, errors='backslashreplace')
+        except OSError:
+            self.deferred = True
+            return
+        head, self.head = self.head, None
+        self.write_to_pager(''.join(head or []))
+
+    def write_to_pager(self, text: str):
+        if self.broken or self.process is None or self.process.stdin is None:
+            return
+        try:
+            self.process.stdin.write(text)
+        except OSError:
+            self.broken = True  # the pager was quit before reading all of the text
+
+    def flush(self):
+        if self.head is None and not self.broken and self.process and self.process.stdin:
+            try:
+                self.process.stdin.flush()
+            except OSError:
+                self.broken = True
+
+    def close(self):
+        if self.process is not None:
+            try:
+                self.process.stdin.close()  # type: ignore
+            except OSError:
+                pass
+            while True:
+                try:
+                    self.process.wait()
+                    break
+                except KeyboardInterrupt:
+                    # ignore ctl-c like the pager itself does
+                    pass
+        elif self.head is not None:
+            text = ''.join(self.head)
+            if self.deferred:
+                from pydoc import pager
+                from unittest.mock import patch
+                with patch("sys.stdin.isatty", lambda *_: True):
+                    pager(text)
+            else:
+                self.output_fp.write(text)
+                self.output_fp.flush()
+        self.head = None
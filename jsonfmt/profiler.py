@@ -0,0 +1,521 @@
+'''
+Time the stages of processing, e.g. reading, parsing, querying and formatting,
+or account the memory of them by tracemalloc.
+
+The stages are timed by replacing the functions of them with timed wrappers
+while profiling, and the originals are restored afterwards, so the hooks
+cost nothing when profiling is off.
+'''
+
+import json
+import os
+import sys
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from functools import partial, wraps
+from time import perf_counter_ns
+from types import ModuleType
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from jsonfmt import utils
+
+# the stages timed in the module of jsonfmt, in the order of processing
+STAGES = {
+    'sniff_formats': 'detect',
+    'parse_to_pyobj': 'parse',
+    'extract_elements': 'query',
+    'modify_pyobj': 'modify',
+    'get_overview': 'overview',
+    'merge_objs': 'merge',
+    'dump': 'format',
+}
+# the functions which write the output, only the outermost one is timed, since `output` opens
+# the output by `open_output`
+OUTPUT_FUNCTIONS = ['output', 'output_stream']
+# the functions which process a whole file, the time of a file out of the stages is "other"
+FILE_FUNCTIONS = ['process_file', 'check_file', 'load_file', 'hash_file']
+
+# the (calls, total, self) of a stage in nanoseconds
+Stats = Dict[str, List[int]]
+# the (stage, name, start, duration, pid) of a call
+Event = Tuple[str, str, int, int, int]
+
+
+class Profile:
+    '''the timings collected in the current process'''
+
+    __slots__ = ('pid', 'start', 'stats', 'files', 'events', 'stack')
+
+    def __init__(self, tracing: bool = False):
+        self.pid = os.getpid()
+        self.start = perf_counter_ns()
+        self.stats: Stats = {}
+        self.files: Dict[str, int] = {}  # the total time of each file
+        self.events: Optional[List[Event]] = [] if tracing else None
+        self.stack: List[int] = []  # the time of the children of the running calls
+
+    def enter(self) -> int:
+        self.stack.append(0)
+        return perf_counter_ns()
+
+    def leave(self, stage: str, start: int, name: Optional[str] = None):
+        duration = perf_counter_ns() - start
+        children = self.stack.pop()
+        if self.stack:
+            self.stack[-1] += duration
+        stats = self.stats.get(stage)
+        if stats is None:
+            stats = self.stats[stage] = [0, 0, 0]
+        stats[0] += 1
+        stats[1] += duration
+        stats[2] += duration - children
+        if name is not None:
+            self.files[name] = self.files.get(name, 0) + duration
+        if self.events is not None:
+            self.events.append((stage, name or stage, start, duration, os.getpid()))
+
+    def merge(self, other: 'Profile'):
+        '''merge the timings collected in a worker process'''
+        for stage, (calls, total, self_time) in other.stats.items():
+            merged = self.stats.setdefault(stage, [0, 0, 0])
+            merged[0] += calls
+            merged[1] += total
+            merged[2] += self_time
+        for name, duration in other.files.items():
+            self.files[name] = self.files.get(name, 0) + duration
+        if self.events is not None and other.events:
+            self.events.extend(other.events)
+
+
+class MemoryProfile(Profile):
+    '''
+    The memory allocated by each stage, which is traced by tracemalloc. The
+    stats of a stage are the (calls, peak, retained) of its largest call, the
+    peak is above the memory before the call, and the retained is left after it.
+    '''
+
+    __slots__ = ('peak', 'objects')
+
+    def __init__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        super().__init__()
+        self.start = tracemalloc.get_traced_memory()[0]
+        self.peak = self.start  # the peak of the whole run
+        self.objects = [0, 0, 0]  # the (count, largest, total) size of the parsed objects
+        self.stack: List[List[int]] = []  # type: ignore  # the (start, peak) of the running calls
+
+    def fold_peak(self):
+        '''keep the peak so far before resetting it'''
+        peak = tracemalloc.get_traced_memory()[1]
+        if self.stack and peak > self.stack[-1][1]:
+            self.stack[-1][1] = peak
+        if peak > self.peak:
+            self.peak = peak
+        tracemalloc.reset_peak()
+
+    def enter(self) -> int:
+        self.fold_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        self.stack.append([current, current])
+        return current
+
+    def leave(self, stage: str, start: int, name: Optional[str] = None):
+        current, peak = tracemalloc.get_traced_memory()
+        _, children_peak = self.stack.pop()
+        peak = max(peak, children_peak)
+        if self.stack and peak > self.stack[-1][1]:
+            self.stack[-1][1] = peak
+
+        stats = self.stats.setdefault(stage, [0, 0, 0])
+        stats[0] += 1
+        stats[1] = max(stats[1], peak - start)
+        stats[2] = max(stats[2], current - start)
+        if name is not None:
+            self.files[name] = max(self.files.get(name, 0), peak - start)
+
+    def measure(self, py_obj: Any):
+        '''add up the size of the parsed object, the memory used by measuring is not accounted'''
+        self.fold_peak()
+        size = graph_size(py_obj)
+        tracemalloc.reset_peak()
+        self.objects[0] += 1
+        self.objects[1] = max(self.objects[1], size)
+        self.objects[2] += size
+
+    def merge(self, other: 'Profile'):
+        '''merge the stats collected in a worker process'''
+        assert isinstance(other, MemoryProfile)
+        for stage, (calls, peak, retained) in other.stats.items():
+            merged = self.stats.setdefault(stage, [0, 0, 0])
+            merged[0] += calls
+            merged[1] = max(merged[1], peak)
+            merged[2] = max(merged[2], retained)
+        for name, peak in other.files.items():
+            self.files[name] = max(self.files.get(name, 0), peak)
+        self.objects[0] += other.objects[0]
+        self.objects[1] = max(self.objects[1], other.objects[1])
+        self.objects[2] += other.objects[2]
+        # the total peak is the largest one of the processes
+        self.peak = max(self.peak, self.start + other.peak - other.start)
+
+
+def graph_size(py_obj: Any) -> int:
+    '''the size of the object and all objects referred by it, the shared ones are counted once'''
+    seen = set()
+    size = 0
+    pending = [py_obj]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set)):
+            pending.extend(obj)
+    return size
+
+
+_profile: Optional[Profile] = None
+_originals: List[Tuple[Any, str, Any]] = []  # the (owner, attribute, original) replaced
+_writing = False  # whether an output function is running
+
+
+def timed(stage: str, func: Callable) -> Callable:
+    '''wrap the func to time its calls as the stage'''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        profile = _profile
+        if profile is None:
+            return func(*args, **kwargs)
+        start = profile.enter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.leave(stage, start)
+    return wrapper
+
+
+def timed_file(func: Callable) -> Callable:
+    '''wrap the func which processes a whole file, the nested ones are not timed again'''
+    @wraps(func)
+    def wrapper(file, *args, **kwargs):
+        profile = _profile
+        if profile is None or profile.stack:
+            return func(file, *args, **kwargs)
+        start = profile.enter()
+        try:
+            return func(file, *args, **kwargs)
+        finally:
+            profile.leave('other', start, file if isinstance(file, str) else '<stdin>')
+    return wrapper
+
+
+def timed_output(func: Callable) -> Callable:
+    '''wrap the func which writes the output, the nested ones are not timed again'''
+    timed_func = timed('output', func)
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        global _writing
+        if _writing:
+            return func(*args, **kwargs)
+        _writing = True
+        try:
+            return timed_func(*args, **kwargs)
+        finally:
+            _writing = False
+    return wrapper
+
+
+def timed_enter(stage: str, func: Callable) -> Callable:
+    '''wrap the context manager to time entering it, e.g. reading the input'''
+    @wraps(func)
+    @contextmanager
+    def wrapper(*args, **kwargs):
+        profile = _profile
+        with ExitStack() as stack:
+            if profile is None:
+                yield stack.enter_context(func(*args, **kwargs))
+                return
+            start = profile.enter()
+            try:
+                value = stack.enter_context(func(*args, **kwargs))
+            finally:
+                profile.leave(stage, start)
+            yield value
+    return wrapper
+
+
+def timed_context(stage: str, func: Callable) -> Callable:
+    '''wrap the context manager to time the whole of it, e.g. writing the output'''
+    @wraps(func)
+    @contextmanager
+    def wrapper(*args, **kwargs):
+        profile = _profile
+        if profile is None or (stage == 'output' and _writing):  # opened by `output`
+            with func(*args, **kwargs) as value:
+                yield value
+            return
+        start = profile.enter()
+        try:
+            with func(*args, **kwargs) as value:
+                yield value
+        finally:
+            profile.leave(stage, start)
+    return wrapper
+
+
+def timed_iter(stage: str, func: Callable) -> Callable:
+    '''wrap the generator to time producing each item, e.g. parsing the records'''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        iterator = iter(func(*args, **kwargs))
+        while True:
+            profile = _profile
+            if profile is None:
+                yield from iterator
+                return
+            start = profile.enter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                profile.leave(stage, start)
+            yield item
+    return wrapper
+
+
+def timed_highlighter(get_highlighter: Callable) -> Callable:
+    '''wrap the getter of highlighters to time highlighting'''
+    @wraps(get_highlighter)
+    def wrapper(fmt: str) -> Callable[[str], str]:
+        return timed('highlight', get_highlighter(fmt))
+    return wrapper
+
+
+def measured_loader(get_loads_method: Callable) -> Callable:
+    '''wrap the getter of parsers to measure the parsed objects'''
+    @wraps(get_loads_method)
+    def wrapper(fmt: str) -> Callable:
+        loads = get_loads_method(fmt)
+
+        def measured_loads(*args, **kwargs):
+            py_obj = loads(*args, **kwargs)
+            if isinstance(_profile, MemoryProfile):
+                _profile.measure(py_obj)
+            return py_obj
+        return measured_loads
+    return wrapper
+
+
+def measured_iter(func: Callable) -> Callable:
+    '''wrap the generator to measure the parsed records'''
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        for py_obj in func(*args, **kwargs):
+            if isinstance(_profile, MemoryProfile):
+                _profile.measure(py_obj)
+            yield py_obj
+    return wrapper
+
+
+def timed_map_in_order(map_in_order: Callable) -> Callable:
+    '''wrap the map_in_order to collect the timings of the worker processes'''
+    @wraps(map_in_order)
+    def wrapper(fn: Callable, items, jobs: int = 1):
+        if isinstance(_profile, MemoryProfile):
+            new_profile: Callable[[], Profile] = MemoryProfile
+        else:
+            new_profile = partial(Profile, _profile is not None and _profile.events is not None)
+        task = partial(run_task, fn, new_profile, os.getpid())
+        for get_result in map_in_order(task, items, jobs):
+            yield partial(merge_result, get_result)
+    return wrapper
+
+
+def run_task(fn: Callable, new_profile: Callable[[], Profile], main_pid: int,
+             item: Any) -> Tuple[Any, Optional[Profile]]:
+    '''call fn with the item, and return the timings of this task with the result if it's in a worker process'''
+    global _profile
+    if os.getpid() == main_pid:
+        return fn(item), None
+
+    # each task has its own profile, which is merged into the main one with the result
+    _profile = new_profile()
+    if not _originals:
+        # the workers were spawned rather than forked
+        install(sys.modules['jsonfmt.jsonfmt'], isinstance(_profile, MemoryProfile))
+    result = fn(item)
+    return result, _profile
+
+
+def merge_result(get_result: Callable) -> Any:
+    result, profile = get_result()
+    if profile is not None and _profile is not None:
+        _profile.merge(profile)
+    return result
+
+
+def replace(owner: Any, attr: str, wrap: Callable[[Callable], Callable]):
+    original = getattr(owner, attr)
+    _originals.append((owner, attr, original))
+    setattr(owner, attr, wrap(original))
+
+
+def install(module: ModuleType, memory: bool = False):
+    '''replace the functions of the stages with the timed ones'''
+    from jsonfmt import canonical, diff, highlight, stream
+
+    for attr, stage in STAGES.items():
+        replace(module, attr, partial(timed, stage))
+    for attr in FILE_FUNCTIONS:
+        replace(module, attr, timed_file)
+    for attr in OUTPUT_FUNCTIONS:
+        replace(module, attr, timed_output)
+    replace(module, 'open_output', partial(timed_context, 'output'))
+    replace(module, 'get_highlighter', timed_highlighter)
+    replace(highlight, 'dump', partial(timed, 'highlight'))
+    replace(utils, 'open_input', partial(timed_enter, 'read'))
+    replace(utils, 'map_in_order', timed_map_in_order)
+    replace(stream, 'iter_json_lines', partial(timed_iter, 'parse'))
+    replace(stream, 'iter_json_array', partial(timed_iter, 'parse'))
+    replace(stream, 'iter_yaml_documents', partial(timed_iter, 'parse'))
+    replace(canonical, 'fingerprint', partial(timed, 'hash'))
+    replace(diff, 'diff_objs', partial(timed, 'diff'))
+    if memory:
+        replace(module, 'get_loads_method', measured_loader)
+        replace(stream, 'iter_json_lines', measured_iter)
+        replace(stream, 'iter_json_array', measured_iter)
+        replace(stream, 'iter_yaml_documents', measured_iter)
+
+
+def uninstall():
+    '''restore the original functions'''
+    while _originals:
+        owner, attr, original = _originals.pop()
+        setattr(owner, attr, original)
+
+
+def format_table(profile: Profile, wall: int) -> str:
+    '''the table of stages sorted by their self time'''
+    lines = [f'{"stage":<12}{"calls":>8}{"total(ms)":>12}{"self(ms)":>12}{"self%":>8}']
+    for stage, (calls, total, self_time) in sorted(profile.stats.items(), key=lambda x: -x[1][2]):
+        percent = self_time * 100 / wall if wall else 0
+        lines.append(f'{stage:<12}{calls:>8}{total / 1e6:>12.3f}{self_time / 1e6:>12.3f}{percent:>7.1f}%')
+    lines.append(f'{"wall":<12}{"":>8}{wall / 1e6:>12.3f}')
+    return '\n'.join(lines)
+
+
+def to_report(profile: Profile, wall: int) -> Dict[str, Any]:
+    '''the machine-readable report, the times are in seconds'''
+    return {
+        'wall': wall / 1e9,
+        'stages': {stage: {'calls': calls, 'total': total / 1e9, 'self': self_time / 1e9}
+                   for stage, (calls, total, self_time) in profile.stats.items()},
+        'files': {name: duration / 1e9 for name, duration in profile.files.items()},
+    }
+
+
+def format_size(size: int) -> str:
+    for unit in ['B', 'KB', 'MB']:
+        if size < 1024:
+            return f'{size:.0f} {unit}' if unit == 'B' else f'{size:.1f} {unit}'
+        size /= 1024  # type: ignore
+    return f'{size:.1f} GB'
+
+
+def format_memory_table(profile: MemoryProfile, retained: int) -> str:
+    '''the table of stages sorted by their peaks'''
+    lines = [f'{"stage":<12}{"calls":>8}{"peak(MB)":>12}{"retained(MB)":>14}']
+    for stage, (calls, peak, stage_retained) in sorted(profile.stats.items(), key=lambda x: -x[1][1]):
+        lines.append(f'{stage:<12}{calls:>8}{peak / 2 ** 20:>12.3f}{stage_retained / 2 ** 20:>14.3f}')
+    lines.append(f'{"total":<12}{"":>8}{(profile.peak - profile.start) / 2 ** 20:>12.3f}'
+                 f'{retained / 2 ** 20:>14.3f}')
+    count, largest, total = profile.objects
+    if count:
+        lines.append(f'{count} parsed object(s), the largest is {format_size(largest)}, '
+                     f'{format_size(total)} in total')
+    return '\n'.join(lines)
+
+
+def to_memory_report(profile: MemoryProfile, retained: int) -> Dict[str, Any]:
+    '''the machine-readable report, the sizes are in bytes'''
+    count, largest, total = profile.objects
+    return {
+        'peak': profile.peak - profile.start,
+        'retained': retained,
+        'stages': {stage: {'calls': calls, 'peak': peak, 'retained': stage_retained}
+                   for stage, (calls, peak, stage_retained) in profile.stats.items()},
+        'files': profile.files,
+        'objects': {'count': count, 'largest': largest, 'total': total},
+    }
+
+
+def write_trace(profile: Profile, fp: IO):
+    '''write the calls as the Trace Event Format of Chrome, which can be opened by Perfetto'''
+    events: List[Dict[str, Any]] = []
+    for pid in sorted({event[4] for event in profile.events or []} | {profile.pid}):
+        name = 'jsonfmt' if pid == profile.pid else f'worker {pid}'
+        events.append({'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': pid, 'args': {'name': name}})
+    for stage, name, start, duration, pid in profile.events or []:
+        events.append({'name': name, 'cat': stage, 'ph': 'X', 'pid': pid, 'tid': pid,
+                       'ts': (start - profile.start) / 1e3, 'dur': duration / 1e3})
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fp)
+
+
+@contextmanager
+def profiling(module: ModuleType, report: Optional[str] = None,
+              trace_path: Optional[str] = None) -> Iterator[Profile]:
+    '''
+    time the stages of the module of jsonfmt, and then print the report
+    to stderr as a table or JSON, or write the calls to the trace file
+    '''
+    global _profile
+    _profile = profile = Profile(tracing=bool(trace_path))
+    install(module)
+    try:
+        yield profile
+    finally:
+        wall = perf_counter_ns() - profile.start
+        uninstall()
+        _profile = None
+        if report == 'json':
+            print(json.dumps(to_report(profile, wall), indent=2), file=sys.stderr)
+        elif report:
+            print(format_table(profile, wall), file=sys.stderr)
+        if trace_path:
+            try:
+                with open(trace_path, 'w', encoding='utf-8') as fp:
+                    write_trace(profile, fp)
+            except OSError as err:
+                utils.print_err(err)
+
+
+@contextmanager
+def accounting(module: ModuleType, report: str = 'table') -> Iterator[MemoryProfile]:
+    '''
+    account the memory of the stages of the module of jsonfmt by tracemalloc,
+    and then print the report to stderr as a table or JSON
+    '''
+    global _profile
+    was_tracing = tracemalloc.is_tracing()
+    _profile = profile = MemoryProfile()
+    install(module, memory=True)
+    try:
+        yield profile
+    finally:
+        profile.fold_peak()
+        retained = tracemalloc.get_traced_memory()[0] - profile.start
+        uninstall()
+        _profile = None
+        if not was_tracing:
+            tracemalloc.stop()
+        if report == 'json':
+            print(json.dumps(to_memory_report(profile, retained), indent=2), file=sys.stderr)
+        else:
+            print(format_memory_table(profile, retained), file=sys.stderr)
@@ -0,0 +1,158 @@
+'''Infer the structure of data by merging the structures of all of its elements'''
+
+from functools import partial
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .utils import Expansion, rebuild
+
+TYPE_NAMES = {str: 'str', int: 'int', float: 'float', bool: 'bool', type(None): 'null'}
+
+
+def get_type_name(value: Any) -> str:
+    '''the name of the scalar type in the overview'''
+    return TYPE_NAMES.get(type(value)) or type(value).__name__
+
+
+class Schema:
+    '''
+    The structure merged from the values added to it one by one, it only holds
+    the distinct structures, so that the memory is bounded by the variety of
+    structures rather than the size of data.
+
+    - the keys that don't appear in all of the dicts are marked as `key?`
+    - the different types at the same place are joined as `int | str`
+    - the items of lists are merged into the single item `[item]`
+
+    The repeated subtrees (e.g. the aliases of YAML) are merged once, and their
+    schemas are shared by the places until they are changed.
+    '''
+
+    __slots__ = ('count', 'scalars', 'n_dicts', 'fields', 'n_lists', 'items', 'shared')
+
+    def __init__(self):
+        self.count = 0  # the number of values added
+        self.scalars: Dict[str, None] = {}  # the names of scalar types in order
+        self.n_dicts = 0
+        self.fields: Dict[Any, Schema] = {}
+        self.n_lists = 0
+        self.items: Optional[Schema] = None
+        self.shared = False  # referred to by several schemas, so it's copied before being changed
+
+    def add(self, value: Any):
+        '''merge the structure of value into the schema'''
+        first_schemas: Dict[int, Schema] = {}  # the ids of containers to the schemas they are first merged into
+        merged_again: Set[Tuple[int, int]] = set()  # the ids of schemas and the repeated containers
+        pending = [(self, value)]
+        while pending:
+            schema, value = pending.pop()
+            schema.count += 1
+            # the sub-values are pushed in reverse, so that they are merged in order
+            if isinstance(value, dict):
+                first = first_schemas.get(id(value))
+                if first is None:
+                    first_schemas[id(value)] = schema
+                elif self._merged_before(schema, first, value, merged_again):
+                    continue
+                schema.n_dicts += 1
+                fields = schema.fields
+                sub_values = []
+                for key, sub_value in value.items():
+                    field = fields.get(key)
+                    if field is None:
+                        field = fields[key] = Schema()
+                    elif field.shared:
+                        field = fields[key] = field._copy()
+                    sub_values.append((field, sub_value))
+                pending.extend(reversed(sub_values))
+            elif isinstance(value, (list, tuple)):
+                first = first_schemas.get(id(value))
+                if first is None:
+                    first_schemas[id(value)] = schema
+                elif self._merged_before(schema, first, value, merged_again):
+                    continue
+                schema.n_lists += 1
+                if schema.items is None:
+                    schema.items = Schema()
+                elif schema.items.shared:
+                    schema.items = schema.items._copy()
+                items = schema.items
+                pending.extend((items, item) for item in reversed(value))
+            else:
+                schema.scalars[get_type_name(value)] = None
+
+    @staticmethod
+    def _merged_before(schema: 'Schema', first: 'Schema', value: Any, merged_again: Set[Tuple[int, int]]) -> bool:
+        '''
+        check if the repeated container needn't be merged into the schema again, which
+        has been merged into the first schema. Merging the same value again doesn't change
+        the optional keys and the types, so only the count of the schema is changed.
+        '''
+        if first is schema:
+            return True
+        pair = (id(schema), id(value))
+        if pair in merged_again:
+            return True
+        merged_again.add(pair)
+        if schema.count == 1 and first.count == 1:
+            schema._copy_from(first)  # both of them have only the value
+            return True
+        return False
+
+    def _copy_from(self, other: 'Schema'):
+        '''copy the other schema into self, the sub-schemas are shared'''
+        self.count = other.count
+        self.scalars = other.scalars.copy()
+        self.n_dicts = other.n_dicts
+        self.fields = other.fields.copy()
+        self.n_lists = other.n_lists
+        self.items = other.items
+        for field in self.fields.values():
+            field.shared = True
+        if self.items is not None:
+            self.items.shared = True
+
+    def _copy(self) -> 'Schema':
+        '''copy the shared schema before changing it'''
+        schema = Schema()
+        schema._copy_from(self)
+        return schema
+
+    def to_py(self) -> Any:
+        '''convert the schema to Python object for outputting, the shared schemas are converted once'''
+        results: Dict[int, Any] = {}
+
+        def expand(schema: Schema) -> Expansion:
+            if id(schema) in results:
+                return (), lambda _: results[id(schema)]
+            return _expand_schema(schema, results)
+
+        return rebuild(self, expand)
+
+    def _build(self, results: Dict[int, Any], children: List[Any]) -> Any:
+        results[id(self)] = result = self._build_alternatives(children)
+        return result
+
+    def _build_alternatives(self, children: List[Any]) -> Any:
+        alternatives: List[Any] = list(self.scalars)
+        if self.n_dicts:
+            alternatives.append({key if field.count == self.n_dicts else f'{key}?': child
+                                 for (key, field), child in zip(self.fields.items(), children)})
+        if self.n_lists:
+            has_items = self.items is not None and self.items.count > 0
+            alternatives.append([children[-1]] if has_items else [])
+
+        if not alternatives:
+            return None
+        elif not (self.n_dicts or self.n_lists):
+            return ' | '.join(alternatives)
+        elif len(alternatives) == 1:
+            return alternatives[0]
+        else:
+            return {'oneOf': alternatives}
+
+
+def _expand_schema(schema: Schema, results: Dict[int, Any]) -> Expansion:
+    children = list(schema.fields.values())
+    if schema.items is not None and schema.items.count > 0:
+        children.append(schema.items)
+    return children, partial(Schema._build, schema, results)
@@ -0,0 +1,112 @@
+'''Iterate over the records of large inputs one by one'''
+
+import json
+import re
+from typing import IO, Any, Iterator, Tuple
+
+from .backends import get_backend
+from .utils import print_err
+
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+
+def iter_json_lines(input_fp: IO) -> Iterator[Any]:
+    '''parse the JSON Lines (NDJSON) data line by line'''
+    loads = get_backend().loads
+    for lineno, line in enumerate(input_fp, start=1):
+        if not line.strip():
+            continue  # skip the blank lines
+
+        try:
+            yield loads(line)
+        except ValueError as err:
+            print_err(f'line {lineno}: {err}')
+
+
+def iter_yaml_documents(input_fp: IO) -> Iterator[Any]:
+    '''parse the documents of a YAML stream one by one'''
+    import yaml
+    n_docs = 0
+    try:
+        for doc in get_backend('yaml').load_all(input_fp):
+            n_docs += 1
+            yield doc
+    except yaml.YAMLError as err:
+        # the parser can't resume from an invalid document, so the rest are not read
+        raise ValueError(f'document {n_docs + 1}: {err}') from err
+
+
+class _ArrayReader:
+    '''a buffer that only holds the unconsumed part of the input'''
+
+    def __init__(self, input_fp: IO, chunk_size: int) -> None:
+        self.input_fp = input_fp
+        self.chunk_size = chunk_size
+        self.buf = input_fp.read(chunk_size)
+        self.pos = 1 if self.buf[:1] == '\ufeff' else 0  # skip the BOM
+        self.eof = not self.buf
+
+    def read_more(self) -> bool:
+        '''drop the consumed data and read more, return False at the end of input'''
+        if self.eof:
+            return False
+        # read at least as much as pending, so that the re-scanning costs O(n) in total
+        pending = self.buf[self.pos:]
+        data = self.input_fp.read(max(self.chunk_size, len(pending)))
+        self.eof = not data
+        self.buf, self.pos = pending + data, 0
+        return not self.eof
+
+    def next_char(self) -> str:
+        '''skip the whitespaces and return the next char'''
+        while True:
+            self.pos = WHITESPACE.match(self.buf, self.pos).end()  # type: ignore
+            if self.pos < len(self.buf) or not self.read_more():
+                return self.buf[self.pos:self.pos + 1]
+
+    def decode(self, decoder: json.JSONDecoder) -> Tuple[Any, str]:
+        '''decode a value, and return it with the char following it'''
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buf, self.pos)
+                # a number may be cut off at the end of buffer (e.g. "-2." of "-2.5"),
+                # make sure that the value is followed by a delimiter
+                delimiter_pos = WHITESPACE.match(self.buf, end).end()  # type: ignore
+                if delimiter_pos < len(self.buf):
+                    delimiter = self.buf[delimiter_pos]
+                    if delimiter in ',]' or self.eof or len(self.buf) - end > 2:
+                        self.pos = delimiter_pos
+                        return value, delimiter
+            except json.JSONDecodeError:
+                if not self.read_more():
+                    raise
+                continue
+            if not self.read_more():
+                raise ValueError('unexpected end of the JSON array')
+
+
+def iter_json_array(input_fp: IO, chunk_size: int = CHUNK_SIZE) -> Iterator[Any]:
+    '''parse the elements of a top-level JSON array one by one'''
+    reader = _ArrayReader(input_fp, chunk_size)
+    if reader.next_char() != '[':
+        raise ValueError('the top-level JSON value is not an array')
+    reader.pos += 1
+
+    if reader.next_char() == ']':
+        return
+
+    decoder = json.JSONDecoder()
+    while True:
+        reader.next_char()
+        value, delimiter = reader.decode(decoder)
+        yield value
+
+        reader.pos += 1
+        if delimiter == ']':
+            break
+        elif delimiter != ',':
+            raise ValueError(f'expecting "," or "]" after the element, but got "{delimiter}"')
+
+    if reader.next_char():
+        raise ValueError('extra data after the JSON array')
@@ -1,7 +1,17 @@
+import codecs
+import mmap
+import os
+import stat
 import sys
 from ast import literal_eval
-from collections import OrderedDict
-from typing import Any
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+from typing import (IO, Any, Callable, Iterable, Iterator, List, Optional, Sequence,
+                    Tuple, Union)
+
+InputData = Union[str, bytes, mmap.mmap]
 
 
 def safe_eval(value: str) -> Any:
@@ -12,15 +22,232 @@ def safe_eval(value: str) -> Any:
         return value
 
 
-def sort_dict(py_obj: Any) -> Any:
-    '''sort the dicts in py_obj by keys'''
+MAX_DEPTH = 256  # the deeper subtrees are rebuilt with an explicit stack
+Expansion = Optional[Tuple[Iterable, Callable[[list], Any]]]
+
+
+def rebuild(root: Any, expand: Callable[[Any], Expansion]) -> Any:
+    '''
+    rebuild a tree bottom-up, the depth of tree is not limited by the recursion limit.
+
+    `expand(node)` returns None to keep the node as it is, or a tuple of
+    `(children, build)`, the `build` is called with the list of rebuilt
+    children to make the new node.
+    '''
+    expansion = expand(root)
+    if expansion is None:
+        return root
+    return _rebuild_shallow(expansion, expand, 0)
+
+
+def _rebuild_shallow(expansion: Expansion, expand: Callable[[Any], Expansion], depth: int) -> Any:
+    # the function call is cheaper than maintaining a stack by hand,
+    # so the stack is used only for the subtrees deeper than MAX_DEPTH
+    children, build = expansion  # type: ignore
+    results: List[Any] = []
+    append = results.append
+    for child in children:
+        expansion = expand(child)
+        if expansion is None:
+            append(child)
+        elif depth < MAX_DEPTH:
+            append(_rebuild_shallow(expansion, expand, depth + 1))
+        else:
+            append(_rebuild_deep(expansion, expand))
+    return build(results)
+
+
+def _rebuild_deep(expansion: Expansion, expand: Callable[[Any], Expansion]) -> Any:
+    stack: List[Tuple[Iterator, Callable, list]] = []  # the frames of ancestors
+    children, build = expansion  # type: ignore
+    iterator, results = iter(children), []
+    while True:
+        for child in iterator:
+            expansion = expand(child)
+            if expansion is None:
+                results.append(child)
+            else:
+                stack.append((iterator, build, results))
+                children, build = expansion
+                iterator, results = iter(children), []
+                break
+        else:
+            node = build(results)
+            if not stack:
+                return node
+            iterator, build, results = stack.pop()
+            results.append(node)
+
+
+def _expand_sorting(py_obj: Any) -> Expansion:
     if isinstance(py_obj, dict):
-        sorted_items = sorted((key, sort_dict(value)) for key, value in py_obj.items())
-        return OrderedDict(sorted_items)
+        keys = sorted(py_obj)
+        return map(py_obj.__getitem__, keys), lambda values: OrderedDict(zip(keys, values))
     elif isinstance(py_obj, list):
-        return [sort_dict(item) for item in py_obj]
+        return py_obj, list
     else:
-        return py_obj
+        return None
+
+
+def sort_dict(py_obj: Any) -> Any:
+    '''sort the dicts in py_obj by keys'''
+    return rebuild(py_obj, _expand_sorting)
+
+
+def decode_text(data: InputData, errors: str = 'strict') -> str:
+    '''decode the data to text by its BOM (UTF-8 by default), and drop the BOM'''
+    if isinstance(data, str):
+        return data[1:] if data[:1] == '\ufeff' else data
+
+    head = data[:4]
+    if head.startswith((codecs.BOM_UTF32_LE, codecs.BOM_UTF32_BE)):
+        encoding = 'utf-32'
+    elif head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        encoding = 'utf-16'
+    else:
+        encoding = 'utf-8-sig'
+    # decode from the buffer directly, without an intermediate copy of bytes
+    return str(data, encoding, errors)
+
+
+@contextmanager
+def open_input(file: Union[str, IO]) -> Iterator[InputData]:
+    '''read the input, the regular file will be mapped into memory instead of being read'''
+    if not isinstance(file, str):
+        yield file.read()
+        return
+
+    with open(file, 'rb') as fp:
+        file_stat = os.fstat(fp.fileno())
+        if stat.S_ISREG(file_stat.st_mode) and file_stat.st_size > 0:
+            try:
+                mapped = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                yield fp.read()  # some file systems don't support mmap
+            else:
+                with mapped:
+                    yield mapped
+        else:
+            yield fp.read()
+
+
+def map_in_order(fn: Callable, items: Sequence, jobs: int = 1) -> Iterator[Callable[[], Any]]:
+    '''
+    call `fn` for each item in a pool of processes, and yield the getters of
+    the results in the original order. The getter raises the error of the call.
+    '''
+    if jobs <= 1 or len(items) <= 1:
+        # call `fn` in the current process lazily
+        for item in items:
+            yield partial(fn, item)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(min(jobs, len(items))) as executor:
+        # only a few results are waiting to be taken, so that the memory is bounded
+        pending: deque = deque()
+        for item in items:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= jobs * 2:
+                yield pending.popleft().result
+        while pending:
+            yield pending.popleft().result
+
+
+def encode_text(text: str) -> bytes:
+    '''encode the text in the same way as writing it to a file in text mode'''
+    if os.linesep != '\n':
+        text = text.replace('\n', os.linesep)
+    return text.encode('utf-8')
+
+
+def is_same_content(data: InputData, text: str) -> bool:
+    '''check if the input data is the same as the text to be written'''
+    if isinstance(data, str):
+        return data == text
+    encoded = encode_text(text)
+    return len(data) == len(encoded) and data[:] == encoded
+
+
+def write_if_changed(path: str, text: str) -> bool:
+    '''
+    write the text to the file through a temporary file and an atomic rename,
+    the file is left alone if its content is unchanged. Return True if written.
+    '''
+    path = os.path.realpath(path)  # replace the target of symlink rather than the link
+    encoded = encode_text(text)
+    file_stat = os.stat(path)
+    if file_stat.st_size == len(encoded):
+        with open(path, 'rb') as fp:
+            if fp.read() == encoded:
+                return False
+
+    from tempfile import mkstemp
+    dirname, basename = os.path.split(path)
+    fd, tmp_path = mkstemp(prefix=f'.{basename}.', suffix='.tmp', dir=dirname)
+    try:
+        with os.fdopen(fd, 'wb') as fp:
+            fp.write(encoded)
+        os.chmod(tmp_path, stat.S_IMODE(file_stat.st_mode))
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
+
+
+class StrippedWriter:
+    '''write the chunks to fp as `text.strip() + '\\n'` without joining all of them'''
+
+    def __init__(self, fp: IO, batch_size: int = 4096):
+        self.fp = fp
+        self.batch_size = batch_size
+        self.chunks: List[str] = []  # the small chunks are joined in batches
+        self.started = False
+        self.spaces = ''  # the trailing spaces are held until more text comes
+
+    def write(self, text: str) -> int:
+        self.chunks.append(text)
+        if len(self.chunks) >= self.batch_size:
+            self.write_batch()
+        return len(text)
+
+    def writelines(self, chunks: Iterable[str]):
+        iterator = iter(chunks)
+        while True:
+            self.chunks.extend(islice(iterator, self.batch_size))
+            if len(self.chunks) < self.batch_size:
+                break
+            self.write_batch()
+
+    def write_batch(self):
+        text = ''.join(self.chunks)
+        self.chunks.clear()
+        if not self.started:
+            text = text.lstrip()
+            if not text:
+                return
+            self.started = True
+
+        stripped = text.rstrip()
+        if stripped:
+            if self.spaces:
+                self.fp.write(self.spaces)
+            self.fp.write(stripped)
+            self.spaces = text[len(stripped):]
+        else:
+            self.spaces += text
+
+    def flush(self):
+        self.write_batch()
+        self.fp.flush()
+
+    def close(self):
+        '''end the text with a newline, the fp is not closed'''
+        self.write_batch()
+        self.fp.write('\n')
+        self.spaces = ''
 
 
 def print_inf(msg: Any):
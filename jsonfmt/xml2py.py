@@ -1,16 +1,25 @@
+import re
 import sys
 import xml.etree.ElementTree as ET
 from collections.abc import Mapping
 from copy import deepcopy
+from functools import lru_cache, partial
+from io import StringIO
 from xml.dom.minidom import parseString
 
-from .utils import safe_eval, sort_dict
+from .utils import rebuild, safe_eval, sort_dict
 
 if sys.version_info < (3, 11):
-    from typing import Any, Dict, Optional, TypeVar, Union
+    from typing import IO, Any, Dict, List, Optional, Tuple, TypeVar, Union
     Self = TypeVar('Self', bound='XmlElement')
 else:
-    from typing import Any, Dict, Optional, Self, Union
+    from typing import IO, Any, Dict, List, Optional, Self, Tuple, Union
+
+CHUNK_SIZE = 64 * 1024  # the size of text fed to the parser at a time
+BATCH_SIZE = 4096  # the chunks of XML are written to fp in batches
+XML_DECLARATION = '<?xml version="1.0" ?>'
+PLAIN_NAME = re.compile(r'[^\s=<>/&"\'{}:!?]+')
+INVALID_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
 
 
 class _list(list):
@@ -36,14 +45,17 @@ class XmlElement(ET.Element):
 
     @classmethod
     def clone(cls, src: Union[Self, ET.Element], dst: Optional[Self] = None) -> Self:
-        if dst is None:
-            dst = cls(src.tag, src.attrib, src.text, src.tail)
-
-        for child in src:
-            _child = dst.spawn(child.tag, child.attrib, child.text, child.tail)
-            cls.clone(child, _child)
+        def build(elem: ET.Element, children: List[Self]) -> Self:
+            if elem is src and dst is not None:
+                node = dst
+            else:
+                node = cls(elem.tag, elem.attrib, elem.text, elem.tail)
+            for child in children:
+                child.parent = node
+            node.extend(children)
+            return node
 
-        return dst
+        return rebuild(src, lambda elem: (elem, partial(build, elem)))
 
     @classmethod
     def from_xml(cls, xml: str) -> Self:
@@ -80,6 +92,12 @@ class XmlElement(ET.Element):
         return child
 
     def _get_attrs(self) -> Optional[Dict[str, Any]]:
+        # the leaf elements are kept as they are, and converted by their parents
+        attrs = rebuild(self, lambda elem: (elem, elem._build_attrs) if len(elem) else None)
+        return self._build_attrs([]) if attrs is self else attrs
+
+    def _build_attrs(self, children_attrs: List[Any]) -> Optional[Dict[str, Any]]:
+        '''build the attrs of element from the attrs of its children'''
         attrs = {f'@{k}': safe_eval(v) for k, v in self.attrib.items()}
 
         if len(self) == 0:
@@ -97,8 +115,9 @@ class XmlElement(ET.Element):
                     attrs['@text'] = value
 
             _tags = []  # tags of type "_list"
-            for child in self:
-                child_attrs = child._get_attrs()  # type: ignore
+            for child, child_attrs in zip(self, children_attrs):
+                if child_attrs is child:
+                    child_attrs = child._build_attrs([])  # type: ignore
                 if child.tag in attrs:
                     # Make a list for duplicate tags
                     previous = attrs[child.tag]
@@ -122,33 +141,45 @@ class XmlElement(ET.Element):
         return attrs if self.tag == 'root' else {self.tag: attrs}
 
     def _set_attrs(self, py_obj: Any):
-        if isinstance(py_obj, Mapping):
-            for key, value in py_obj.items():
-                if key == '@text':
-                    self.text = str(value)
-                elif key[0] == '@':
-                    self.set(key[1:], str(value))
-                elif isinstance(value, list):
-                    for v in value:
-                        self.spawn(key)._set_attrs(v)
-                else:
-                    self.spawn(key)._set_attrs(value)
-        elif isinstance(py_obj, (list, tuple, set)):
-            if self.parent is None:
-                return self.spawn(self.tag)._set_attrs(py_obj)
-            else:
-                for i, item in enumerate(py_obj):
-                    if len(self.parent) > i:
-                        ele = self.parent[i]
-                    else:
-                        ele = self.parent.spawn(self.tag)
+        # the tasks of (element, tag, value): set the value to the element itself if
+        # tag is None, otherwise to its new child of tag. They are done in the same
+        # order as the depth-first recursion, the children are spawned in order.
+        tasks: List[Tuple[Self, Optional[str], Any]] = [(self, None, py_obj)]
+        while tasks:
+            elem, tag, py_obj = tasks.pop()
+            if tag is not None:
+                elem = elem.spawn(tag)
 
-                    if isinstance(item, (list, tuple, set)):
-                        ele.text = str(item)
+            if isinstance(py_obj, Mapping):
+                subtasks = []
+                for key, value in py_obj.items():
+                    if key == '@text':
+                        elem.text = str(value)
+                    elif key[0] == '@':
+                        elem.set(key[1:], str(value))
+                    elif isinstance(value, list):
+                        subtasks.extend((elem, key, v) for v in value)
                     else:
-                        ele._set_attrs(item)  # type: ignore
-        else:
-            self.text = str(py_obj)
+                        subtasks.append((elem, key, value))
+                tasks.extend(reversed(subtasks))
+            elif isinstance(py_obj, (list, tuple, set)):
+                if elem.parent is None:
+                    tasks.append((elem, elem.tag, py_obj))
+                else:
+                    subtasks = []
+                    for i, item in enumerate(py_obj):
+                        if len(elem.parent) > i:
+                            ele = elem.parent[i]
+                        else:
+                            ele = elem.parent.spawn(elem.tag)
+
+                        if isinstance(item, (list, tuple, set)):
+                            ele.text = str(item)
+                        else:
+                            subtasks.append((ele, None, item))
+                    tasks.extend(reversed(subtasks))
+            else:
+                elem.text = str(py_obj)
 
     @classmethod
     def from_py(cls, py_obj: Any):
@@ -165,13 +196,257 @@ class XmlElement(ET.Element):
         return root
 
 
+def _leaf_to_py(attrs: Dict[str, Any], text: Optional[str]) -> Any:
+    '''convert the element without children, same as `XmlElement._get_attrs`'''
+    if not text:
+        return attrs or None
+    value = safe_eval(text.strip())
+    if attrs and value:
+        attrs['@text'] = value
+    return attrs or value
+
+
 def loads(xml: str) -> Any:
-    '''Load and convert an XML string into a Python object'''
-    return XmlElement.from_xml(xml).to_py()
+    '''
+    Load and convert an XML string into a Python object in a single pass,
+    each element is converted and cleared as soon as it's closed
+    '''
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    # the frames of the open elements: [element, attrs, tags of "_list", has_children]
+    stack: List[list] = []
+    result = None
 
+    def handle_events():
+        nonlocal result
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if stack:
+                    parent = stack[-1]
+                    if not parent[3]:
+                        # the text of parent is complete when its first child starts
+                        parent[3] = True
+                        if parent[0].text:
+                            value = safe_eval(parent[0].text.strip())
+                            if value:
+                                parent[1]['@text'] = value
+                attrs = {f'@{k}': safe_eval(v) for k, v in elem.attrib.items()}
+                stack.append([elem, attrs, [], False])
+                continue
 
-def dumps(py_obj: Any, indent: str = 't', minimal: bool = False,
-          sort_keys: bool = False) -> str:
+            _, attrs, list_tags, has_children = stack.pop()
+            if has_children:
+                # recover "_list" to "list"
+                for tag in list_tags:
+                    attrs[tag] = list(attrs[tag])
+                value = attrs
+            else:
+                value = _leaf_to_py(attrs, elem.text)
+
+            if stack:
+                parent_elem, parent_attrs, parent_list_tags, _ = stack[-1]
+                if elem.tag in parent_attrs:
+                    # Make a list for duplicate tags
+                    previous = parent_attrs[elem.tag]
+                    if not isinstance(previous, _list):
+                        parent_attrs[elem.tag] = _list([previous, value])
+                        parent_list_tags.append(elem.tag)
+                    else:
+                        previous.append(value)
+                else:
+                    parent_attrs[elem.tag] = value
+                del parent_elem[-1]  # the closed element is the last child of its parent
+            else:
+                result = value if elem.tag == 'root' else {elem.tag: value}
+            elem.clear()
+
+    start = len(xml) - len(xml.lstrip())
+    for pos in range(start, len(xml), CHUNK_SIZE):
+        parser.feed(xml[pos:pos + CHUNK_SIZE])
+        handle_events()
+    parser.close()
+    handle_events()
+    return result
+
+
+@lru_cache(maxsize=4096)
+def _is_plain_name(name: Any) -> bool:
+    '''check if the name is a valid XML name without namespace'''
+    if not isinstance(name, str) or not PLAIN_NAME.fullmatch(name) or name.startswith('xmlns'):
+        return False
+    try:
+        ET.fromstring(f'<{name}/>')
+    except ET.ParseError:
+        return False
+    return True
+
+
+def _get_root(py_obj: Any) -> Tuple[str, Any]:
+    '''get the tag and content of the root element, same as `XmlElement.from_py`'''
+    if isinstance(py_obj, dict) and len(py_obj) == 1:
+        tag, value = list(py_obj.items())[0]
+        if isinstance(value, Mapping):
+            return tag, value
+    return 'root', py_obj
+
+
+def _is_regular(tag: str, content: Any) -> bool:
+    '''
+    check if the py_obj can be written directly. The namespaces, the invalid names and
+    the nested sequences are left to the element tree, which handles them specially.
+    '''
+    if not _is_plain_name(tag):
+        return False
+
+    if isinstance(content, Mapping):
+        mappings = [content]
+    elif isinstance(content, (list, tuple, set)):
+        mappings = [item for item in content if isinstance(item, Mapping)]
+    else:
+        return True
+
+    while mappings:
+        for key, value in mappings.pop().items():
+            if not isinstance(key, str):
+                return False
+            elif key == '@text':
+                continue
+            elif key[:1] == '@':
+                if not _is_plain_name(key[1:]):
+                    return False
+                continue
+            elif not _is_plain_name(key):
+                return False
+
+            values = value if isinstance(value, list) else [value]
+            for value in values:
+                if isinstance(value, Mapping):
+                    mappings.append(value)
+                elif isinstance(value, (list, tuple, set)):
+                    return False
+    return True
+
+
+def _normalize_text(text: str) -> str:
+    '''the text after being escaped by ET, re-parsed by expat and escaped by minidom'''
+    if INVALID_CHARS.search(text):
+        raise ValueError(f'invalid XML character in {text!r}')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text.replace('&', '&amp;').replace('<', '&lt;') \
+        .replace('"', '&quot;').replace('>', '&gt;')
+
+
+def _normalize_attrib(text: str) -> str:
+    '''the attribute value after being escaped by ET, re-parsed by expat and escaped by minidom'''
+    if INVALID_CHARS.search(text):
+        raise ValueError(f'invalid XML character in {text!r}')
+    return text.replace('&', '&amp;').replace('<', '&lt;') \
+        .replace('"', '&quot;').replace('>', '&gt;')
+
+
+def _split_content(content: Any) -> Tuple[List[Tuple[str, str]], Optional[str], list]:
+    '''split the content of element into attributes, text and children, same as `_set_attrs`'''
+    if not isinstance(content, Mapping):
+        return [], str(content), []
+
+    attrs, text, children = [], None, []
+    for key, value in content.items():
+        if key == '@text':
+            text = str(value)
+        elif key[0] == '@':
+            attrs.append((key[1:], str(value)))
+        elif isinstance(value, list):
+            children.extend((key, v) for v in value)
+        else:
+            children.append((key, value))
+    return attrs, text, children
+
+
+def _iter_xml(tag: str, content: Any, indent: str, minimal: bool):
+    '''generate the chunks of XML from the content of root element without recursion'''
+    if isinstance(content, (list, tuple, set)):
+        # the items of a top-level sequence are wrapped in the elements named after the root
+        items = [str(item) if isinstance(item, (list, tuple, set)) else item for item in content]
+        root_children = [(tag, item) for item in items] or [(tag, {})]
+        content = None
+    else:
+        root_children = None
+
+    if not minimal:
+        yield XML_DECLARATION + '\n'
+
+    # the tasks are the closing tags to write, or the elements to expand: (tag, content, level)
+    tasks: List[Any] = [(tag, content, 0)]
+    while tasks:
+        task = tasks.pop()
+        if isinstance(task, str):
+            yield task
+            continue
+
+        tag, content, level = task
+        if root_children is not None:
+            attrs, text, children = [], None, root_children
+            root_children = None
+        else:
+            attrs, text, children = _split_content(content)
+        if children and text is not None:
+            text = text.strip()
+
+        if minimal:
+            attrs_text = ''.join(f' {k}="{ET._escape_attrib(v)}"' for k, v in attrs)  # type: ignore
+            if text or children:
+                yield f'<{tag}{attrs_text}>{ET._escape_cdata(text or "")}'  # type: ignore
+                tasks.append(f'</{tag}>')
+            else:
+                yield f'<{tag}{attrs_text} />'
+                continue
+        else:
+            prefix = indent * level
+            attrs_text = ''.join(f' {k}="{_normalize_attrib(v)}"' for k, v in attrs)
+            if children:
+                yield f'{prefix}<{tag}{attrs_text}>\n'
+                if text:
+                    yield f'{prefix}{indent}{_normalize_text(text)}\n'
+                tasks.append(f'{prefix}</{tag}>\n')
+            elif text:
+                yield f'{prefix}<{tag}{attrs_text}>{_normalize_text(text)}</{tag}>\n'
+                continue
+            else:
+                yield f'{prefix}<{tag}{attrs_text}/>\n'
+                continue
+
+        tasks.extend((child_tag, value, level + 1) for child_tag, value in reversed(children))
+
+
+def dump(py_obj: Any, fp: IO, indent: Union[int, str] = 't', minimal: bool = False,
+         sort_keys: bool = False):
+    '''
+    Write the XML of py_obj to fp directly without building the element tree,
+    the output is the same as `XmlElement.from_py(py_obj).to_xml()`
+    '''
     if sort_keys:
         py_obj = sort_dict(py_obj)
-    return XmlElement.from_py(py_obj).to_xml(indent=indent, minimal=minimal)
+
+    tag, content = _get_root(py_obj)
+    if not _is_regular(tag, content):
+        fp.write(XmlElement.from_py(py_obj).to_xml(indent=indent, minimal=minimal))
+        return
+
+    if isinstance(indent, int) or indent.isdecimal():
+        indent = ' ' * int(indent)
+    else:
+        indent = '\t'
+    batch: List[str] = []
+    for chunk in _iter_xml(tag, content, indent, minimal):
+        batch.append(chunk)
+        if len(batch) >= BATCH_SIZE:
+            fp.write(''.join(batch))
+            batch.clear()
+    fp.write(''.join(batch))
+
+
+def dumps(py_obj: Any, indent: Union[int, str] = 't', minimal: bool = False,
+          sort_keys: bool = False) -> str:
+    buffer = StringIO()
+    dump(py_obj, buffer, indent, minimal, sort_keys)
+    return buffer.getvalue()
@@ -0,0 +1,205 @@
+import json
+import mmap
+import os
+import sys
+import tempfile
+import unittest
+from importlib.util import find_spec
+from io import StringIO
+from unittest.mock import patch
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from jsonfmt import backends  # noqa: E402
+
+HAS_ORJSON = find_spec('orjson') is not None
+TEXTS = [
+    '{"a": 1, "a": 2}',
+    '[1.5, -0, 1e400, -1e-400, 1E5, 0.00001]',
+    '[18446744073709551615, 18446744073709551616, -9223372036854775809, 1234567890123456789.5]',
+    '[1e1234567890123456789, "12345678901234567890"]',
+    '[NaN, Infinity, -Infinity]',
+    '{"\\ud800": "\\u00e9\\u2028\\u0000"}',
+    '﻿{"bom": true}',
+]
+
+
+class TestBackends(unittest.TestCase):
+
+    def tearDown(self):
+        backends.select(None)
+        backends.select(None, 'yaml')
+        backends.select(None, 'toml')
+        backends.select(None, 'toml-writer')
+
+    def test_has_long_integer(self):
+        self.assertFalse(backends.has_long_integer(b'[1234567890123456789.5, 0.0012345678901234567890]'))
+        self.assertFalse(backends.has_long_integer(b'[1e1234567890123456789, 2E-1234567890123456789]'))
+        self.assertTrue(backends.has_long_integer(b'[1, 1234567890123456789]'))
+        self.assertTrue(backends.has_long_integer(b'{"a":-12345678901234567890}'))
+        self.assertTrue(backends.has_long_integer(b'"12345678901234567890"'))  # mistaken, but safe
+
+        # the runs across the boundaries of chunks
+        with patch.object(backends, 'CHUNK_SIZE', 7):
+            self.assertTrue(backends.has_long_integer(b'[1, 2, 3, 1234567890123456789]'))
+            self.assertFalse(backends.has_long_integer(b'[1, 2, 3.1234567890123456789]'))
+
+    def test_has_non_finite(self):
+        self.assertFalse(backends.has_non_finite({'a': [1.5, None, (2, 'nan')]}))
+        self.assertTrue(backends.has_non_finite({'a': [1.5, None, (2, float('nan'))]}))
+        self.assertTrue(backends.has_non_finite([{'b': float('-inf')}]))
+
+    def test_stdlib(self):
+        backend = backends.Backend()
+        self.assertEqual(backend.loads(b'\xef\xbb\xbf[1]'), [1])
+        self.assertIsNone(backend.dumps([1], compact=True, escape=False, indent='2', sort_keys=False))
+
+    @unittest.skipUnless(HAS_ORJSON, 'orjson is not installed')
+    def test_orjson_loads(self):
+        backend = backends.OrjsonBackend()
+        for text in TEXTS:
+            try:
+                expected = repr(json.loads(text.lstrip('﻿')))
+            except ValueError as err:
+                expected = str(err)
+            for data in [text, text.encode('utf-8', 'surrogatepass')]:
+                try:
+                    result = repr(backend.loads(data))
+                except ValueError as err:
+                    result = str(err)
+                self.assertEqual(result, expected, data)
+
+        with tempfile.TemporaryFile() as fp:
+            fp.write(b'{"a": [1, 2.5, "\xe4\xb8\xad"]}')
+            fp.flush()
+            with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                self.assertEqual(backend.loads(mapped), {'a': [1, 2.5, '中']})
+
+        # the error messages are the same as the stdlib's
+        with self.assertRaisesRegex(ValueError, 'Expecting value: line 1 column 5'):
+            backend.loads(b'[1, ]')
+
+    @unittest.skipUnless(HAS_ORJSON, 'orjson is not installed')
+    def test_orjson_dumps(self):
+        backend = backends.OrjsonBackend()
+        py_obj = {'b': [1, 2.5, -0.0, 0.0001, 1e15, True, None, '中\n"\x7f '], 'a': {}, 'c': []}
+        for compact in [True, False]:
+            for sort_keys in [True, False]:
+                expected = json.dumps(py_obj, ensure_ascii=False, sort_keys=sort_keys,
+                                      separators=(',', ':') if compact else None, indent=None if compact else 2)
+                result = backend.dumps(py_obj, compact=compact, escape=False, indent='2', sort_keys=sort_keys)
+                self.assertEqual(result, expected)
+
+        # the cases which are left to the stdlib
+        options = dict(compact=False, escape=False, indent='2', sort_keys=False)
+        self.assertIsNone(backend.dumps(py_obj, **dict(options, escape=True)))
+        self.assertIsNone(backend.dumps(py_obj, **dict(options, indent='4')))
+        for value in [1e16, 1e-5, float('nan'), 2 ** 64, {1: 2}, __import__('datetime').date(2024, 1, 1)]:
+            self.assertIsNone(backend.dumps([value], **options), value)
+
+    def test_get_backend(self):
+        with patch.dict(os.environ, {backends.env_name(): 'json'}):
+            backends.select(None)
+            self.assertEqual(backends.get_backend().name, 'json')
+            if HAS_ORJSON:
+                backends.select('orjson')  # the selected one overrides the environment variable
+                self.assertEqual(backends.get_backend().name, 'orjson')
+
+        with patch.dict(os.environ, {backends.env_name(): 'auto'}):
+            backends.select(None)
+            self.assertEqual(backends.get_backend().name, 'orjson' if HAS_ORJSON else 'json')
+
+        with self.assertRaisesRegex(ValueError, 'unknown JSON backend: nothing'):
+            backends.select('nothing')
+
+    def test_register(self):
+        def missing():
+            raise ImportError('No module named missing')
+
+        with patch.object(backends, 'BACKENDS', dict(backends.BACKENDS)):
+            backends.register('missing', missing, preferred=True)
+            self.assertEqual(backends.names()[:2], ['auto', 'missing'])
+            backends.select('auto')  # the unavailable ones are skipped
+            self.assertNotEqual(backends.get_backend().name, 'missing')
+            with self.assertRaisesRegex(ValueError, 'the JSON backend missing is unavailable'):
+                backends.select('missing')
+
+        with patch.object(backends, 'BACKENDS', dict(backends.BACKENDS)):
+            backends.register('other', backends.YamlBackend, fmt='yaml')
+            self.assertEqual(backends.names('yaml'), ['auto', 'libyaml', 'pyyaml', 'other'])
+        self.assertEqual(backends.names('yaml'), ['auto', 'libyaml', 'pyyaml'])
+
+    def test_yaml(self):
+        import yaml
+        text = '---\na: 1\nb: [x, 2021-03-02]\n---\n- 中文\n...\n---\nnull\n'
+        docs = [{'a': 1, 'b': ['x', __import__('datetime').date(2021, 3, 2)]}, ['中文'], None]
+        names = ['pyyaml', 'libyaml'] if yaml.__with_libyaml__ else ['pyyaml']
+        for name in names:
+            backend = backends.BACKENDS['yaml'][name]()
+            self.assertEqual(backend.name, name)
+            self.assertEqual(list(backend.load_all(text)), docs)
+            self.assertEqual(backend.loads(text.encode()), backends.Documents(docs))
+            self.assertIsInstance(backend.loads(text), backends.Documents)
+            self.assertEqual(backend.loads('a: 1'), {'a': 1})
+            self.assertIsNone(backend.loads(''))
+            with self.assertRaises(yaml.constructor.ConstructorError):
+                backend.loads('!!python/object/apply:os.system ["echo"]')  # only the safe tags
+
+            output = StringIO()
+            backend.dump_all([{'b': 1, 'a': 'é'}, [1]], output, escape=True, indent='4', sort_keys=True)
+            self.assertEqual(output.getvalue(), 'a: "\\xE9"\nb: 1\n---\n- 1\n')
+
+            # the documented difference of LibYAML, a root scalar isn't followed by "..."
+            output = StringIO()
+            backend.dump_all(['x'], output, escape=False, indent='2', sort_keys=False)
+            self.assertEqual(output.getvalue(), 'x\n' if name == 'libyaml' else 'x\n...\n')
+
+        with patch.dict(os.environ, {backends.env_name('yaml'): 'pyyaml'}):
+            backends.select(None, 'yaml')
+            self.assertEqual(backends.get_backend('yaml').name, 'pyyaml')
+        backends.select('auto', 'yaml')
+        self.assertEqual(backends.get_backend('yaml').name, names[-1])
+        with self.assertRaisesRegex(ValueError, 'unknown YAML backend: nothing'):
+            backends.select('nothing', 'yaml')
+
+        # LibYAML is optional for PyYAML
+        with patch.object(yaml, '__with_libyaml__', False), self.assertRaises(ImportError):
+            backends.LibyamlBackend()
+
+    def test_toml(self):
+        text = 'a = 1\n[b]\nc = {d = 1979-05-27T07:32:00Z, e = [1, 2]}\n'
+        py_obj = backends.TomlBackend().loads(text)
+        self.assertEqual(backends.TomllibBackend().loads(text), py_obj)
+        self.assertEqual(backends.get_backend('toml').name, 'tomllib' if sys.version_info >= (3, 11) else 'toml')
+
+        # the arrays of mixed types are only supported by TOML 1.0
+        self.assertEqual(backends.TomllibBackend().loads('a = [1, "x"]'), {'a': [1, 'x']})
+        with self.assertRaises(ValueError):
+            backends.TomlBackend().loads('a = [1, "x"]')
+
+        # the writer is selected separately
+        self.assertEqual(backends.names('toml-writer'), ['auto', 'toml', 'tomli_w'])
+        self.assertEqual(backends.env_name('toml-writer'), 'JSONFMT_TOML_WRITER_BACKEND')
+        self.assertEqual(backends.get_backend('toml-writer').dumps({'a': None, 'b': [1]}), 'b = [ 1,]\n')
+        if find_spec('tomli_w') is not None:
+            self.assertEqual(backends.TomliWriter().dumps({'a': None, 'b': [1, None]}), 'b = [\n    1,\n]\n')
+        with self.assertRaisesRegex(ValueError, 'unknown TOML WRITER backend: nothing'):
+            backends.select('nothing', 'toml-writer')
+
+    def test_drop_none(self):
+        self.assertEqual(backends.drop_none({'a': None, 'b': [1, None, {'c': None}]}), {'b': [1, {}]})
+        # the deep data is also supported
+        depth = 10000
+        py_obj: dict = {}
+        for _ in range(depth):
+            py_obj = {'a': [py_obj, None], 'b': None}
+        dropped = backends.drop_none(py_obj)
+        for _ in range(depth):
+            self.assertEqual(list(dropped), ['a'])
+            self.assertEqual(len(dropped['a']), 1)
+            dropped = dropped['a'][0]
+        self.assertEqual(dropped, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import os
+import tempfile
+import unittest
+from functools import partial
+
+from benchmarks import bench, corpus
+from jsonfmt.jsonfmt import parse_to_pyobj
+
+
+class TestCorpus(unittest.TestCase):
+
+    def test_make_data(self):
+        for shape in corpus.SHAPES:
+            py_obj = corpus.make_data(shape, 32)
+            self.assertEqual(py_obj, corpus.make_data(shape, 32))
+            self.assertNotEqual(py_obj, corpus.make_data(shape, 32, seed=1))
+            # the data can be represented by all of the formats
+            for fmt in corpus.FORMATS:
+                text = corpus.to_text(py_obj, fmt)
+                self.assertEqual(parse_to_pyobj(text, None, fmt)[0], py_obj)
+
+    def test_build(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = corpus.build(tmpdir, {'small': 4})
+            self.assertEqual(sorted(paths), sorted(f'{shape}-small.{fmt}' for shape in corpus.SHAPES
+                                                   for fmt in corpus.FORMATS + ['jsonl']))
+            mtimes = {name: os.stat(path).st_mtime_ns for name, path in paths.items()}
+
+            # the existing corpora are reused
+            self.assertEqual(corpus.build(tmpdir, {'small': 4}), paths)
+            self.assertEqual({name: os.stat(path).st_mtime_ns for name, path in paths.items()}, mtimes)
+
+
+class TestBench(unittest.TestCase):
+
+    def test_run_stage(self):
+        case = bench.Case('stage', lambda: partial(list, range(10000)))
+        result = bench.run_stage(case, repeat=3, budget=1)
+        self.assertGreater(result.time, 0)
+        self.assertGreater(result.peak, 10000 * 8)
+
+    def test_run_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as fp:
+            fp.write('{"a": [1, 2]}')
+        try:
+            result = bench.run_command(['-c', fp.name])
+            self.assertGreater(result.time, 0)
+            with self.assertRaises(RuntimeError):
+                bench.run_command(['-p', '[', fp.name])
+        finally:
+            os.remove(fp.name)
+
+    def test_check_regression(self):
+        mb = 1024 * 1024
+        base = bench.Result(0.1, 10 * mb)
+        self.assertEqual(bench.check_regression(bench.Result(0.11, 11 * mb), base, 0.2), [])
+        self.assertEqual(bench.check_regression(bench.Result(0.2, 10 * mb), None, 0.2), [])
+        self.assertEqual(bench.check_regression(bench.Result(0.2, 20 * mb), base, 0.2),
+                         ['time 100.0ms -> 200.0ms', 'peak 10.0MB -> 20.0MB'])
+        # the tiny differences are regarded as noises
+        self.assertEqual(bench.check_regression(bench.Result(0.002, 1000), bench.Result(0.001, 100), 0.2), [])
+        self.assertEqual(bench.check_regression(bench.Result(0.2, None), bench.Result(0.2, mb), 0.2), [])
+
+    def test_best_of(self):
+        self.assertEqual(bench.best_of(bench.Result(1, 5), bench.Result(2, 3)), bench.Result(1, 3))
+        self.assertEqual(bench.best_of(bench.Result(1, None), bench.Result(2, 3)), bench.Result(1, 3))
+        self.assertEqual(bench.best_of(bench.Result(1, None), bench.Result(2, None)), bench.Result(1, None))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from jmespath import compile as jcompile
+from jsonpath_ng import parse as jparse
+
+from jsonfmt import cache, jsonfmt
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        patcher = mock.patch.dict(os.environ, JSONFMT_CACHE_DIR=self.tmpdir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmpdir.cleanup)
+        jsonfmt.parse_querypath.cache_clear()
+        self.addCleanup(jsonfmt.parse_querypath.cache_clear)
+
+    def test_get_cache_dir(self):
+        self.assertEqual(cache.get_cache_dir(), self.tmpdir.name)
+        with mock.patch.dict(os.environ, JSONFMT_CACHE_DIR=''):
+            self.assertIsNone(cache.get_cache_dir())
+            self.assertIsNone(cache.get('ns', 'key', []))
+            cache.put('ns', 'key', [], 1)  # nothing happens
+
+        env = {k: v for k, v in os.environ.items() if k != 'JSONFMT_CACHE_DIR'}
+        env['XDG_CACHE_HOME'] = '/xdg'
+        with mock.patch.dict(os.environ, env, clear=True):
+            self.assertEqual(cache.get_cache_dir(), os.path.join('/xdg', 'jsonfmt'))
+
+    def test_get_and_put(self):
+        self.assertIsNone(cache.get('ns', 'key', ['json']))
+        cache.put('ns', 'key', ['json'], {'a': [1, 2]})
+        self.assertEqual(cache.get('ns', 'key', ['json']), {'a': [1, 2]})
+        self.assertIsNone(cache.get('ns', 'other', ['json']))
+        self.assertIsNone(cache.get('other', 'key', ['json']))
+
+    def test_invalidation(self):
+        cache.put('ns', 'key', ['json'], 'value')
+        with mock.patch.object(cache, 'get_stamp', return_value='upgraded'):
+            self.assertIsNone(cache.get('ns', 'key', ['json']))
+        with mock.patch.object(cache, '__version__', '0.0.0'):
+            self.assertIsNone(cache.get('ns', 'key', ['json']))
+        self.assertEqual(cache.get('ns', 'key', ['json']), 'value')
+
+    def test_unpickle_after_check(self):
+        cache.put('ns', 'key', ['json'], 'value')
+        with open(cache.get_path('ns', 'key'), 'rb') as fp:
+            self.assertEqual(json.loads(fp.readline())['key'], 'key')
+
+        with mock.patch('pickle.load') as load:
+            with mock.patch.object(cache, 'get_stamp', return_value='upgraded'):
+                self.assertIsNone(cache.get('ns', 'key', ['json']))
+            os.replace(cache.get_path('ns', 'key'), cache.get_path('ns', 'other'))
+            self.assertIsNone(cache.get('ns', 'other', ['json']))
+            load.assert_not_called()
+
+    @unittest.skipIf(os.name == 'nt', 'the modes of files are POSIX')
+    def test_private_files(self):
+        with mock.patch.dict(os.environ, JSONFMT_CACHE_DIR=os.path.join(self.tmpdir.name, 'jsonfmt')):
+            cache.put('ns', 'key', [], 'value')
+            path = cache.get_path('ns', 'key')
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+            self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777, 0o700)
+            self.assertEqual(os.stat(cache.get_cache_dir()).st_mode & 0o777, 0o700)
+            self.assertEqual(cache.get('ns', 'key', []), 'value')
+
+            # the files which the others can write are not trusted
+            os.chmod(path, 0o620)
+            self.assertIsNone(cache.get('ns', 'key', []))
+            os.chmod(path, 0o600)
+            with mock.patch('os.getuid', return_value=os.getuid() + 1):
+                self.assertIsNone(cache.get('ns', 'key', []))
+
+    def test_broken_file(self):
+        path = cache.get_path('ns', 'key')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'wb') as fp:
+            fp.write(b'broken')
+        self.assertIsNone(cache.get('ns', 'key', []))
+        cache.put('ns', 'key', [], 'value')
+        self.assertEqual(cache.get('ns', 'key', []), 'value')
+
+    def test_get_stamp(self):
+        self.assertEqual(cache.get_stamp('not_exist_module'), 'missing')
+        self.assertIn('jmespath', cache.get_stamp('jmespath'))
+        self.assertEqual(cache.get_stamp('jmespath'), cache.get_stamp('jmespath'))
+
+    def test_parse_querypath(self):
+        qpath = jsonfmt.parse_querypath('$..name', None)
+        self.assertEqual(qpath, jparse('$..name'))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir.name, 'querypath'))), 1)
+
+        # the next run loads the querypath from the cache without compiling it
+        jsonfmt.parse_querypath.cache_clear()
+        with mock.patch.object(jsonfmt, 'compile_querypath') as compile_querypath:
+            self.assertEqual(jsonfmt.parse_querypath('$..name', None), qpath)
+            self.assertEqual(jsonfmt.parse_querypath('$..name', None), qpath)
+            compile_querypath.assert_not_called()
+
+        # the cached entries are separated by the querylang
+        self.assertEqual(jsonfmt.parse_querypath('a.b', 'jmespath'), jcompile('a.b'))
+        self.assertEqual(jsonfmt.parse_querypath('a.b', 'jsonpath'), jparse('a.b'))
+        self.assertEqual(len(os.listdir(os.path.join(self.tmpdir.name, 'querypath'))), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+from datetime import date, datetime
+from hashlib import sha256
+
+from jsonfmt.canonical import canonicalize, fingerprint, format_float, iter_canonical
+
+
+class TestCanonical(unittest.TestCase):
+
+    def test_format_float(self):
+        # the examples of ECMAScript numbers in RFC 8785
+        cases = {
+            0.0: '0',
+            -0.0: '0',
+            1.0: '1',
+            4.5: '4.5',
+            2e-3: '0.002',
+            1e-7: '1e-7',
+            -1e-7: '-1e-7',
+            0.000001: '0.000001',
+            1e21: '1e+21',
+            1e23: '1e+23',
+            123e-20: '1.23e-18',
+            333333333.3333333: '333333333.3333333',
+            9007199254740992.0: '9007199254740992',
+            295147905179352830000.0: '295147905179352830000',
+            5e-324: '5e-324',
+            1.7976931348623157e308: '1.7976931348623157e+308',
+        }
+        for value, expected in cases.items():
+            self.assertEqual(format_float(value), expected)
+
+    def test_canonicalize(self):
+        py_obj = {'b': [1.0, 1e-07, -0.0, 10 ** 30, 'x\n"\u2028'], 'a': {'z': None, 'y': True}, '': False}
+        expected = '{"":false,"a":{"y":true,"z":null},"b":[1,1e-7,0,1000000000000000000000000000000,"x\\n\\"\u2028"]}'
+        self.assertEqual(canonicalize(py_obj), expected)
+        self.assertEqual(canonicalize(py_obj, str_keys=True), expected)
+
+        # the keys are sorted by UTF-16 code units
+        py_obj = {'\u20ac': 'Euro', '\r': 'CR', '\ufb33': 'Hebrew', '1': 'One',
+                  '\U0001f600': 'Smiley', '\x80': 'Control', '\xf6': 'Latin'}
+        expected = ('{"\\r":"CR","1":"One","\x80":"Control","\xf6":"Latin",'
+                    '"\u20ac":"Euro","\U0001f600":"Smiley","\ufb33":"Hebrew"}')
+        self.assertEqual(canonicalize(py_obj), expected)
+        self.assertEqual(canonicalize(py_obj, str_keys=True), expected)
+
+        # the keys of the other types and the datetimes
+        py_obj = {2: date(2024, 1, 2), 10: datetime(2024, 1, 2, 3, 4, 5), True: 1, None: 2}
+        self.assertEqual(canonicalize(py_obj),
+                         '{"10":"2024-01-02T03:04:05","2":"2024-01-02","null":2,"true":1}')
+
+        with self.assertRaises(TypeError):
+            canonicalize({'a': object()}, str_keys=True)
+
+    def test_deep_data(self):
+        depth = 10000
+        py_obj = []
+        for _ in range(depth):
+            py_obj = [{'a': py_obj}]
+        self.assertEqual(canonicalize(py_obj, str_keys=True), '[{"a":' * depth + '[]' + '}]' * depth)
+        self.assertEqual(''.join(iter_canonical(py_obj)), '[{"a":' * depth + '[]' + '}]' * depth)
+
+    def test_fingerprint(self):
+        fp1 = fingerprint({'a': [1, 2.50], 'b': '\u4e2d'})
+        fp2 = fingerprint({'b': '\u4e2d', 'a': [1.0, 2.5]}, str_keys=True)
+        self.assertEqual(fp1, fp2)
+        self.assertEqual(len(fp1), 64)
+        self.assertNotEqual(fp1, fingerprint({'a': [2.5, 1], 'b': '\u4e2d'}))
+        self.assertNotEqual(fingerprint('1'), fingerprint(1))
+
+        # the chunks are hashed in several batches
+        for char in ('\u4e2d', '\U0001F600'):
+            py_obj = [{'a': i * 0.5, 'b': char} for i in range(10000)]
+            expected = sha256(canonicalize(py_obj).encode('utf-8')).hexdigest()
+            self.assertEqual(fingerprint(py_obj), expected)
+            self.assertEqual(fingerprint(py_obj, str_keys=True), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,6 +15,87 @@ class TestDiff(unittest.TestCase):
         self.mock_getstatusoutput = Mock()
         self.mock_system = Mock()
 
+    def test_is_same(self):
+        self.assertTrue(df.is_same({'a': [1, None]}, {'a': [1, None]}))
+        self.assertTrue(df.is_same(float('nan'), float('nan')))
+        self.assertFalse(df.is_same(1, 1.0))
+        self.assertFalse(df.is_same(1, True))
+        self.assertFalse(df.is_same({'a': [1]}, {'a': [True]}))
+        self.assertFalse(df.is_same([0], [0.0]))
+
+    def test_match_items(self):
+        opcodes = list(df.match_items(list('abcdef'), list('axcdfg')))
+        self.assertEqual(opcodes, [('replace', 1, 2, 1, 2), ('delete', 4, 5, 4, 4),
+                                   ('insert', 6, 6, 5, 6)])
+        # the repeated items are matched by difflib
+        self.assertEqual(list(df.match_items([1, 1, 1], [1, 1])), [('delete', 2, 3, 2, 2)])
+        self.assertEqual(list(df.match_items([], [])), [])
+
+    def test_diff_objs(self):
+        old = {'a': 1, 'b': [1, 2, 3, {'x': 1}], 'c': {'d': True}, 'e': 'x'}
+        new = {'a': 1.0, 'b': [0, 1, 3, {'x': 2}], 'c': {'d': 1}, 'f': None}
+        self.assertEqual(df.diff_objs(old, new), [
+            ('replace', ('a',), 1, 1.0),
+            ('add', ('b', 0), None, 0),
+            ('remove', ('b', 2), 2, None),
+            ('replace', ('b', 3, 'x'), 1, 2),
+            ('replace', ('c', 'd'), True, 1),
+            ('remove', ('e',), 'x', None),
+            ('add', ('f',), None, None),
+        ])
+        self.assertEqual(df.diff_objs(old, dict(reversed(old.items()))), [])
+        self.assertEqual(df.diff_objs([1], {'a': 1}), [('replace', (), [1], {'a': 1})])
+
+    def test_diff_shared_objs(self):
+        # the values are the same, though some of them are shared in old, like the aliases of YAML
+        item = {'a': [1, 'x']}
+        old = [item, item, [item, {'b': item}]]
+        new = [{'a': [1, 'x']}, {'a': [1, 'x']}, [{'a': [1, 'x']}, {'b': {'a': [1, 'x']}}]]
+        self.assertEqual(df.diff_objs(old, new), [])
+        self.assertEqual(df.diff_objs([0] + old, new), [('remove', (0,), 0, None)])
+        self.assertTrue(df.is_same(old, new))
+        self.assertEqual(df.get_key(old), df.get_key(new))
+
+    def test_diff_deep_objs(self):
+        def nest(leaf, depth=5000):
+            for _ in range(depth):
+                leaf = [0, leaf]
+            return leaf
+
+        # the subtrees are too deep to be marshaled, and the levels below HASH_DEPTH are hashed
+        changes = df.diff_objs(nest([1, 2]), nest([True, 2]))
+        self.assertEqual(changes, [('replace', (1,) * 5000 + (0,), 1, True)])
+        self.assertEqual(df.diff_objs(nest([1, 2]), nest([1, 2])), [])
+        self.assertTrue(df.is_same(nest({'a': None}), nest({'a': None})))
+        self.assertFalse(df.is_same(nest({'a': None}), nest({'a': None}, 4999)))
+        self.assertEqual(df.get_key(nest([])), df.get_key(nest([])))
+
+        # the deep items of arrays are matched by their hashes
+        old = [nest(i, 3000) for i in range(4)]
+        new = [nest(i, 3000) for i in (0, 9, 1, 2, 3)]
+        (op, path, old_value, new_value), = df.diff_objs(old, new)
+        self.assertEqual((op, path, old_value), ('add', (1,), None))
+        self.assertIs(new_value, new[1])
+
+    def test_to_json_patch(self):
+        changes = df.diff_objs({'a/b': [1, 2], '~': 0}, {'a/b': [2, 3], '~': 1})
+        self.assertEqual(df.to_json_patch(changes), [
+            {'op': 'remove', 'path': '/a~1b/0'},
+            {'op': 'add', 'path': '/a~1b/1', 'value': 3},
+            {'op': 'replace', 'path': '/~0', 'value': 1},
+        ])
+
+    def test_format_changes(self):
+        self.assertEqual(df.format_path(()), '(root)')
+        self.assertEqual(df.format_path(('a', 0, 'b c', 1, 'd.e', 'f')), 'a[0]["b c"][1]["d.e"].f')
+
+        changes = [('add', ('a',), None, [1]), ('remove', ('b', 0), '中文', None),
+                   ('replace', ('c',), 1, None)]
+        self.assertEqual(list(df.format_changes(changes)),
+                         ['+ a: [1]\n', '- b[0]: "中文"\n', '~ c: 1 -> null\n'])
+        self.assertEqual(list(df.format_changes(changes[:1], colored=True)),
+                         ['\033[32m+ a: [1]\033[0m\n'])
+
     def test_cmp_by_diff(self):
 
         self.mock_getstatusoutput.return_value = (0, '')
@@ -0,0 +1,83 @@
+import io
+import sys
+import unittest
+from functools import partial
+from unittest.mock import patch
+
+from jsonfmt.edits import EditTree, apply_ops, compile_edits, compile_tree, read_edits, split_keys
+
+
+class TestEdits(unittest.TestCase):
+
+    def test_split_keys(self):
+        self.assertEqual(split_keys('a'), ['a'])
+        self.assertEqual(split_keys('a.b[0].c'), ['a', 'b', '0', 'c'])
+        self.assertEqual(split_keys('[1][-1]'), ['', '1', '-1'])
+
+    def test_compile_edits(self):
+        edits = compile_edits(('a.b=1', 'a.c=[1]', 'x=2', 'a.d={}'), ('a.b',))
+        self.assertIs(edits, compile_edits(('a.b=1', 'a.c=[1]', 'x=2', 'a.d={}'), ('a.b',)))
+        self.assertEqual([op[-1] for op in edits], ['a.b=1', 'a.c=[1]', 'x=2', 'a.d={}', 'a.b'])
+
+        # the shared parents are visited once
+        tree = compile_tree(('a.b=1', 'a.c=[1]', 'x=2', 'a.d={}'), ('a.b',))
+        self.assertIs(tree, compile_tree(('a.b=1', 'a.c=[1]', 'x=2', 'a.d={}'), ('a.b',)))
+        self.assertEqual([key for key, _ in tree.children], ['a', 'x'])
+        self.assertEqual(list(tree.iter_edits()), ['a.b=1', 'a.c=[1]', 'a.d={}', 'a.b', 'x=2'])
+
+        # the indexes of lists are not reordered
+        tree = compile_tree((), ('l.0', 'l.2', 'l.0'))
+        self.assertEqual([key for key, _ in tree.children[0][1].children], ['0', '2', '0'])
+
+    def test_apply(self):
+        tree = EditTree()
+        for edit in ['a.b=1', 'l[5]=[3]', 'l.0.k=v', 'new={"x": [1]}', 'new.x[1]=2', 's=a=b']:
+            tree.add_set(edit)
+        for edit in ['l.1', 'l.1', 'l.1', 'c']:
+            tree.add_pop(edit)
+
+        # the edits are applied in order, and the values are never shared
+        for _ in range(2):
+            py_obj = {'a': {'b': 0}, 'l': [{}, 1, 2, 3], 'c': None}
+            tree.apply(py_obj)
+            self.assertEqual(py_obj, {'a': {'b': 1}, 'l': [{'k': 'v'}, [3]],
+                                      'new': {'x': [1, 2]}, 's': 'a=b'})
+
+    def test_apply_edits(self):
+        sets = ('a.b=1', 'l[5]=[3]', 'l.0.k=v', 'new={"x": [1]}', 'new.x[1]=2', 's=a=b', 'a.x.y=1', 'l.k=1')
+        pops = ('l.1', 'l.1', 'l.1', 'c', 'a.z')
+
+        # the edits are applied one by one or by the trie in the same way
+        with patch('sys.stderr', io.StringIO()):
+            for apply in [partial(apply_ops, ops=compile_edits(sets, pops)), compile_tree(sets, pops).apply] * 2:
+                py_obj = {'a': {'b': 0}, 'l': [{}, 1, 2, 3], 'c': None}
+                apply(py_obj)
+                self.assertEqual(py_obj, {'a': {'b': 1}, 'l': [{'k': 'v'}, [3]],
+                                          'new': {'x': [1, 2]}, 's': 'a=b'})
+                errors = sys.stderr.getvalue()
+                for edit in ['a.x.y=1', 'l.k=1', 'a.z']:
+                    self.assertEqual(errors.count(f'invalid key path: {edit}\033'), 1)
+                sys.stderr.seek(0)
+                sys.stderr.truncate()
+
+    def test_apply_invalid_edits(self):
+        tree = EditTree()
+        with patch('sys.stderr', io.StringIO()):
+            for edit in ['noequal', 'a.x.y=1', 'l.k=1', 'l.9.k=1', 's.0=1']:
+                tree.add_set(edit)
+            tree.add_pop('a.z')
+            py_obj = {'a': {}, 'l': [1], 's': 'str'}
+            tree.apply(py_obj)
+            errors = sys.stderr.getvalue()
+
+        self.assertEqual(py_obj, {'a': {}, 'l': [1], 's': 'str'})
+        for edit in ['noequal', 'a.x.y=1', 'l.k=1', 'l.9.k=1', 's.0=1', 'a.z']:
+            self.assertIn(f'invalid key path: {edit}\033', errors)
+
+    def test_read_edits(self):
+        edits = io.StringIO('# comment\nname=Alex\n\n  actions[0].calorie=0 \nmoney\nactions.1\n')
+        self.assertEqual(read_edits(edits), (['name=Alex', 'actions[0].calorie=0'], ['money', 'actions.1']))
+
+
+if __name__ == "__main__":
+    unittest.main()
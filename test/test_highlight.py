@@ -0,0 +1,81 @@
+import json
+import re
+import unittest
+
+from jsonfmt import highlight
+
+ANSI_CODE = re.compile(r'\x1b\[[0-9;]*m')
+PY_OBJ = {
+    'str': 'a "quoted"\ttext 中文',
+    'numbers': [0, -1, 2.5, 1e100, float('inf'), float('-inf')],
+    'literals': [True, False, None],
+    'empty': [{}, [], ''],
+    'nested': {'list': [[1, [2]], {'k': {}}]},
+    1: 'int key', 2.5: 'float key', True: 'bool key', None: 'null key',
+}
+
+
+class TestHighlight(unittest.TestCase):
+
+    def test_same_as_json_dumps(self):
+        for escape in [True, False]:
+            for sort_keys in [True, False]:
+                obj = {str(k): v for k, v in PY_OBJ.items()} if sort_keys else PY_OBJ
+                colored = highlight.dumps(obj, compact=True, escape=escape,
+                                          indent='2', sort_keys=sort_keys)
+                expected = json.dumps(obj, ensure_ascii=escape, sort_keys=sort_keys,
+                                      separators=(',', ':'))
+                self.assertEqual(ANSI_CODE.sub('', colored), expected)
+
+                for indent in ['0', '2', '4', 't']:
+                    colored = highlight.dumps(obj, compact=False, escape=escape,
+                                              indent=indent, sort_keys=sort_keys)
+                    expected = json.dumps(obj, ensure_ascii=escape, sort_keys=sort_keys,
+                                          indent='\t' if indent == 't' else int(indent))
+                    self.assertEqual(ANSI_CODE.sub('', colored), expected)
+
+    def test_colors(self):
+        colored = highlight.dumps({'k': ['v', 1, 0.5, True, None]}, compact=True,
+                                  escape=False, indent='2', sort_keys=False)
+        self.assertEqual(colored,
+                         '{\x1b[94m"k"\x1b[39;49;00m:['
+                         '\x1b[33m"v"\x1b[39;49;00m,'
+                         '\x1b[34m1\x1b[39;49;00m,'
+                         '\x1b[34m0.5\x1b[39;49;00m,'
+                         '\x1b[34mtrue\x1b[39;49;00m,'
+                         '\x1b[34mnull\x1b[39;49;00m]}')
+        self.assertEqual(highlight.visible_len(colored), len('{"k":["v",1,0.5,true,null]}'))
+
+    def test_sort_int_keys(self):
+        obj = {10: 'a', 9: 'b', 2.5: {100: 1, 20: 2}}
+        for compact in [True, False]:
+            colored = highlight.dumps(obj, compact=compact, escape=False, indent='2', sort_keys=True)
+            expected = json.dumps(obj, sort_keys=True, indent=None if compact else 2,
+                                  separators=(',', ':') if compact else None)
+            self.assertEqual(ANSI_CODE.sub('', colored), expected)
+        with self.assertRaises(TypeError):
+            highlight.dumps({1: 'a', 'b': 2}, compact=True, escape=False, indent='2', sort_keys=True)
+
+    def test_deep_data(self):
+        depth = 3000
+        py_obj: list = []
+        for _ in range(depth):
+            py_obj = [{'a': py_obj, 'b': 1}]
+        colored = highlight.dumps(py_obj, compact=True, escape=False, indent='2', sort_keys=True)
+        self.assertEqual(ANSI_CODE.sub('', colored), '[{"a":' * depth + '[]' + ',"b":1}]' * depth)
+        colored = highlight.dumps(py_obj[0]['a'][0]['a'], compact=False, escape=False,
+                                  indent='1', sort_keys=False)
+        lines = ANSI_CODE.sub('', colored).splitlines()
+        self.assertEqual(lines[:3], ['[', ' {', '  "a": ['])
+        self.assertEqual(lines[-3:], ['  "b": 1', ' }', ']'])
+        self.assertEqual(len(lines), 5 * (depth - 2) + 1)
+
+    def test_unserializable(self):
+        with self.assertRaises(TypeError):
+            highlight.dumps({'a': {1, 2}}, compact=True, escape=False, indent='2', sort_keys=False)
+        with self.assertRaises(TypeError):
+            highlight.dumps({(1, 2): 1}, compact=True, escape=False, indent='2', sort_keys=False)
+
+
+if __name__ == '__main__':
+    unittest.main()
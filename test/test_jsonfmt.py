@@ -1,5 +1,7 @@
 import json
 import os
+import re
+import shutil
 import sys
 import tempfile
 import unittest
@@ -46,6 +48,9 @@ def color(text, fmt):
         'yaml': partial(highlight, lexer=YamlLexer(), formatter=TerminalFormatter()),
     }
     fn = functions[fmt]
+    if fmt == 'json':
+        # the whitespaces are not colored by the built-in JSON highlighter
+        return re.sub(r'\x1b\[37m(\s*)\x1b\[39;49;00m', r'\1', fn(text))
     return fn(text)
 
 
@@ -58,7 +63,10 @@ class FakeStream(StringIO):
     def isatty(self):
         return self._istty
 
-    def read(self):
+    def read(self, size=-1):
+        if size >= 0:
+            return super().read(size)
+
         self.seek(0)
         content = super().read()
 
@@ -92,6 +100,9 @@ class JSONFormatToolTestCase(unittest.TestCase):
     def setUp(self):
         self.maxDiff = None
         self.py_obj = json.loads(JSON_TEXT)
+        patcher = patch.dict(os.environ, JSONFMT_CACHE_DIR='')  # disable the persistent cache in tests
+        patcher.start()
+        self.addCleanup(patcher.stop)
 
     @contextmanager
     def assertNotRaises(self, exc_type):
@@ -158,6 +169,43 @@ class JSONFormatToolTestCase(unittest.TestCase):
         with self.assertRaises(jsonfmt.FormatError), open(__file__) as fp:
             jsonfmt.parse_to_pyobj(fp.read(), jcompile("actions[0].calorie"))
 
+        # the specified format doesn't fit the text
+        with self.assertRaisesRegex(jsonfmt.FormatError, 'invalid toml data'):
+            jsonfmt.parse_to_pyobj(JSON_TEXT, None, 'toml')
+
+    def test_parse_to_pyobj_with_specified_fmt(self):
+        self.assertEqual(jsonfmt.parse_to_pyobj('[1, 2]', None, 'yaml'), ([1, 2], 'yaml'))
+        self.assertEqual(jsonfmt.parse_to_pyobj('\ufeff{"a": 1}', None), ({'a': 1}, 'json'))
+        self.assertEqual(jsonfmt.parse_to_pyobj(YAML_TEXT, None, filename='a.yml')[1], 'yaml')
+
+    def test_parse_to_pyobj_from_bytes(self):
+        py_obj = json.loads(JSON_TEXT)
+        for text, fmt in [(JSON_TEXT, 'json'), (TOML_TEXT, 'toml'),
+                          (XML_TEXT, 'xml'), (YAML_TEXT, 'yaml')]:
+            self.assertEqual(jsonfmt.parse_to_pyobj(text.encode(), None), (py_obj, fmt))
+            self.assertEqual(jsonfmt.parse_to_pyobj(text.encode('utf-16'), None), (py_obj, fmt))
+
+        # the mapped file is read from the beginning by each parser
+        with tempfile.NamedTemporaryFile('w+', suffix='.json') as tmpfile:
+            tmpfile.write('{a: 1, b: [x, y]}')
+            tmpfile.flush()
+            with jsonfmt.utils.open_input(tmpfile.name) as data:
+                self.assertEqual(jsonfmt.parse_to_pyobj(data, None, filename=tmpfile.name),
+                                 ({'a': 1, 'b': ['x', 'y']}, 'yaml'))
+
+    def test_sniff_formats(self):
+        self.assertEqual(jsonfmt.sniff_formats(JSON_TEXT), ['json', 'yaml'])
+        self.assertEqual(jsonfmt.sniff_formats(TOML_TEXT), ['toml', 'yaml'])
+        self.assertEqual(jsonfmt.sniff_formats(XML_TEXT), ['xml'])
+        self.assertEqual(jsonfmt.sniff_formats(YAML_TEXT), ['yaml'])
+        self.assertEqual(jsonfmt.sniff_formats('- a\n- b'), ['yaml'])
+        self.assertEqual(jsonfmt.sniff_formats('\ufeff  ["a", "b"]'), ['json', 'toml', 'yaml'])
+        self.assertEqual(jsonfmt.sniff_formats('# comment\n{a: 1}'), ['yaml'])
+        self.assertEqual(jsonfmt.sniff_formats('123'), jsonfmt.FORMATS)
+        # the extension of file takes precedence over the ambiguous candidates
+        self.assertEqual(jsonfmt.sniff_formats('[a]\nb = 1', 'c.toml'), ['toml', 'json', 'yaml'])
+        self.assertEqual(jsonfmt.sniff_formats('<a>1</a>', 'c.json'), ['xml'])
+
     def test_modify_pyobj_for_adding(self):
         # test empty sets and pops
         obj = deepcopy(self.py_obj)
@@ -227,14 +275,14 @@ class JSONFormatToolTestCase(unittest.TestCase):
         obj = deepcopy(self.py_obj)
         obj['dict'] = {"a": 7758, "b": [1, 2, 3]}
         expected_1 = {
-            'actions': [],
-            'age': 23,
-            'gender': '...',
-            'money': 3.1415926,
-            'name': '...',
+            'actions': [{'name': 'str', 'calorie': 'float | int', 'date': 'str'}],
+            'age': 'int',
+            'gender': 'str',
+            'money': 'float',
+            'name': 'str',
             'dict': {
-                'a': 7758,
-                'b': []
+                'a': 'int',
+                'b': ['int']
             }
         }
         overview = jsonfmt.get_overview(obj)
@@ -244,14 +292,76 @@ class JSONFormatToolTestCase(unittest.TestCase):
         obj = deepcopy(self.py_obj['actions'])
         expected_2 = [
             {
-                "name": "...",
-                "calorie": 1294.9,
-                "date": "..."
+                "name": "str",
+                "calorie": "float | int",
+                "date": "str"
             }
         ]
         overview = jsonfmt.get_overview(obj)
         self.assertEqual(overview, expected_2)
 
+        # test the optional keys and the union types
+        obj = [{'a': 1, 'b': [], 'c': {'x': None}}, {'a': 'x', 'c': [True]}, {'a': None}, []]
+        expected_3 = {
+            'oneOf': [
+                {
+                    'a': 'int | str | null',
+                    'b?': [],
+                    'c?': {'oneOf': [{'x': 'null'}, ['bool']]}
+                },
+                []
+            ]
+        }
+        self.assertEqual(jsonfmt.get_overview(obj), [expected_3])
+        self.assertEqual(jsonfmt.get_overview([]), [])
+
+        # test deep obj
+        obj = {'a': 'x', 'b': 1}
+        for _ in range(5000):
+            obj = {'a': obj, 'b': [obj]}
+        overview = jsonfmt.get_overview(obj)
+        for _ in range(4999):
+            self.assertEqual(list(overview), ['a', 'b'])
+            self.assertIs(overview['b'][0]['a'], overview['a']['a'])  # the same structures are shared
+            overview = overview['a']
+        self.assertEqual(overview, {'a': {'a': 'str', 'b': 'int'}, 'b': [{'a': 'str', 'b': 'int'}]})
+
+    @patch.multiple(sys, stderr=StdErr())
+    def test_merge_objs(self):
+        base = {'a': {'x': 1, 'l': [1, 2]}, 'b': 1}
+        data = [{'a': {'y': 2, 'l': [2, 3]}}, 'wrong', {'c': {'z': 3}}]
+        merged = jsonfmt.merge_objs(deepcopy(base), *data)
+        self.assertEqual(merged, {'a': {'y': 2, 'l': [2, 3]}, 'b': 1, 'c': {'z': 3}})
+        self.assertIn('invalid data: wrong', sys.stderr.read())
+
+        # the nested dicts and lists are merged in the deep mode
+        expected = {
+            'extend': {'a': {'x': 1, 'l': [1, 2, 2, 3], 'y': 2}, 'b': 1, 'c': {'z': 3}},
+            'replace': {'a': {'x': 1, 'l': [2, 3], 'y': 2}, 'b': 1, 'c': {'z': 3}},
+            'unique': {'a': {'x': 1, 'l': [1, 2, 3], 'y': 2}, 'b': 1, 'c': {'z': 3}},
+        }
+        for strategy, merged in expected.items():
+            self.assertEqual(jsonfmt.merge_objs(deepcopy(base), *deepcopy(data), deep=True,
+                                                list_strategy=strategy), merged)
+
+        # the items of lists are compared with their types
+        self.assertEqual(jsonfmt.merge_objs([1, {'a': 1}], [True, 1.0, {'a': 1}, 1], list_strategy='unique'),
+                         [1, {'a': 1}, True, 1.0])
+        self.assertEqual(jsonfmt.merge_objs([1], 2, [3]), [1, 2, 3])
+
+        # the deep data
+        deep_base = deep_data = {}
+        for _ in range(10000):
+            deep_base = {'a': deep_base, 'b': 1}
+            deep_data = {'a': deep_data, 'c': 2}
+        merged = jsonfmt.merge_objs(deep_base, deep_data, deep=True)
+        for _ in range(10000):
+            self.assertEqual(merged.keys(), {'a', 'b', 'c'})
+            merged = merged['a']
+
+        with self.assertRaises(jsonfmt.FormatError):
+            jsonfmt.merge_objs('base', {})
+
     def test_format_to_text(self):
         py_obj = {"name": "约翰", "age": 30}
         # format to json (compacted)
@@ -296,6 +406,80 @@ class JSONFormatToolTestCase(unittest.TestCase):
                                    compact=False, escape=False,
                                    indent='4', sort_keys=False)
 
+    def test_dump(self):
+        class ChunkRecorder(StringIO):
+            def __init__(self):
+                super().__init__()
+                self.n_writes = 0
+
+            def write(self, text):
+                self.n_writes += 1
+                return super().write(text)
+
+        py_obj = [{'a': i, 'b': [str(i)]} for i in range(5000)]
+        for fmt in ['json', 'yaml']:
+            options = dict(compact=False, escape=False, indent='2', sort_keys=False)
+            fp = ChunkRecorder()
+            jsonfmt.dump(py_obj, fmt, fp, **options)
+            self.assertEqual(fp.getvalue(), jsonfmt.format_to_text(py_obj, fmt, **options))
+            self.assertGreater(fp.n_writes, 2)  # written chunk by chunk
+
+        # the unserializable objects
+        with self.assertRaises(jsonfmt.FormatError):
+            jsonfmt.dump({'a': {1}}, 'json', StringIO(), compact=True, escape=False,
+                         indent='2', sort_keys=False)
+
+    def test_process_records(self):
+        records = [{'a': 1, 'b': 'x'}, {'a': 2}, {'a': 3, 'b': [1]}]
+        py_objs = jsonfmt.process_records(records, jcompile('b'), overview=False,
+                                          sets=[], pops=[])
+        self.assertEqual(list(py_objs), ['x', [1]])
+
+        py_objs = jsonfmt.process_records(deepcopy(records), None, overview=False,
+                                          sets=['c=0'], pops=['a'])
+        self.assertEqual(list(py_objs), [{'b': 'x', 'c': 0}, {'c': 0}, {'b': [1], 'c': 0}])
+
+        py_objs = jsonfmt.process_records(records, None, overview=True, sets=[], pops=[])
+        self.assertEqual(list(py_objs), [{'a': 'int', 'b?': {'oneOf': ['str', ['int']]}}])
+
+        py_objs = jsonfmt.process_records([], None, overview=True, sets=[], pops=[])
+        self.assertEqual(list(py_objs), [])
+
+    def test_format_records(self):
+        texts = jsonfmt.format_records([{'x': 1}, [1]], 'yaml', compact=False, escape=False,
+                                       indent='2', sort_keys=False)
+        self.assertEqual(list(texts), ['x: 1\n', '---\n- 1\n'])
+
+        # the invalid records are skipped
+        with patch('sys.stderr', StdErr()):
+            texts = jsonfmt.format_records([{'a': 1}, [1]], 'toml', compact=False,
+                                           escape=False, indent='2', sort_keys=False)
+            self.assertEqual(list(texts), ['a = 1\n'])
+            self.assertIn('the pyobj must be a Mapping', sys.stderr.read())
+
+    def test_format_array(self):
+        py_obj = jsonfmt.parse_to_pyobj(JSON_TEXT, None)[0]
+        for fmt in ['json', 'xml', 'yaml']:
+            for compact in [True, False]:
+                options = dict(compact=compact, escape=False, indent='t', sort_keys=True)
+                texts = jsonfmt.format_array(iter(py_obj['actions']), fmt, **options)
+                expected = jsonfmt.format_to_text(py_obj['actions'], fmt, **options)
+                self.assertEqual(''.join(texts), expected)
+
+                texts = jsonfmt.format_array(iter([]), fmt, **options)
+                self.assertEqual(''.join(texts), jsonfmt.format_to_text([], fmt, **options))
+
+        # the colored JSON is cut off like the plain one
+        options = dict(compact=False, escape=False, indent='2', sort_keys=False)
+        texts = jsonfmt.format_array(iter([1, 'a']), 'json', colored=True, **options)
+        self.assertEqual(''.join(texts), color('[\n  1,\n  "a"\n]\n', 'json'))
+        texts = jsonfmt.format_array(iter([1, 'a']), 'yaml', colored=True, **options)
+        self.assertEqual(''.join(texts), color('- 1\n', 'yaml') + color('- a\n', 'yaml'))
+
+        with self.assertRaises(jsonfmt.FormatError):
+            list(jsonfmt.format_array(iter([1, 2]), 'toml', compact=False, escape=False,
+                                      indent='2', sort_keys=False))
+
     def test_output(self):
         # output JSON to clipboard
         jsonfmt.TEMP_CLIPBOARD.seek(0)
@@ -329,15 +513,30 @@ class JSONFormatToolTestCase(unittest.TestCase):
             difftool=None,
             overview=False,
             overwrite=False,
+            check=False,
+            hash=False,
+            deep_merge=False,
+            list_merge='extend',
+            patch=False,
+            merge=False,
+            array=False,
+            lines=False,
             compact=False,
             escape=False,
             format=None,
+            input_format=None,
             indent='2',
+            jobs=1,
             querylang=None,
             querypath=None,
             sort_keys=False,
             set=None,
             pop=None,
+            edits=None,
+            profile=None,
+            trace=None,
+            json_backend=None,
+            mem_report=None,
             files=[]
         )
 
@@ -352,18 +551,33 @@ class JSONFormatToolTestCase(unittest.TestCase):
             difftool=None,
             overview=False,
             overwrite=False,
+            check=False,
+            hash=False,
+            deep_merge=False,
+            list_merge='extend',
+            patch=False,
+            merge=False,
+            array=False,
+            lines=False,
             compact=True,
             escape=True,
             format='toml',
+            input_format='yaml',
             indent='4',
+            jobs=1,
             querylang='jsonpath',
             querypath='path.to.json',
             sort_keys=True,
             set='a; b',
             pop='c; d',
+            edits=None,
+            profile=None,
+            trace=None,
+            json_backend=None,
+            mem_report=None,
             files=['file1.json', 'file2.json']
         )
-        with patch('sys.argv', ['jf', '-d', '-c', '-e', '-f', 'toml', '-i', '4',
+        with patch('sys.argv', ['jf', '-d', '-c', '-e', '-f', 'toml', '-F', 'yaml', '-i', '4',
                                 '-l', 'jsonpath', '-p', 'path.to.json', '-s',
                                 '--set', 'a; b', '--pop', 'c; d',
                                 'file1.json', 'file2.json']):
@@ -385,6 +599,20 @@ class JSONFormatToolTestCase(unittest.TestCase):
         self.assertIn(json_output, output)
         self.assertIn(yaml_output, output)
 
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_in_parallel(self):
+        files = [JSON_FILE, 'not_exist_file.json', YAML_FILE, TOML_FILE, XML_FILE]
+        with patch('sys.argv', ['jf', '-j', '3', '-c', '-f', 'json'] + files):
+            jsonfmt.main()
+
+        # the results are in the original order
+        output = sys.stdout.read()
+        titles = [f'{i}. {f}' for i, f in enumerate(files, start=1)]
+        positions = [output.index(title) for title in titles]
+        self.assertEqual(positions, sorted(positions))
+        self.assertEqual(output.count(JSON_TEXT.strip()), 4)
+        self.assertIn("No such file or directory: 'not_exist_file.json'", sys.stderr.read())
+
     def test_main_with_stdin(self):
         with patch.multiple(sys, argv=['jf', '-f', 'yaml'],
                             stdin=StdIn('["a", "b"]'), stdout=StdOut()):
@@ -443,13 +671,42 @@ class JSONFormatToolTestCase(unittest.TestCase):
             jsonfmt.main()
             self.assertEqual(sys.stdout.read(), color(JSON_TEXT, 'json'))
 
+    @patch.multiple(sys, argv=['jf', '-L', '-c', '-p', 'a'])
+    @patch.multiple(sys,
+                    stdin=StdIn('{"a": [1, 2]}\n\n{"b": 0}\n{"a": "x"}\n'),
+                    stdout=StdOut(tty=False))
+    def test_main_lines_mode(self):
+        jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), '[1,2]\n"x"\n')
+
+    @patch.multiple(sys, argv=['jf', '-A', '-f', 'yaml', '--pop', 'date', '-p', '@'])
+    @patch.multiple(sys, stdin=StdIn('[{"a": 1, "date": 0}, {"a": 2}, []]'),
+                    stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_array_mode(self):
+        jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), '- a: 1\n- a: 2\n- []\n')
+        self.assertIn('invalid key path: date', sys.stderr.read())
+
+        with patch.multiple(sys, argv=['jf', '-A'], stdin=StdIn('{"a": 1}')):
+            jsonfmt.main()
+            self.assertIn('the top-level JSON value is not an array', sys.stderr.read())
+
     @patch.multiple(sys, argv=['jf', '-oc'])
     @patch.multiple(sys,
                     stdin=StdIn('{"a": "asfd", "b": [1, 2, 3]}'),
                     stdout=StdOut(tty=False))
     def test_main_overview(self):
         jsonfmt.main()
-        self.assertEqual(sys.stdout.read().strip(), '{"a":"...","b":[]}')
+        self.assertEqual(sys.stdout.read().strip(), '{"a":"str","b":["int"]}')
+
+        # the records in streaming modes are merged into one overview
+        with patch.multiple(sys, argv=['jf', '-Aoc'], stdin=StdIn('[{"a": 1}, {"a": 2.5, "b": null}]')):
+            jsonfmt.main()
+            self.assertEqual(sys.stdout.read(), '[{"a":"int | float","b?":"null"}]\n')
+
+        with patch.multiple(sys, argv=['jf', '-Loc'], stdin=StdIn('{"a": 1}\n{"a": [true]}\n')):
+            jsonfmt.main()
+            self.assertEqual(sys.stdout.read(), '{"a":{"oneOf":["int",["bool"]]}}\n')
 
     @patch('sys.argv', ['jf', '-Ocf', 'json', TOML_FILE])
     def test_main_overwrite_to_original_file(self):
@@ -462,6 +719,50 @@ class JSONFormatToolTestCase(unittest.TestCase):
             with open(TOML_FILE, 'w') as toml_fp:
                 toml_fp.write(TOML_TEXT)
 
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_overwrite_unchanged(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            formated = os.path.join(tmpdir, 'formated.json')
+            unformated = os.path.join(tmpdir, 'unformated.json')
+            with open(formated, 'w') as fp:
+                fp.write('{\n  "a": 1\n}\n')
+            with open(unformated, 'w') as fp:
+                fp.write('{"a":1}')
+            os.utime(formated, ns=(0, 0))
+
+            # check mode writes nothing and exits with 1
+            with patch('sys.argv', ['jf', '--check', formated, unformated]), \
+                    self.assertRaises(SystemExit) as cm:
+                jsonfmt.main()
+            self.assertEqual(cm.exception.code, 1)
+            self.assertEqual(sys.stdout.read(), f'{unformated}\n')
+            with open(unformated) as fp:
+                self.assertEqual(fp.read(), '{"a":1}')
+
+            # the unchanged file is left alone
+            with patch('sys.argv', ['jf', '-O', formated, unformated]):
+                jsonfmt.main()
+            self.assertEqual(os.stat(formated).st_mtime_ns, 0)
+            with open(unformated) as fp:
+                self.assertEqual(fp.read(), '{\n  "a": 1\n}\n')
+            errmsg = sys.stderr.read()
+            self.assertIn('formated.json is unchanged', errmsg)
+            self.assertIn('result written to unformated.json', errmsg)
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['formated.json', 'unformated.json'])
+
+            # all of the files are formated
+            with patch('sys.argv', ['jf', '--check', formated, unformated]):
+                jsonfmt.main()
+            self.assertEqual(sys.stdout.read(), '')
+
+        # check the data from stdin
+        with patch.multiple(sys, argv=['jf', '--check', '-c'], stdin=StdIn('{"a":1}\n')):
+            jsonfmt.main()
+        with patch.multiple(sys, argv=['jf', '--check'], stdin=StdIn('{"a":1}\n')), \
+                self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), '<stdin>\n')
+
     @patch.multiple(sys, argv=['jf', '-Cc', JSON_FILE, TOML_FILE])
     def test_main_copy_to_clipboard(self):
         if jsonfmt.is_clipboard_available():
@@ -496,8 +797,105 @@ class JSONFormatToolTestCase(unittest.TestCase):
             with open(JSON_FILE, 'w') as fp:
                 fp.write(JSON_TEXT)
 
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_edits_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as edits_fp:
+            edits_fp.write('# the sets\nname=Alex\nactions[0].calorie=0\n\n# the pops\nmoney\nactions.1\n')
+        try:
+            with patch('sys.argv', ['jf', '-c', '--set', 'age=32', '--edits', edits_fp.name, JSON_FILE]):
+                jsonfmt.main()
+            py_obj = json.loads(sys.stdout.read())
+            self.assertEqual((py_obj['name'], py_obj['age']), ('Alex', 32))
+            self.assertEqual(py_obj['actions'][0]['calorie'], 0)
+            self.assertNotIn('money', py_obj)
+            self.assertEqual(len(py_obj['actions']), 2)
+
+            # the edits are applied to each record in the streaming modes
+            with patch.multiple(sys, argv=['jf', '-L', '-c', '--edits', edits_fp.name],
+                                stdin=StdIn('{"name": "Bob", "money": 1}\n{"name": "Tom", "actions": [1, 2]}\n')):
+                jsonfmt.main()
+            self.assertEqual(sys.stdout.read(), '{"name":"Alex"}\n{"name":"Alex","actions":[1]}\n')
+            self.assertIn('invalid key path: actions[0].calorie=0', sys.stderr.read())
+
+            # a single document is edited without the trie, whatever has been run before
+            with patch('sys.argv', ['jf', '-c', '--edits', edits_fp.name, JSON_FILE]), \
+                    patch('jsonfmt.edits.compile_tree') as compile_tree:
+                jsonfmt.main()
+            compile_tree.assert_not_called()
+            self.assertEqual(json.loads(sys.stdout.read())['name'], 'Alex')
+        finally:
+            os.remove(edits_fp.name)
+
+        with patch('sys.argv', ['jf', '--edits', 'nothing.txt', JSON_FILE]), self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn("No such file or directory: 'nothing.txt'", sys.stderr.read())
+
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_merge_mode(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            file1 = os.path.join(tmpdir, '1.json')
+            file2 = os.path.join(tmpdir, '2.yaml')
+            file3 = os.path.join(tmpdir, '3.toml')
+            with open(file1, 'w') as fp:
+                fp.write('{"a": {"x": 1, "l": [1, 2]}, "b": 1}')
+            with open(file2, 'w') as fp:
+                fp.write('a:\n  y: 2\n  l: [2, 3]\nc: 3\n')
+            with open(file3, 'w') as fp:
+                fp.write('[a]\nz = 9\n')
+
+            # the output is in the format of the first file
+            with patch('sys.argv', ['jf', '-m', '-c', file1, file2, file3]):
+                jsonfmt.main()
+            self.assertEqual(sys.stdout.read(), '{"a":{"z":9},"b":1,"c":3}\n')
+
+            for jobs in ['1', '2']:
+                with patch('sys.argv', ['jf', '-m', '-c', '-j', jobs, '--deep-merge',
+                                        '--list-merge', 'unique', file1, file2, file3]):
+                    jsonfmt.main()
+                self.assertEqual(sys.stdout.read(), '{"a":{"x":1,"l":[1,2,3],"y":2,"z":9},"b":1,"c":3}\n')
+
+            with patch('sys.argv', ['jf', '--deep-merge', file1]), self.assertRaises(SystemExit):
+                jsonfmt.main()
+            self.assertIn('--deep-merge and --list-merge are only valid in MergeMode', sys.stderr.read())
+
     @patch.multiple(sys, stdout=StdOut(), stderr=StdErr())
     def test_main_diff_mode(self):
+        # the built-in diff
+        another = f'{BASE_DIR}/test/another.json'
+        with patch.multiple(sys, argv=['jf', '-d', JSON_FILE, another], stdout=StdOut(tty=False)):
+            jsonfmt.main()
+            self.assertEqual(sys.stdout.read(), '~ name: "Bob" -> "Tom"\n'
+                                                '~ gender: "纯爷们" -> "male"\n'
+                                                '~ actions[0].name: "eating" -> "thinking"\n'
+                                                '- actions[1]: {"name": "sporting", "calorie": -2375, '
+                                                '"date": "2023-04-27"}\n')
+
+        with patch.multiple(sys, argv=['jf', '-d', '--patch', '-c', '-p', 'actions', JSON_FILE, another],
+                            stdout=StdOut(tty=False)):
+            jsonfmt.main()
+            self.assertEqual(sys.stdout.read(), '[{"op":"replace","path":"/0/name","value":"thinking"},'
+                                                '{"op":"remove","path":"/1"}]\n')
+
+        with patch.multiple(sys, argv=['jf', '-d', JSON_FILE, YAML_FILE]):
+            jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), '')
+        self.assertIn('no difference', sys.stderr.read())
+
+        # the changes are colored on the TTY
+        with patch.multiple(sys, argv=['jf', '-d', '-p', 'name', JSON_FILE, another]):
+            jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), '\033[33m~ (root): "Bob" -> "Tom"\033[0m\n')
+
+        with patch.multiple(sys, argv=['jf', '--patch', JSON_FILE]), self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn('--patch is only valid in DiffMode', sys.stderr.read())
+
+        with patch.multiple(sys, argv=['jf', '-d', '-A', JSON_FILE, another]), \
+                self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn('DiffMode is not supported in streaming modes', sys.stderr.read())
+
+        # the diff tools
         # right way
         with patch.multiple(sys, argv=['jf', '-D', 'diff', JSON_FILE, XML_FILE]), \
                 self.assertNotRaises(SystemExit):
@@ -514,6 +912,178 @@ class JSONFormatToolTestCase(unittest.TestCase):
             jsonfmt.main()
         self.assertIn("No such file or directory: 'nothing'", sys.stderr.read())
 
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_hash_mode(self):
+        # the same data in different formats have the same fingerprint
+        with patch.multiple(sys, argv=['jf', '--hash', JSON_FILE, TOML_FILE, XML_FILE, YAML_FILE]):
+            jsonfmt.main()
+        lines = sys.stdout.read().splitlines()
+        self.assertEqual([line.split('  ')[1] for line in lines],
+                         [JSON_FILE, TOML_FILE, XML_FILE, YAML_FILE])
+        self.assertEqual(len({line.split('  ')[0] for line in lines}), 1)
+
+        # the keys are unordered and the numbers are normalized
+        with patch.multiple(sys, argv=['jf', '--hash', '-p', 'actions[0]', JSON_FILE]):
+            jsonfmt.main()
+        with patch.multiple(sys, argv=['jf', '--hash'],
+                            stdin=StdIn('{"date": "2021-03-02", "calorie": 12949e-1, "name": "eating"}')):
+            jsonfmt.main()
+        fingerprint1, fingerprint2 = [line.split('  ') for line in sys.stdout.read().splitlines()]
+        self.assertEqual(fingerprint1[0], fingerprint2[0])
+        self.assertEqual(fingerprint2[1], '-')
+
+        # exit with 1 if the data are different
+        another = f'{BASE_DIR}/test/another.json'
+        with patch.multiple(sys, argv=['jf', '--hash', JSON_FILE, another]), \
+                self.assertRaises(SystemExit) as ctx:
+            jsonfmt.main()
+        self.assertEqual(ctx.exception.code, 1)
+        self.assertEqual(len(sys.stdout.read().splitlines()), 2)
+
+        with patch.multiple(sys, argv=['jf', '--hash', JSON_FILE, 'nothing.json']), \
+                self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn("No such file or directory: 'nothing.json'", sys.stderr.read())
+
+        with patch.multiple(sys, argv=['jf', '--hash', '-L', JSON_FILE]), self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn('HashMode is not supported in streaming modes', sys.stderr.read())
+
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_profile(self):
+        # the report is printed to stderr, and the output is unchanged
+        with patch.multiple(sys, argv=['jf', '--profile', 'table', '-p', 'actions[0]', JSON_FILE]):
+            jsonfmt.main()
+        self.assertEqual(json.loads(sys.stdout.read()), json.loads(JSON_TEXT)['actions'][0])
+        report = sys.stderr.read()
+        for stage in ['read', 'detect', 'parse', 'query', 'format', 'output', 'wall']:
+            self.assertRegex(report, rf'(?m)^{stage}\s')
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            trace_path = os.path.join(tmpdir, 'trace.json')
+            with patch.multiple(sys, argv=['jf', '--profile', 'json', '--trace', trace_path, '-j', '2',
+                                           JSON_FILE, YAML_FILE]):
+                jsonfmt.main()
+            report = json.loads(sys.stderr.read())
+            self.assertEqual(sorted(report['files']), sorted([JSON_FILE, YAML_FILE]))
+            self.assertEqual(report['stages']['parse']['calls'], 2)
+            with open(trace_path) as trace_fp:
+                events = json.load(trace_fp)['traceEvents']
+            self.assertEqual(sorted(e['name'] for e in events if e.get('cat') == 'other'),
+                             sorted([JSON_FILE, YAML_FILE]))
+
+            # each task of the workers sends back its own timings, and each output is counted once
+            files = [shutil.copy(JSON_FILE, os.path.join(tmpdir, f'{idx}.json')) for idx in range(6)]
+            for jobs in ['1', '2']:
+                with patch.multiple(sys, argv=['jf', '--profile', 'json', '-c', '-j', jobs, *files]):
+                    jsonfmt.main()
+                report = json.loads(sys.stderr.read())
+                self.assertEqual(sorted(report['files']), sorted(files))
+                for stage in ['parse', 'format', 'output']:
+                    self.assertEqual(report['stages'][stage]['calls'], len(files), (jobs, stage))
+
+        # the report is printed even if a file fails
+        with patch.multiple(sys, argv=['jf', '--profile', 'table', 'nothing.json']):
+            jsonfmt.main()
+        self.assertRegex(sys.stderr.read(), r'(?m)^wall\s')
+        # the stages are not timed any more
+        self.assertFalse(hasattr(jsonfmt.parse_to_pyobj, '__wrapped__'))
+
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_mem_report(self):
+        with patch.multiple(sys, argv=['jf', '--mem-report', 'json', JSON_FILE, YAML_FILE]):
+            jsonfmt.main()
+        output = sys.stdout.read()
+        self.assertIn('"name":', output)  # JSON
+        self.assertIn('name:', output)  # YAML
+        report = json.loads(sys.stderr.read())
+        self.assertEqual(sorted(report['files']), sorted([JSON_FILE, YAML_FILE]))
+        self.assertEqual(report['objects']['count'], 2)
+        self.assertGreater(report['stages']['parse']['retained'], 0)
+
+        # the tasks of the workers are measured one by one
+        with tempfile.TemporaryDirectory() as tmpdir:
+            files = [shutil.copy(JSON_FILE, os.path.join(tmpdir, f'{idx}.json')) for idx in range(6)]
+            with patch.multiple(sys, argv=['jf', '--mem-report', 'json', '-c', '-j', '2', *files]):
+                jsonfmt.main()
+        report = json.loads(sys.stderr.read())
+        self.assertEqual(sorted(report['files']), sorted(files))
+        self.assertEqual(report['objects']['count'], len(files))
+        self.assertEqual(report['stages']['parse']['calls'], len(files))
+        self.assertTrue(all(report['files'].values()))
+
+        # the records are measured one by one in the streaming modes
+        with patch.multiple(sys, argv=['jf', '--mem-report', 'table', '-L'],
+                            stdin=StdIn('{"a": 1}\n{"a": 2}\n{"a": 3}\n')):
+            jsonfmt.main()
+        self.assertIn('3 parsed object(s)', sys.stderr.read())
+
+        with patch.multiple(sys, argv=['jf', '--mem-report', 'table', '--profile', 'table', JSON_FILE]), \
+                self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn('--mem-report can not be used with --profile or --trace', sys.stderr.read())
+
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_json_backend(self):
+        from jsonfmt import backends
+
+        # the output is the same with any of the backends
+        outputs = []
+        for name in backends.names():
+            for options in [[], ['-c'], ['-s'], ['-i', '4'], ['-e']]:
+                with patch.multiple(sys, argv=['jf', '--json-backend', name, *options, JSON_FILE]):
+                    jsonfmt.main()
+            outputs.append(sys.stdout.read())
+        self.assertEqual(len(set(outputs)), 1)
+
+        with patch.dict(os.environ, {backends.env_name(): 'nothing'}), \
+                patch.multiple(sys, argv=['jf', JSON_FILE]), self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn('unknown JSON backend: nothing', sys.stderr.read())
+        backends.select(None)
+
+        # the backends of the other formats are selected by the environment variables
+        with patch.dict(os.environ, {backends.env_name('toml'): 'toml'}), \
+                patch.multiple(sys, argv=['jf', '-f', 'json', TOML_FILE]):
+            jsonfmt.main()
+        self.assertEqual(json.loads(sys.stdout.read())['name'], 'Bob')
+        with patch.dict(os.environ, {backends.env_name('toml-writer'): 'nothing'}), \
+                patch.multiple(sys, argv=['jf', TOML_FILE]), self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn('unknown TOML WRITER backend: nothing', sys.stderr.read())
+        backends.select(None, 'toml')
+        backends.select(None, 'toml-writer')
+
+    @patch.multiple(sys, stdout=StdOut(tty=False), stderr=StdErr())
+    def test_main_yaml_documents(self):
+        text = '---\nkind: Service\nname: a\n---\nkind: Deployment\nname: b\n'
+
+        # the documents are processed one by one, and kept as a stream in YAML
+        with patch.multiple(sys, argv=['jf', '-F', 'yaml', '--set', 'ns=x', '-p', '@'], stdin=StdIn(text)):
+            jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), 'kind: Service\nname: a\nns: x\n---\n'
+                                            'kind: Deployment\nname: b\nns: x\n')
+
+        # and as an array in the other formats
+        with patch.multiple(sys, argv=['jf', '-F', 'yaml', '-f', 'json', '-c', '-p', 'kind'], stdin=StdIn(text)):
+            jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), '["Service","Deployment"]\n')
+
+        # the documents are read one by one in LinesMode, and the unmatched ones are skipped
+        with patch.multiple(sys, argv=['jf', '-L', '-F', 'yaml', '-f', 'json', '-p', 'replicas || name'],
+                            stdin=StdIn(text.replace('name: b', 'replicas: 3'))):
+            jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), '"a"\n3\n')
+
+        # the YAML files are detected by the extension, and output in YAML by default
+        with patch.multiple(sys, argv=['jf', '-L', YAML_FILE]):
+            jsonfmt.main()
+        self.assertEqual(sys.stdout.read(), YAML_TEXT)
+
+        with patch.multiple(sys, argv=['jf', '-A', '-F', 'yaml', YAML_FILE]), self.assertRaises(SystemExit):
+            jsonfmt.main()
+        self.assertIn('only JSON input is supported in ArrayMode', sys.stderr.read())
+
 
 if __name__ == "__main__":
     unittest.main()
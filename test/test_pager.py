@@ -0,0 +1,81 @@
+import os
+import tempfile
+import unittest
+from io import StringIO
+from os import terminal_size
+from unittest import mock
+
+from jsonfmt import pager
+from jsonfmt.pager import Pager
+
+
+@mock.patch.object(pager, 'get_terminal_size', lambda: terminal_size((20, 5)))
+class TestPager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.paged_file = os.path.join(self.tmpdir.name, 'paged.txt')
+
+    def paged_text(self) -> str:
+        with open(self.paged_file) as fp:
+            return fp.read()
+
+    def test_print_directly(self):
+        output_fp = StringIO()
+        with mock.patch.object(pager, 'get_pager_cmd') as get_pager_cmd, Pager(output_fp) as pgr:
+            pgr.write('\033[33m"a"\033[39;49;00m\n')
+            pgr.write('b\nc\n')
+            self.assertEqual(output_fp.getvalue(), '')  # not decided yet
+        get_pager_cmd.assert_not_called()
+        self.assertEqual(output_fp.getvalue(), '\033[33m"a"\033[39;49;00m\nb\nc\n')
+
+    def test_stream_into_pager(self):
+        output_fp = StringIO()
+        lines = [f'line {i}\n' for i in range(100)]
+        with mock.patch.object(pager, 'get_pager_cmd', return_value=f'cat > {self.paged_file}'):
+            with Pager(output_fp) as pgr:
+                for idx, line in enumerate(lines):
+                    pgr.write(line)
+                    # the pager was started once the first screen was filled
+                    self.assertEqual(pgr.process is not None, idx >= 4)
+        self.assertEqual(output_fp.getvalue(), '')
+        self.assertEqual(self.paged_text(), ''.join(lines))
+
+    def test_long_line(self):
+        text = 'x' * 1000 + '\n'
+        with mock.patch.object(pager, 'get_pager_cmd', return_value=f'cat > {self.paged_file}'):
+            with Pager(StringIO()) as pgr:
+                pgr.write(text)
+                pgr.write(text)
+        self.assertEqual(self.paged_text(), text * 2)
+
+    def test_quit_pager_early(self):
+        with mock.patch.object(pager, 'get_pager_cmd', return_value='true'):
+            with Pager(StringIO()) as pgr:
+                for _ in range(10000):
+                    pgr.write('x' * 100 + '\n')
+                    pgr.flush()
+        self.assertTrue(pgr.broken)
+
+    def test_fallback_to_pydoc(self):
+        text = ''.join(f'line {i}\n' for i in range(10))
+        with mock.patch.object(pager, 'get_pager_cmd', return_value=None), \
+                mock.patch('pydoc.pager') as pydoc_pager:
+            with Pager(StringIO()) as pgr:
+                pgr.write(text[:20])
+                pgr.write(text[20:])
+        pydoc_pager.assert_called_once_with(text)
+
+    def test_get_pager_cmd(self):
+        with mock.patch.dict(os.environ, PAGER='more', MANPAGER='', TERM='xterm'):
+            self.assertEqual(pager.get_pager_cmd(), 'more')
+        with mock.patch.dict(os.environ, PAGER='more', TERM='dumb'):
+            self.assertIsNone(pager.get_pager_cmd())
+        with mock.patch.dict(os.environ, PAGER='', MANPAGER='', TERM='xterm'), \
+                mock.patch.object(pager, 'which', return_value='/usr/bin/less'):
+            self.assertEqual(pager.get_pager_cmd(), 'less -R')
+
+
+if __name__ == '__main__':
+    unittest.main()
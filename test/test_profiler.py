@@ -0,0 +1,133 @@
+import io
+import json
+import os
+import sys
+import tracemalloc
+import unittest
+from unittest.mock import patch
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+from jsonfmt import jsonfmt, profiler, stream, utils  # noqa: E402
+
+
+class TestProfiler(unittest.TestCase):
+
+    def setUp(self):
+        patcher = patch.dict(os.environ, JSONFMT_CACHE_DIR='')  # disable the persistent cache in tests
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_profile(self):
+        profile = profiler.Profile(tracing=True)
+        outer = profile.enter()
+        inner = profile.enter()
+        profile.leave('parse', inner)
+        profile.leave('other', outer, 'a.json')
+
+        (calls, total, self_time), (_, other_total, other_self) = profile.stats['parse'], profile.stats['other']
+        self.assertEqual((calls, total, self_time), (1, total, total))
+        self.assertEqual(other_self, other_total - total)
+        self.assertEqual(profile.files, {'a.json': other_total})
+        self.assertEqual([e[:2] for e in profile.events], [('parse', 'parse'), ('other', 'a.json')])
+
+        # the timings of workers are added up
+        worker = profiler.Profile(tracing=True)
+        worker.stats = {'parse': [2, 10, 10]}
+        worker.files = {'a.json': 5}
+        worker.events = [('parse', 'parse', 0, 10, 1)]
+        profile.merge(worker)
+        self.assertEqual(profile.stats['parse'], [3, total + 10, total + 10])
+        self.assertEqual(profile.files, {'a.json': other_total + 5})
+        self.assertEqual(len(profile.events), 3)
+
+    def test_profiling(self):
+        originals = (jsonfmt.parse_to_pyobj, utils.open_input, stream.iter_json_lines)
+        with profiler.profiling(jsonfmt) as profile:
+            self.assertIsNot(jsonfmt.parse_to_pyobj, originals[0])
+            with utils.open_input(io.StringIO('{"a": [1, 2]}')) as data:
+                py_obj, _ = jsonfmt.parse_to_pyobj(data, jsonfmt.parse_querypath('a', None))
+            self.assertEqual(py_obj, [1, 2])
+            self.assertEqual(list(stream.iter_json_lines(io.StringIO('1\n2\n'))), [1, 2])
+
+        # the originals are restored
+        self.assertEqual((jsonfmt.parse_to_pyobj, utils.open_input, stream.iter_json_lines), originals)
+        self.assertEqual(sorted(profile.stats), ['detect', 'parse', 'query', 'read'])
+        self.assertEqual(profile.stats['parse'][0], 4)  # one document and three reads of the records
+        self.assertIsNone(profile.events)
+
+    def test_report(self):
+        profile = profiler.Profile(tracing=True)
+        profile.stats = {'parse': [1, 3_000_000, 2_000_000], 'format': [2, 1_000_000, 1_000_000]}
+        profile.files = {'a.json': 4_000_000}
+        profile.events = [('parse', 'parse', profile.start + 1000, 3_000_000, profile.pid)]
+
+        lines = profiler.format_table(profile, 8_000_000).splitlines()
+        self.assertEqual(lines[0].split(), ['stage', 'calls', 'total(ms)', 'self(ms)', 'self%'])
+        self.assertEqual(lines[1].split(), ['parse', '1', '3.000', '2.000', '25.0%'])
+        self.assertEqual(lines[2].split(), ['format', '2', '1.000', '1.000', '12.5%'])
+        self.assertEqual(lines[3].split(), ['wall', '8.000'])
+
+        report = profiler.to_report(profile, 8_000_000)
+        self.assertEqual(report['wall'], 0.008)
+        self.assertEqual(report['stages']['parse'], {'calls': 1, 'total': 0.003, 'self': 0.002})
+        self.assertEqual(report['files'], {'a.json': 0.004})
+
+        fp = io.StringIO()
+        profiler.write_trace(profile, fp)
+        meta, event = json.loads(fp.getvalue())['traceEvents']
+        self.assertEqual(meta['args'], {'name': 'jsonfmt'})
+        self.assertEqual(event, {'name': 'parse', 'cat': 'parse', 'ph': 'X', 'pid': profile.pid,
+                                 'tid': profile.pid, 'ts': 1.0, 'dur': 3000.0})
+
+    def test_graph_size(self):
+        shared = 'x' * 100
+        py_obj = {'a': [shared, shared], 'b': (1, 2.5)}
+        size = profiler.graph_size(py_obj)
+        self.assertEqual(size, sum(map(sys.getsizeof, [py_obj, 'a', py_obj['a'], shared,
+                                                       'b', py_obj['b'], 1, 2.5])))
+
+    def test_memory_profile(self):
+        self.assertFalse(tracemalloc.is_tracing())
+        with patch('sys.stderr', io.StringIO()) as stderr, profiler.accounting(jsonfmt, 'json') as profile:
+            self.assertTrue(tracemalloc.is_tracing())
+            outer = profile.enter()
+            inner = profile.enter()
+            data = [list(range(100)) for _ in range(1000)]
+            profile.leave('parse', inner)
+            profile.measure(data)
+            profile.leave('other', outer, 'a.json')
+            size = profiler.graph_size(data)
+            del data
+            worker = profiler.MemoryProfile()
+
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(json.loads(stderr.getvalue())['objects'], {'count': 1, 'largest': size, 'total': size})
+        calls, peak, retained = profile.stats['parse']
+        self.assertEqual(calls, 1)
+        self.assertGreater(retained, 800_000)
+        self.assertGreaterEqual(peak, retained)
+        # the peaks of the children are included by their parents
+        self.assertGreaterEqual(profile.stats['other'][1], peak)
+        self.assertEqual(profile.files['a.json'], profile.stats['other'][1])
+
+        # the peaks of workers are the largest ones, the retained is not added up
+        worker.start, worker.peak = 0, peak * 2
+        worker.stats = {'parse': [3, peak * 2, 10]}
+        worker.files = {'b.json': 100}
+        worker.objects = [3, 10, 30]
+        profile.merge(worker)
+        self.assertEqual(profile.stats['parse'], [4, peak * 2, retained])
+        self.assertEqual(profile.files['b.json'], 100)
+        self.assertEqual(profile.objects, [4, size, size + 30])
+        self.assertEqual(profile.peak - profile.start, peak * 2)
+
+    def test_format_size(self):
+        self.assertEqual(profiler.format_size(100), '100 B')
+        self.assertEqual(profiler.format_size(1536), '1.5 KB')
+        self.assertEqual(profiler.format_size(3 * 2 ** 20), '3.0 MB')
+        self.assertEqual(profiler.format_size(5 * 2 ** 30), '5.0 GB')
+
+
+if __name__ == "__main__":
+    unittest.main()
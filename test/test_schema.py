@@ -0,0 +1,74 @@
+import unittest
+from datetime import date
+
+from jsonfmt.schema import Schema, get_type_name
+
+
+class TestSchema(unittest.TestCase):
+
+    def test_get_type_name(self):
+        self.assertEqual(get_type_name('x'), 'str')
+        self.assertEqual(get_type_name(1), 'int')
+        self.assertEqual(get_type_name(1.5), 'float')
+        self.assertEqual(get_type_name(True), 'bool')
+        self.assertEqual(get_type_name(None), 'null')
+        self.assertEqual(get_type_name(date(2024, 1, 1)), 'date')
+
+    def test_add(self):
+        schema = Schema()
+        self.assertIsNone(schema.to_py())
+
+        schema.add({'id': 1, 'tags': ['a'], 'user': {'name': 'x'}})
+        self.assertEqual(schema.to_py(), {'id': 'int', 'tags': ['str'], 'user': {'name': 'str'}})
+
+        schema.add({'id': 2, 'tags': [], 'user': None, 'extra': (1, 'b')})
+        schema.add({'id': 'x', 'tags': [1], 'user': {'name': 'y', 'age': 3}})
+        self.assertEqual(schema.count, 3)
+        self.assertEqual(schema.to_py(), {
+            'id': 'int | str',
+            'tags': ['str | int'],
+            'user': {'oneOf': ['null', {'name': 'str', 'age?': 'int'}]},
+            'extra?': ['int | str'],
+        })
+
+    def test_bounded_size(self):
+        schema = Schema()
+        for i in range(1000):
+            schema.add([{'i': i, 'values': [i] * 10}])
+        self.assertEqual(len(schema.items.fields), 2)  # type: ignore
+        self.assertEqual(schema.to_py(), [{'i': 'int', 'values': ['int']}])
+
+    def test_repeated_values(self):
+        user = {'name': 'x', 'tags': ['a']}
+        schema = Schema()
+        schema.add({'owner': user, 'members': [user, user, {'name': 'y'}], 'reviewers': [user]})
+        self.assertEqual(schema.to_py(), {
+            'owner': {'name': 'str', 'tags': ['str']},
+            'members': [{'name': 'str', 'tags?': ['str']}],
+            'reviewers': [{'name': 'str', 'tags': ['str']}],
+        })
+        self.assertEqual(schema.fields['members'].items.count, 3)  # type: ignore
+
+        # the shared schemas are copied before being changed
+        schema.add({'owner': {'name': 1}, 'members': [], 'reviewers': [user]})
+        self.assertEqual(schema.to_py(), {
+            'owner': {'name': 'str | int', 'tags?': ['str']},
+            'members': [{'name': 'str', 'tags?': ['str']}],
+            'reviewers': [{'name': 'str', 'tags': ['str']}],
+        })
+
+        # the aliases of YAML are merged once
+        value: list = ['x']
+        for _ in range(100):
+            value = [value, value]
+        schema = Schema()
+        schema.add(value)
+        py_obj = schema.to_py()
+        for _ in range(101):
+            self.assertEqual(len(py_obj), 1)
+            py_obj = py_obj[0]
+        self.assertEqual(py_obj, 'str')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import subprocess
+import sys
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the budget of the cumulative import time of `jsonfmt.jsonfmt` (microseconds)
+IMPORT_TIME_BUDGET = 100_000
+HEAVY_MODULES = ['jmespath', 'jsonpath_ng', 'ply', 'pygments', 'pyperclip', 'toml',
+                 'yaml', 'pydoc', 'tempfile', 'unittest', 'xml', 'concurrent.futures']
+
+# print the heavy modules which were imported after running `jf`
+CHECK_SCRIPT = f'''
+import sys
+from jsonfmt import jsonfmt
+sys.argv = ['jf'] + sys.argv[1:]
+jsonfmt.main()
+imported = [m for m in {HEAVY_MODULES!r} if m in sys.modules]
+print(','.join(imported), file=sys.stderr)
+'''
+
+
+def run_python(*args: str, stdin: str = '') -> subprocess.CompletedProcess:
+    env = dict(os.environ, PYTHONPATH=BASE_DIR, JSONFMT_CACHE_DIR='')
+    return subprocess.run([sys.executable, *args], input=stdin, env=env, cwd=BASE_DIR,
+                          capture_output=True, text=True, check=True)
+
+
+class TestStartup(unittest.TestCase):
+
+    def imported_modules(self, stdin: str, *options: str) -> set:
+        result = run_python('-c', CHECK_SCRIPT, *options, stdin=stdin)
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else ''
+        return set(filter(None, last_line.split(',')))
+
+    def test_import_time(self):
+        cost = float('inf')
+        for _ in range(3):
+            result = run_python('-X', 'importtime', '-c', 'import jsonfmt.jsonfmt')
+            for line in result.stderr.splitlines():
+                _, cumulative, name = line.split('|')
+                if name.strip() == 'jsonfmt.jsonfmt':
+                    cost = min(cost, int(cumulative))
+        self.assertLess(cost, IMPORT_TIME_BUDGET)
+
+    def test_lazy_imports(self):
+        # no heavy module is imported by importing only
+        result = run_python('-c', f'import sys, jsonfmt.jsonfmt; '
+                                  f'print([m for m in {HEAVY_MODULES!r} if m in sys.modules])')
+        self.assertEqual(result.stdout.strip(), '[]')
+
+        # formatting JSON
+        self.assertEqual(self.imported_modules('{"a": [1, 2]}', '-c'), set())
+        # converting JSON to YAML
+        self.assertEqual(self.imported_modules('{"a": [1, 2]}', '-f', 'yaml'), {'yaml'})
+        # querying by JMESPath
+        self.assertEqual(self.imported_modules('{"a": [1, 2]}', '-p', 'a[0]'), {'jmespath'})
+        # querying by JSONPath (some versions of jsonpath_ng vendor the ply)
+        self.assertEqual(self.imported_modules('{"a": [1, 2]}', '-l', 'jsonpath', '-p', '$.a')
+                         - {'ply'}, {'jsonpath_ng'})
+
+
+if __name__ == "__main__":
+    unittest.main()
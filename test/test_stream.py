@@ -0,0 +1,42 @@
+import json
+import sys
+import unittest
+from io import StringIO
+from unittest import mock
+
+from jsonfmt.stream import iter_json_array, iter_json_lines, iter_yaml_documents
+
+
+class TestStream(unittest.TestCase):
+
+    @mock.patch('sys.stderr', new=StringIO())
+    def test_iter_json_lines(self):
+        input_fp = StringIO('{"a": 1}\n\n[1, 2]\nwrong\n"abc"\n')
+        self.assertEqual(list(iter_json_lines(input_fp)), [{'a': 1}, [1, 2], 'abc'])
+        self.assertIn('line 4: Expecting value', sys.stderr.getvalue())  # type: ignore
+
+    def test_iter_json_array(self):
+        py_obj = [{'a': [1, -2.5e-3, 'x,]"'], 'b': None}, [], 12345, True, '']
+        text = '\ufeff ' + json.dumps(py_obj, indent=2) + '\n'
+        # the elements are cut off by every possible chunk size
+        for chunk_size in range(1, 16):
+            self.assertEqual(list(iter_json_array(StringIO(text), chunk_size)), py_obj)
+        self.assertEqual(list(iter_json_array(StringIO(' [ ] '))), [])
+
+        wrong_arrays = ['{"a": 1}', '[1, 2', '[1 2]', '[1, ]', '[1] 2', '']
+        for wrong in wrong_arrays:
+            with self.assertRaises(ValueError):
+                list(iter_json_array(StringIO(wrong), 2))
+
+    def test_iter_yaml_documents(self):
+        input_fp = StringIO('a: 1\n---\n- x\n...\n--- 2\n')
+        self.assertEqual(list(iter_yaml_documents(input_fp)), [{'a': 1}, ['x'], 2])
+
+        docs = iter_yaml_documents(StringIO('a: 1\n---\nb: [\n---\nc: 3\n'))
+        self.assertEqual(next(docs), {'a': 1})
+        with self.assertRaisesRegex(ValueError, 'document 2: '):
+            next(docs)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,16 @@
 
+import mmap
+import os
 import sys
+import tempfile
 import unittest
 from unittest import mock
 from collections import OrderedDict
 from io import StringIO
 
-from jsonfmt.utils import exit_with_error, print_inf, safe_eval, sort_dict
+from jsonfmt.utils import (StrippedWriter, decode_text, exit_with_error, is_same_content,
+                           map_in_order, open_input, print_inf, rebuild, safe_eval, sort_dict,
+                           write_if_changed)
 
 
 class TestFunctions(unittest.TestCase):
@@ -23,6 +28,118 @@ class TestFunctions(unittest.TestCase):
                          [{'x': 1, 'y': 2, 'z': 3}, {'w': 4}])
         self.assertEqual(sort_dict(5), 5)
 
+        # the depth is not limited by the recursion limit
+        deep = 'x'
+        for _ in range(10000):
+            deep = [{'b': deep, 'a': 1}]
+        result = sort_dict(deep)
+        for _ in range(10000):
+            self.assertEqual(list(result[0]), ['a', 'b'])
+            result = result[0]['b']
+        self.assertEqual(result, 'x')
+
+    def test_rebuild(self):
+        def expand(node):
+            return (node, tuple) if isinstance(node, list) else None
+
+        self.assertEqual(rebuild(1, expand), 1)
+        self.assertEqual(rebuild([1, [2, []], 3], expand), (1, (2, ()), 3))
+
+        # the shallow and the deep subtrees are rebuilt in the same way
+        deep: list = []
+        for i in range(3000):
+            deep = [i, deep, [i]]
+        with mock.patch('jsonfmt.utils.MAX_DEPTH', 10):
+            result = rebuild(deep, expand)
+        for i in reversed(range(3000)):
+            self.assertEqual(result[0], i)
+            self.assertEqual(result[2], (i,))
+            result = result[1]
+        self.assertEqual(result, ())
+
+    def test_decode_text(self):
+        self.assertEqual(decode_text('\ufeff{"a": 1}'), '{"a": 1}')
+        self.assertEqual(decode_text('[1]'.encode('utf-8-sig')), '[1]')
+        self.assertEqual(decode_text('纯爷们'.encode('utf-16')), '纯爷们')
+        self.assertEqual(decode_text('纯爷们'.encode('utf-32')), '纯爷们')
+        self.assertEqual(decode_text('纯爷们'.encode()[:-1], 'ignore'), '纯爷')
+
+    def test_open_input(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'input.json')
+            with open(path, 'w') as fp:
+                fp.write('[1, 2]')
+
+            # the regular file is mapped into memory
+            with open_input(path) as data:
+                self.assertIsInstance(data, mmap.mmap)
+                self.assertEqual(data[:], b'[1, 2]')
+
+            # the empty file can't be mapped
+            open(path, 'w').close()
+            with open_input(path) as data:
+                self.assertEqual(data, b'')
+
+        with open_input(StringIO('[3, 4]')) as data:
+            self.assertEqual(data, '[3, 4]')
+
+    def test_map_in_order(self):
+        items = [str(i) for i in range(20)] + ['x']
+        for jobs in [1, 3]:
+            getters = list(map_in_order(int, items, jobs))
+            self.assertEqual([get() for get in getters[:-1]], list(range(20)))
+            with self.assertRaises(ValueError):
+                getters[-1]()
+
+    def test_write_if_changed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, 'test.json')
+            link = os.path.join(tmpdir, 'link.json')
+            with open(path, 'w') as fp:
+                fp.write('[1, 2]\n')
+            os.chmod(path, 0o640)
+            os.symlink(path, link)
+
+            self.assertTrue(is_same_content(b'[1, 2]\n', '[1, 2]\n'))
+            self.assertFalse(is_same_content(b'[1, 2]', '[1, 2]\n'))
+            self.assertTrue(is_same_content('[1, 2]\n', '[1, 2]\n'))
+
+            self.assertFalse(write_if_changed(link, '[1, 2]\n'))
+            self.assertTrue(write_if_changed(link, '[\n  1,\n  2\n]\n'))
+            self.assertTrue(os.path.islink(link))
+            with open(path) as fp:
+                self.assertEqual(fp.read(), '[\n  1,\n  2\n]\n')
+            self.assertEqual(os.stat(path).st_mode & 0o777, 0o640)
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['link.json', 'test.json'])
+
+            # the temporary file is removed if failed to write
+            with mock.patch('os.replace', side_effect=OSError), self.assertRaises(OSError):
+                write_if_changed(path, '[]\n')
+            self.assertEqual(sorted(os.listdir(tmpdir)), ['link.json', 'test.json'])
+
+    def test_stripped_writer(self):
+        chunks = ['', ' \n', '  a', ' \n', '\t', 'b ', ' ', '\n\n']
+        for batch_size in [1, 2, 100]:
+            fp = StringIO()
+            writer = StrippedWriter(fp, batch_size)
+            for chunk in chunks:
+                writer.write(chunk)
+            writer.close()
+            self.assertEqual(fp.getvalue(), ''.join(chunks).strip() + '\n')
+
+            fp = StringIO()
+            writer = StrippedWriter(fp, batch_size)
+            writer.writelines(iter(chunks))
+            writer.close()
+            self.assertEqual(fp.getvalue(), ''.join(chunks).strip() + '\n')
+
+        # the empty text
+        fp = StringIO()
+        writer = StrippedWriter(fp)
+        writer.write('  \n ')
+        writer.close()
+        self.assertEqual(fp.getvalue(), '\n')
+
     @mock.patch('sys.stderr', new=StringIO())
     def test_print_inf(self):
         print_inf("This is an info message")
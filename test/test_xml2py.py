@@ -2,8 +2,10 @@ import os
 import unittest
 from json import load as j_load
 from xml.dom.minidom import parseString
-from xml.etree.ElementTree import Element
+from unittest import mock
+from xml.etree.ElementTree import Element, ParseError
 
+from jsonfmt import xml2py
 from jsonfmt.xml2py import XmlElement, dumps, loads
 
 
@@ -47,6 +49,12 @@ class TestXmlElement(unittest.TestCase):
         self.assertEqual(cloned.text, 'text')
         self.assertTrue(len(cloned), 1)
         self.assertEqual(cloned[0].tag, 'child')
+        self.assertIs(cloned[0].parent, cloned)
+
+        dst = XmlElement('dst')
+        self.assertIs(XmlElement.clone(src, dst), dst)
+        self.assertEqual(dst[0].tag, 'child')
+        self.assertIs(dst[0].parent, dst)
 
     def test_from_xml(self):
         xml = '<root><item attr="value">Text</item></root>'
@@ -133,12 +141,48 @@ class TestXmlElement(unittest.TestCase):
         self.assertEqual(py_obj,
                          {'@attr': 'value', 'item': {'@red': 'red', '@text': [1, 2, 3]}})
 
+    def test_deep_element(self):
+        depth = 10000
+        xml = '<a>' * depth + '1' + '</a>' * depth
+        ele = XmlElement.from_xml(xml)
+        py_obj = ele.to_py()
+        for _ in range(depth - 1):
+            py_obj = py_obj['a']
+        self.assertEqual(py_obj, {'a': 1})
+
+        py_obj = 'x'
+        for _ in range(depth):
+            py_obj = {'b': [py_obj]}
+        ele = XmlElement.from_py({'a': py_obj})
+        for _ in range(depth):
+            self.assertEqual(len(ele), 1)
+            ele = ele[0]
+        self.assertEqual(ele.text, 'x')
+
     def test_loads(self):
         xml = '<root><item k="v" x="y"><l>1</l><l>2</l><l>3</l></item></root>'
         py_obj = loads(xml)
         self.assertEqual(py_obj, {'item': {'@k': 'v', '@x': 'y', 'l': [1, 2, 3]}})
         self.assertEqual(loads(self.xml), self.pyobj)
 
+    def test_loads_in_chunks(self):
+        xmls = [
+            self.xml,
+            '  \n<?xml version="1.0" ?><a x="1">text<b>[1, 2]</b>tail<b/><!-- c --><c y="0">0</c></a>',
+            '<root k="v">\n  <l>1</l>\n  <l><m>2</m><m/></l>\n  <l>[3]</l>\n</root>',
+            '<a><b x="1"> </b><b>\n</b><c>{"k": None}</c></a>',
+        ]
+        for xml in xmls:
+            expected = XmlElement.from_xml(xml).to_py()
+            for chunk_size in [3, 7, 1024]:
+                with mock.patch.object(xml2py, 'CHUNK_SIZE', chunk_size):
+                    self.assertEqual(repr(loads(xml)), repr(expected))
+
+        with self.assertRaises(ParseError):
+            loads('')
+        with self.assertRaises(ParseError):
+            loads('<a><b></a>')
+
     def test_dumps(self):
         obj = {'root': {'item': [{'@sub_attr': 'sub_value1'}, {'@sub_attr': 'sub_value2'}]}}
         xml = dumps(obj, indent='  ', sort_keys=True)
@@ -152,6 +196,29 @@ class TestXmlElement(unittest.TestCase):
 
         self.assertEqual(dumps(self.pyobj, '2'), self.xml)
 
+    def test_dumps_same_as_element_tree(self):
+        objs = [
+            self.pyobj,
+            {'a': {'@x': '1 & "2"', '@text': ' t\r\n ', 'b': [1, {'@y': None}, {}], 'c': ''}},
+            {'root': {'@text': 'mixed', 'l': ['<x>', True, 1.5]}},
+            [[1, 2], {'k': 'v'}, None, 'x'],
+            [],
+            'scalar',
+            {'中文': {'键': '值'}},
+            # the nested sequences and the namespaces are written by the element tree
+            {'a': [[1, 2], [3]], 'b': (4, 5)},
+            {'{http://ns}a': {'@{http://ns}b': 1}},
+        ]
+        for obj in objs:
+            for indent in ['0', '2', 't']:
+                for minimal in [True, False]:
+                    expected = XmlElement.from_py(obj).to_xml(indent=indent, minimal=minimal)
+                    self.assertEqual(dumps(obj, indent, minimal), expected)
+
+        # the XML must not contain the control characters
+        with self.assertRaises(ValueError):
+            dumps({'a': '\x01'}, '2')
+
 
 if __name__ == "__main__":
     unittest.main()